@@ -2,6 +2,9 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app.models import User, StudentPayment, Group, Faculty
 from app import db
+from app.utils.fragment_cache import fragment_cache
+from app.utils.payment_stats import payment_stats_by_course as course_payment_stats
+from app.utils.scopes import payments_in_scope
 from functools import wraps
 from datetime import datetime
 from sqlalchemy import func
@@ -41,13 +44,7 @@ def index():
             flash("Sizga fakultet biriktirilmagan", 'error')
             return redirect(url_for('main.dashboard'))
         
-        faculty_group_ids = [g.id for g in faculty.groups.all()]
-        student_ids = [s.id for s in User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(faculty_group_ids)
-        ).all()]
-        
-        query = StudentPayment.query.filter(StudentPayment.student_id.in_(student_ids))
+        query = payments_in_scope(StudentPayment.query, faculty_id=faculty.id)
         
         if search:
             query = query.join(User).filter(
@@ -56,54 +53,19 @@ def index():
             )
         
         if group_id:
-            group_student_ids = [s.id for s in User.query.filter_by(role='student', group_id=group_id).all()]
-            query = query.filter(StudentPayment.student_id.in_(group_student_ids))
+            query = payments_in_scope(query, group_id=group_id)
         
         payments = query.order_by(StudentPayment.created_at.desc()).paginate(page=page, per_page=20)
         groups = faculty.groups.order_by(Group.name).all()
         
         # Statistika
-        total_contract = db.session.query(func.sum(StudentPayment.contract_amount)).filter(
-            StudentPayment.student_id.in_(student_ids)
-        ).scalar() or 0
-        total_paid = db.session.query(func.sum(StudentPayment.paid_amount)).filter(
-            StudentPayment.student_id.in_(student_ids)
-        ).scalar() or 0
+        total_contract, total_paid = payments_in_scope(db.session.query(
+            func.coalesce(func.sum(StudentPayment.contract_amount), 0),
+            func.coalesce(func.sum(StudentPayment.paid_amount), 0)
+        ), faculty_id=faculty.id).one()
         
         # Kurs bo'yicha to'lov foizi statistikasi
-        from collections import defaultdict
-        payment_stats_by_course = defaultdict(lambda: {
-            '0%': 0, '25%': 0, '50%': 0, '75%': 0, '100%': 0, 'total': 0
-        })
-        
-        # Fakultet talabalari to'lov ma'lumotlari
-        faculty_payments = StudentPayment.query.filter(
-            StudentPayment.student_id.in_(student_ids)
-        ).join(User).join(Group).all()
-        
-        for payment in faculty_payments:
-            if payment.student and payment.student.group:
-                course_year = payment.student.group.course_year
-                percentage = payment.get_payment_percentage()
-                
-                # To'lov foiziga qarab guruhlash
-                if percentage == 0:
-                    payment_stats_by_course[course_year]['0%'] += 1
-                elif 0 < percentage <= 25:
-                    payment_stats_by_course[course_year]['0%'] += 1
-                elif 25 < percentage <= 50:
-                    payment_stats_by_course[course_year]['25%'] += 1
-                elif 50 < percentage <= 75:
-                    payment_stats_by_course[course_year]['50%'] += 1
-                elif 75 < percentage < 100:
-                    payment_stats_by_course[course_year]['75%'] += 1
-                else:  # 100% va yuqori
-                    payment_stats_by_course[course_year]['100%'] += 1
-                
-                payment_stats_by_course[course_year]['total'] += 1
-        
-        # Kurs bo'yicha tartiblash
-        payment_stats_by_course = dict(sorted(payment_stats_by_course.items()))
+        payment_stats_by_course = course_payment_stats(faculty.id)
         
         return render_template('accounting/index.html', 
                              payments=payments, 
@@ -126,18 +88,12 @@ def index():
             )
         
         if group_id:
-            group_student_ids = [s.id for s in User.query.filter_by(role='student', group_id=group_id).all()]
-            query = query.filter(StudentPayment.student_id.in_(group_student_ids))
+            query = payments_in_scope(query, group_id=group_id)
         
         if faculty_id:
             faculty = Faculty.query.get(faculty_id)
             if faculty:
-                faculty_group_ids = [g.id for g in faculty.groups.all()]
-                faculty_student_ids = [s.id for s in User.query.filter(
-                    User.role == 'student',
-                    User.group_id.in_(faculty_group_ids)
-                ).all()]
-                query = query.filter(StudentPayment.student_id.in_(faculty_student_ids))
+                query = payments_in_scope(query, faculty_id=faculty.id)
         
         payments = query.order_by(StudentPayment.created_at.desc()).paginate(page=page, per_page=20)
         groups = Group.query.order_by(Group.name).all()
@@ -148,37 +104,7 @@ def index():
         total_paid = db.session.query(func.sum(StudentPayment.paid_amount)).scalar() or 0
         
         # Kurs bo'yicha to'lov foizi statistikasi
-        from collections import defaultdict
-        payment_stats_by_course = defaultdict(lambda: {
-            '0%': 0, '25%': 0, '50%': 0, '75%': 0, '100%': 0, 'total': 0
-        })
-        
-        # Barcha to'lov ma'lumotlarini olish
-        all_payments = StudentPayment.query.join(User).join(Group).all()
-        
-        for payment in all_payments:
-            if payment.student and payment.student.group:
-                course_year = payment.student.group.course_year
-                percentage = payment.get_payment_percentage()
-                
-                # To'lov foiziga qarab guruhlash
-                if percentage == 0:
-                    payment_stats_by_course[course_year]['0%'] += 1
-                elif 0 < percentage <= 25:
-                    payment_stats_by_course[course_year]['0%'] += 1
-                elif 25 < percentage <= 50:
-                    payment_stats_by_course[course_year]['25%'] += 1
-                elif 50 < percentage <= 75:
-                    payment_stats_by_course[course_year]['50%'] += 1
-                elif 75 < percentage < 100:
-                    payment_stats_by_course[course_year]['75%'] += 1
-                else:  # 100% va yuqori
-                    payment_stats_by_course[course_year]['100%'] += 1
-                
-                payment_stats_by_course[course_year]['total'] += 1
-        
-        # Kurs bo'yicha tartiblash
-        payment_stats_by_course = dict(sorted(payment_stats_by_course.items()))
+        payment_stats_by_course = course_payment_stats()
         
         return render_template('accounting/index.html', 
                              payments=payments, 
@@ -220,6 +146,7 @@ def import_payments():
             from app.utils.excel_import import import_payments_from_excel
             
             result = import_payments_from_excel(file)
+            fragment_cache.invalidate_tags('payments')
             
             if result['success']:
                 if result['imported'] > 0:
@@ -325,26 +252,15 @@ def export_contracts():
             flash("Sizga fakultet biriktirilmagan", 'error')
             return redirect(url_for('main.dashboard'))
         
-        faculty_group_ids = [g.id for g in faculty.groups.all()]
-        student_ids = [s.id for s in User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(faculty_group_ids)
-        ).all()]
-        query = query.filter(StudentPayment.student_id.in_(student_ids))
+        query = payments_in_scope(query, faculty_id=faculty.id)
     
     if group_id:
-        group_student_ids = [s.id for s in User.query.filter_by(role='student', group_id=group_id).all()]
-        query = query.filter(StudentPayment.student_id.in_(group_student_ids))
+        query = payments_in_scope(query, group_id=group_id)
     
     if faculty_id:
         faculty = Faculty.query.get(faculty_id)
         if faculty:
-            faculty_group_ids = [g.id for g in faculty.groups.all()]
-            faculty_student_ids = [s.id for s in User.query.filter(
-                User.role == 'student',
-                User.group_id.in_(faculty_group_ids)
-            ).all()]
-            query = query.filter(StudentPayment.student_id.in_(faculty_student_ids))
+            query = payments_in_scope(query, faculty_id=faculty.id)
     
     if course_year:
         query = query.filter(Group.course_year == course_year)
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app.models import User, Faculty, Group, Subject, TeacherSubject, Announcement, GradeScale, Schedule
 from app import db
+from app.utils.scopes import faculty_group_ids, faculty_students_filter
 from functools import wraps
 from datetime import datetime
 
@@ -559,11 +560,7 @@ def export_students():
     
     if faculty_id:
         faculty = Faculty.query.get_or_404(faculty_id)
-        group_ids = [g.id for g in faculty.groups.all()]
-        students = User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(group_ids)
-        ).order_by(User.full_name).all()
+        students = User.query.filter(faculty_students_filter(faculty.id)).order_by(User.full_name).all()
         faculty_name = faculty.name
     else:
         students = User.query.filter_by(role='student').order_by(User.full_name).all()
@@ -603,8 +600,7 @@ def export_schedule():
         faculty_name = None
     elif faculty_id:
         faculty = Faculty.query.get_or_404(faculty_id)
-        group_ids = [g.id for g in faculty.groups.all()]
-        schedules = Schedule.query.filter(Schedule.group_id.in_(group_ids)).order_by(Schedule.day_of_week, Schedule.start_time).all()
+        schedules = Schedule.query.filter(Schedule.group_id.in_(faculty_group_ids(faculty.id))).order_by(Schedule.day_of_week, Schedule.start_time).all()
         group_name = None
         faculty_name = faculty.name
     else:
@@ -1,99 +1,39 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, current_app, url_for
 from flask_login import login_required, current_user
-from app.models import User, Subject, Message, Faculty, Group
+from app.models import User, Subject, Faculty, Group
 from app import db
+from app.utils.pending_feed import get_pending_feed, serialize_assignment
+from app.utils.announcement_audience import unread_count as unread_announcement_count
+from app.utils.message_policy import can_message
+from app.utils.people_search import search_people, build_people_index
+from app.utils.content_search import search_content, build_content_index
+from app.utils.conversations import (
+    unread_total, history_page, mark_conversation_read, get_summary, serialize_message,
+    publish_read
+)
+from app.utils.notify import notifier, event_stream
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Kontent va foydalanuvchilar qidiruvi indekslarini yaratish va qayta qurish"""
+    count = build_content_index()
+    if count is None:
+        print("FTS5 mavjud emas - qidiruv indekslari yaratilmadi")
+        return
+    print(f"Indekslangan hujjatlar: {count}")
+    print(f"Indekslangan foydalanuvchilar: {build_people_index()}")
+
 @bp.route('/users/search')
 @login_required
 def search_users():
-    from app.models import TeacherSubject, Group
-    
     query = request.args.get('q', '')
     if len(query) < 2:
         return jsonify([])
     
-    # Ruxsatli foydalanuvchilarni aniqlash
-    allowed_user_ids = set()
-    
-    if current_user.role == 'student':
-        # Talaba faqat o'ziga biriktirilgan o'qituvchi va dekanni qidirishi mumkin
-        users = []
-        
-        if current_user.group_id:
-            # O'z guruhiga biriktirilgan o'qituvchilar
-            teaching_assignments = TeacherSubject.query.filter_by(group_id=current_user.group_id).all()
-            teacher_ids = [ta.teacher_id for ta in teaching_assignments]
-            
-            teachers = User.query.filter(
-                User.id.in_(teacher_ids),
-                ((User.full_name.ilike(f'%{query}%')) |
-                 (User.email.ilike(f'%{query}%')))
-            ).all()
-            users.extend(teachers)
-            
-            # O'z fakultetidagi dekan
-            from app.models import Group
-            student_group = Group.query.get(current_user.group_id)
-            if student_group and student_group.faculty_id:
-                dean = User.query.filter_by(
-                    role='dean',
-                    faculty_id=student_group.faculty_id
-                ).filter(
-                    (User.full_name.ilike(f'%{query}%')) |
-                    (User.email.ilike(f'%{query}%'))
-                ).first()
-                if dean:
-                    users.append(dean)
-        
-    elif current_user.role == 'dean':
-        # Dekan faqat o'z fakultetidagi talabalarni qidirishi mumkin
-        if current_user.faculty_id:
-            faculty_groups = Group.query.filter_by(faculty_id=current_user.faculty_id).all()
-            group_ids = [g.id for g in faculty_groups]
-            users = User.query.filter(
-                User.role == 'student',
-                User.group_id.in_(group_ids),
-                ((User.full_name.ilike(f'%{query}%')) |
-                 (User.email.ilike(f'%{query}%')))
-            ).all()
-        else:
-            users = []
-            
-    elif current_user.role == 'teacher':
-        # O'qituvchi o'z guruhlaridagi talabalarni, boshqa o'qituvchilarni va dekanlarni qidirishi mumkin
-        teaching_groups = TeacherSubject.query.filter_by(teacher_id=current_user.id).all()
-        group_ids = [tg.group_id for tg in teaching_groups]
-        
-        students = User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(group_ids),
-            ((User.full_name.ilike(f'%{query}%')) |
-             (User.email.ilike(f'%{query}%')))
-        ).all()
-        
-        teachers = User.query.filter(
-            User.role == 'teacher',
-            User.id != current_user.id,
-            ((User.full_name.ilike(f'%{query}%')) |
-             (User.email.ilike(f'%{query}%')))
-        ).all()
-        
-        deans = User.query.filter_by(role='dean').filter(
-            (User.full_name.ilike(f'%{query}%')) |
-            (User.email.ilike(f'%{query}%'))
-        ).all()
-        
-        users = students + teachers + deans
-        
-    else:
-        # Admin va boshqalar barcha foydalanuvchilarni qidirishi mumkin
-        users = User.query.filter(
-            User.id != current_user.id,
-            (User.full_name.ilike(f'%{query}%')) |
-            (User.email.ilike(f'%{query}%'))
-        ).limit(10).all()
+    # Faqat xabar yozish mumkin bo'lgan foydalanuvchilar orasidan qidirish
+    users = search_people(current_user, query)
     
     return jsonify([{
         'id': u.id,
@@ -102,14 +42,107 @@ def search_users():
         'role': u.get_role_display()
     } for u in users])
 
+# Qidiruv natijasi turi -> sahifa manzili
+SEARCH_URLS = {
+    'subject': lambda ref_id: url_for('courses.detail', id=ref_id),
+    'lesson': lambda ref_id: url_for('courses.lesson_detail', id=ref_id),
+    'assignment': lambda ref_id: url_for('courses.assignment_detail', id=ref_id),
+    'announcement': lambda ref_id: url_for('main.announcements'),
+}
+
+@bp.route('/search')
+@login_required
+def search():
+    """Fanlar, darslar, topshiriqlar va e'lonlar bo'yicha qidiruv"""
+    query = request.args.get('q', '')
+    page = request.args.get('page', 1, type=int)
+    if len(query.strip()) < 2:
+        return jsonify({'results': [], 'page': page, 'has_more': False, 'available': True})
+    
+    results, has_more, available = search_content(current_user, query, page=page)
+    for item in results:
+        item['url'] = SEARCH_URLS[item['kind']](item['id'])
+    
+    return jsonify({'results': results, 'page': page, 'has_more': has_more, 'available': available})
+
 @bp.route('/messages/unread')
 @login_required
 def unread_messages():
-    count = Message.query.filter_by(
-        receiver_id=current_user.id,
-        is_read=False
-    ).count()
-    return jsonify({'count': count})
+    return jsonify({'count': unread_total(current_user.id)})
+
+@bp.route('/messages/stream')
+@login_required
+def message_stream():
+    """Yangi xabarlar va o'qilmaganlar soni uchun SSE oqimi"""
+    # Avval obuna bo'linadi, keyin boshlang'ich holat o'qiladi - oradagi
+    # xabarlar navbatda kutib turadi. Keyin oqim bazaga murojaat qilmaydi.
+    user_id = current_user.id
+    channel = notifier.subscribe(user_id)
+    try:
+        initial_events = [('unread', {'count': unread_total(user_id)})]
+    except Exception:
+        notifier.unsubscribe(user_id, channel)
+        raise
+    db.session.remove()
+    
+    stream = event_stream(
+        user_id,
+        channel,
+        initial_events,
+        heartbeat=current_app.config.get('SSE_HEARTBEAT_INTERVAL', 25),
+        max_duration=current_app.config.get('SSE_MAX_DURATION', 300)
+    )
+    response = Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Oqim boshlanmasdan ulanish yopilsa ham obuna bekor qilinadi
+    response.call_on_close(lambda: notifier.unsubscribe(user_id, channel))
+    return response
+
+@bp.route('/messages/<int:user_id>')
+@login_required
+def conversation_messages(user_id):
+    """Suhbat xabarlari: `after` - yangilari (yangilash uchun), `before` - eskilari"""
+    other_user = User.query.get_or_404(user_id)
+    if not can_message(current_user, other_user):
+        return jsonify({'success': False, 'error': "Siz bu foydalanuvchiga xabar yubora olmaysiz"}), 403
+    
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    messages, has_more = history_page(current_user.id, user_id, before=before, after=after)
+    
+    # Yangi xabarlar ko'rsatilganda o'qilgan chegarasi faqat qaytarilgan
+    # oxirgi xabargacha suriladi (eski sahifalarda surilmaydi)
+    read_up_to = messages[-1].id if messages else after
+    if not before and mark_conversation_read(current_user.id, user_id, up_to=read_up_to):
+        db.session.commit()
+        publish_read(current_user.id, user_id)
+    
+    summary = get_summary(current_user.id, user_id)
+    return jsonify({
+        'messages': [serialize_message(m, summary) for m in messages],
+        'has_more': has_more,
+        'partner_read_id': summary.read_id_for(user_id) if summary else 0
+    })
+
+@bp.route('/assignments/pending')
+@login_required
+def pending_assignments():
+    if current_user.role != 'student':
+        return jsonify({'overdue': [], 'upcoming': []})
+    
+    limit = min(max(request.args.get('limit', 5, type=int), 1), 50)
+    feed = get_pending_feed(current_user, limit=limit)
+    return jsonify({
+        'overdue': [serialize_assignment(a) for a in feed.overdue],
+        'upcoming': [serialize_assignment(a) for a in feed.upcoming]
+    })
+
+@bp.route('/announcements/unread')
+@login_required
+def unread_announcements():
+    return jsonify({'count': unread_announcement_count(current_user)})
 
 @bp.route('/dashboard/stats')
 @login_required
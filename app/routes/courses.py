@@ -1,10 +1,28 @@
 import os
-import uuid
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_from_directory, jsonify, abort
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from app.models import Subject, Lesson, Assignment, Submission, User, TeacherSubject, Group, LessonView
 from app import db
+from app.utils.grade_rollup import get_student_grade_rollup
+from app.utils.lesson_progress import LessonProgression
+from app.utils.lesson_sequence import get_video_sequence, invalidate_subject
+from app.utils.gradebook import Gradebook
+from app.utils.bulk_grading import parse_grade_rows, apply_bulk_grades
+from app.utils.assignment_roster import submitted_page, not_submitted_page
+from app.utils.grade_projections import student_grades_by_subject, teacher_subject_groups
+from app.utils.video_delivery import send_video
+from app.utils.file_store import store_file, release_file, file_directory
+from app.utils.watch_buffer import watch_buffer
+from app.utils.watch_coverage import parse_segments, lesson_coverage_report
+from app.utils.access_index import (
+    can_view_subject, teaches_subject, teaches_group, group_has_subject, teacher_subject_ids,
+    teacher_group_ids, group_subject_ids
+)
+from app.utils.chunked_upload import (
+    ChunkedUploadError, create_upload, load_upload, upload_status, write_chunk,
+    complete_upload, finished_upload_filename, discard_upload
+)
 from datetime import datetime
 
 
@@ -18,6 +36,8 @@ def allowed_submission_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in current_app.config.get('ALLOWED_SUBMISSION_EXTENSIONS', {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'jpg', 'jpeg', 'png'})
 
+LESSON_FILE_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt', 'zip', 'rar'}
+
 bp = Blueprint('courses', __name__, url_prefix='/subjects')
 
 @bp.route('/')
@@ -30,13 +50,13 @@ def index():
     if current_user.role == 'student':
         # Talaba faqat o'z guruhiga biriktirilgan fanlarni ko'radi
         if current_user.group_id:
-            subject_ids = [ts.subject_id for ts in TeacherSubject.query.filter_by(group_id=current_user.group_id).all()]
+            subject_ids = group_subject_ids(current_user.group_id)
             query = Subject.query.filter(Subject.id.in_(subject_ids))
         else:
             query = Subject.query.filter(False)  # Bo'sh
     elif current_user.role == 'teacher':
         # O'qituvchi faqat o'ziga biriktirilgan fanlarni ko'radi
-        subject_ids = [ts.subject_id for ts in TeacherSubject.query.filter_by(teacher_id=current_user.id).all()]
+        subject_ids = teacher_subject_ids(current_user.id)
         query = Subject.query.filter(Subject.id.in_(subject_ids))
     else:
         # Admin va dekan barcha fanlarni ko'radi
@@ -53,66 +73,11 @@ def index():
     # Talaba uchun har bir fan bo'yicha ballar
     subject_grades = {}
     if current_user.role == 'student' and current_user.group_id:
-        for subject in subjects.items:
-            assignments = Assignment.query.filter_by(
-                subject_id=subject.id,
-                group_id=current_user.group_id
-            ).all()
-            
-            # O'qituvchi biriktirishlari
-            maruza_teacher = TeacherSubject.query.filter_by(
-                subject_id=subject.id,
-                group_id=current_user.group_id,
-                lesson_type='maruza'
-            ).first()
-            
-            amaliyot_teacher = TeacherSubject.query.filter_by(
-                subject_id=subject.id,
-                group_id=current_user.group_id,
-                lesson_type='amaliyot'
-            ).first()
-            
-            maruza_score = 0
-            maruza_max = 0
-            amaliyot_score = 0
-            amaliyot_max = 0
-            
-            for assignment in assignments:
-                submission = Submission.query.filter_by(
-                    student_id=current_user.id,
-                    assignment_id=assignment.id
-                ).first()
-                
-                if submission and submission.score is not None:
-                    assignment_creator = User.query.get(assignment.created_by) if assignment.created_by else None
-                    
-                    is_maruza = False
-                    is_amaliyot = False
-                    
-                    if maruza_teacher and assignment_creator and assignment_creator.id == maruza_teacher.teacher_id:
-                        is_maruza = True
-                    elif amaliyot_teacher and assignment_creator and assignment_creator.id == amaliyot_teacher.teacher_id:
-                        is_amaliyot = True
-                    else:
-                        # Agar o'qituvchi biriktirilmagan bo'lsa, topshiriq nomiga qarab aniqlash
-                        assignment_title_lower = assignment.title.lower()
-                        if 'amaliy' in assignment_title_lower or 'amaliyot' in assignment_title_lower:
-                            is_amaliyot = True
-                        else:
-                            is_maruza = True
-                    
-                    if is_maruza:
-                        maruza_score += submission.score
-                        maruza_max += assignment.max_score
-                    elif is_amaliyot:
-                        amaliyot_score += submission.score
-                        amaliyot_max += assignment.max_score
-            
-            subject_grades[subject.id] = {
-                'maruza': {'score': maruza_score, 'max': maruza_max},
-                'amaliyot': {'score': amaliyot_score, 'max': amaliyot_max},
-                'total': {'score': maruza_score + amaliyot_score, 'max': maruza_max + amaliyot_max}
-            }
+        subject_grades = get_student_grade_rollup(
+            current_user.id,
+            current_user.group_id,
+            [subject.id for subject in subjects.items]
+        )
     
     return render_template('courses/index.html', subjects=subjects, search=search, subject_grades=subject_grades)
 
@@ -133,18 +98,10 @@ def detail(id):
     elif current_user.role == 'dean':
         can_view = subject.faculty_id == current_user.faculty_id
     elif current_user.role == 'teacher':
-        teaching = TeacherSubject.query.filter_by(
-            teacher_id=current_user.id,
-            subject_id=subject.id
-        ).first()
-        can_view = teaching is not None
+        can_view = teaches_subject(current_user.id, subject.id)
         is_teacher = can_view
     elif current_user.role == 'student' and current_user.group_id:
-        teaching = TeacherSubject.query.filter_by(
-            group_id=current_user.group_id,
-            subject_id=subject.id
-        ).first()
-        can_view = teaching is not None
+        can_view = group_has_subject(current_user.group_id, subject.id)
         my_group = current_user.group
     
     if not can_view:
@@ -159,41 +116,15 @@ def detail(id):
     # Talaba uchun: qaysi darslar qulflanganligini aniqlash
     lesson_locked_status = {}
     if current_user.role == 'student' and current_user.group_id:
-        for lesson in all_lessons:
-            # Faqat videoga ega darslar uchun qulf tekshiruvi
-            if lesson.video_file or lesson.video_url:
-                # Bir xil fan va dars turidagi oldingi darslarni olish
-                previous_lessons = Lesson.query.filter(
-                    Lesson.subject_id == subject.id,
-                    Lesson.lesson_type == lesson.lesson_type,
-                    Lesson.order < lesson.order
-                ).order_by(Lesson.order).all()
-                
-                is_locked = False
-                for prev_lesson in previous_lessons:
-                    if prev_lesson.video_file or prev_lesson.video_url:
-                        prev_lesson_view = LessonView.query.filter_by(
-                            lesson_id=prev_lesson.id,
-                            student_id=current_user.id
-                        ).first()
-                        
-                        if not prev_lesson_view or not prev_lesson_view.is_completed:
-                            is_locked = True
-                            break
-                
-                lesson_locked_status[lesson.id] = is_locked
-            else:
-                lesson_locked_status[lesson.id] = False
+        progression = LessonProgression(current_user.id, subject.id)
+        lesson_locked_status = progression.locked_status(all_lessons)
     
     # Topshiriqlar
     if current_user.role == 'student' and current_user.group_id:
         assignments = subject.assignments.filter_by(group_id=current_user.group_id).all()
     elif current_user.role == 'teacher':
         # O'qituvchi o'zi dars beradigan guruhlarning topshiriqlarini ko'radi
-        group_ids = [ts.group_id for ts in TeacherSubject.query.filter_by(
-            teacher_id=current_user.id,
-            subject_id=subject.id
-        ).all()]
+        group_ids = teacher_group_ids(current_user.id, subject.id)
         assignments = subject.assignments.filter(Assignment.group_id.in_(group_ids)).all()
     else:
         assignments = subject.assignments.all()
@@ -202,67 +133,21 @@ def detail(id):
     assignment_status = {}
     student_grades = None
     if current_user.role == 'student':
+        assignment_ids = [assignment.id for assignment in assignments]
+        submissions = Submission.query.filter(
+            Submission.student_id == current_user.id,
+            Submission.assignment_id.in_(assignment_ids)
+        ).all() if assignment_ids else []
+        submissions_by_assignment = {s.assignment_id: s for s in submissions}
         for assignment in assignments:
-            submission = Submission.query.filter_by(
-                student_id=current_user.id,
-                assignment_id=assignment.id
-            ).first()
-            assignment_status[assignment.id] = submission
+            assignment_status[assignment.id] = submissions_by_assignment.get(assignment.id)
         
         # Ballarni hisoblash: amaliy, maruza va jami
-        # O'qituvchi biriktirishlari bo'yicha
-        maruza_teacher = TeacherSubject.query.filter_by(
-            subject_id=subject.id,
-            group_id=current_user.group_id,
-            lesson_type='maruza'
-        ).first()
-        
-        amaliyot_teacher = TeacherSubject.query.filter_by(
-            subject_id=subject.id,
-            group_id=current_user.group_id,
-            lesson_type='amaliyot'
-        ).first()
-        
-        maruza_score = 0
-        maruza_max = 0
-        amaliyot_score = 0
-        amaliyot_max = 0
-        
-        for assignment in assignments:
-            submission = assignment_status.get(assignment.id)
-            if submission and submission.score is not None:
-                # Topshiriq qaysi o'qituvchiga tegishli ekanligini aniqlash
-                # Agar topshiriq yaratgan o'qituvchi maruza o'qituvchisi bo'lsa - maruza
-                # Agar amaliyot o'qituvchisi bo'lsa - amaliyot
-                assignment_creator = User.query.get(assignment.created_by) if assignment.created_by else None
-                
-                is_maruza = False
-                is_amaliyot = False
-                
-                if maruza_teacher and assignment_creator and assignment_creator.id == maruza_teacher.teacher_id:
-                    is_maruza = True
-                elif amaliyot_teacher and assignment_creator and assignment_creator.id == amaliyot_teacher.teacher_id:
-                    is_amaliyot = True
-                else:
-                    # Agar o'qituvchi biriktirilmagan bo'lsa, topshiriq nomiga qarab aniqlash
-                    assignment_title_lower = assignment.title.lower()
-                    if 'amaliy' in assignment_title_lower or 'amaliyot' in assignment_title_lower:
-                        is_amaliyot = True
-                    else:
-                        is_maruza = True
-                
-                if is_maruza:
-                    maruza_score += submission.score
-                    maruza_max += assignment.max_score
-                elif is_amaliyot:
-                    amaliyot_score += submission.score
-                    amaliyot_max += assignment.max_score
-        
-        student_grades = {
-            'maruza': {'score': maruza_score, 'max': maruza_max},
-            'amaliyot': {'score': amaliyot_score, 'max': amaliyot_max},
-            'total': {'score': maruza_score + amaliyot_score, 'max': maruza_max + amaliyot_max}
-        }
+        student_grades = get_student_grade_rollup(
+            current_user.id,
+            current_user.group_id,
+            [subject.id]
+        )[subject.id]
     
     # Fan bo'yicha o'qituvchilar (maruza va amaliyot bo'yicha ajratilgan)
     if current_user.role == 'student' and current_user.group_id:
@@ -319,10 +204,7 @@ def create_lesson(id):
     subject = Subject.query.get_or_404(id)
     
     # Faqat o'qituvchi yoki admin dars yaratishi mumkin
-    is_teacher = TeacherSubject.query.filter_by(
-        teacher_id=current_user.id,
-        subject_id=subject.id
-    ).first() is not None
+    is_teacher = teaches_subject(current_user.id, subject.id)
     
     if not is_teacher and current_user.role != 'admin':
         flash("Sizda dars yaratish uchun ruxsat yo'q", 'error')
@@ -332,15 +214,22 @@ def create_lesson(id):
         video_filename = None
         lesson_file_url = None
         
+        # Bo'laklab yuklangan fayllar (identifikator orqali)
+        video_upload_id = request.form.get('video_upload_id', '').strip()
+        lesson_file_upload_id = request.form.get('lesson_file_upload_id', '').strip()
+        
         # Video fayl yuklash
-        if 'video_file' in request.files:
+        if video_upload_id:
+            video_filename = finished_upload_filename(video_upload_id, current_user.id, 'video')
+            if not video_filename:
+                flash("Video yuklash hali yakunlanmagan yoki topilmadi", 'error')
+                return render_template('courses/create_lesson.html', subject=subject)
+        elif 'video_file' in request.files:
             video = request.files['video_file']
             if video and video.filename and allowed_video(video.filename):
-                # Unique fayl nomi
+                # Kontent bo'yicha (takrorlanmas) saqlash
                 ext = video.filename.rsplit('.', 1)[1].lower()
-                video_filename = f"{uuid.uuid4().hex}.{ext}"
-                video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', video_filename)
-                video.save(video_path)
+                video_filename = store_file(video, 'videos', ext)
         
         # Video URL faqat YouTube link bo'lishi kerak
         video_url = request.form.get('video_url', '').strip()
@@ -353,23 +242,20 @@ def create_lesson(id):
         # O'qituvchi uchun fayl yuklash majburiy
         if current_user.role == 'teacher' or current_user.role == 'admin':
             # Fayl yuklash
-            if 'lesson_file' in request.files:
+            if lesson_file_upload_id:
+                lesson_file_url = finished_upload_filename(lesson_file_upload_id, current_user.id, 'lesson_file')
+            elif 'lesson_file' in request.files:
                 lesson_file = request.files['lesson_file']
                 if lesson_file and lesson_file.filename:
                     # Fayl formatini tekshirish
-                    allowed_extensions = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt', 'zip', 'rar'}
+                    allowed_extensions = LESSON_FILE_EXTENSIONS
                     ext = lesson_file.filename.rsplit('.', 1)[1].lower() if '.' in lesson_file.filename else ''
                     if ext not in allowed_extensions:
                         flash("Ruxsat berilmagan fayl formati. Ruxsatli formatlar: PDF, DOC, DOCX, XLS, XLSX, PPT, PPTX, TXT, ZIP, RAR", 'error')
                         return render_template('courses/create_lesson.html', subject=subject)
                     
                     # Faylni saqlash
-                    filename = f"{uuid.uuid4().hex}.{ext}"
-                    files_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'lesson_files')
-                    os.makedirs(files_folder, exist_ok=True)
-                    file_path = os.path.join(files_folder, filename)
-                    lesson_file.save(file_path)
-                    lesson_file_url = filename
+                    lesson_file_url = store_file(lesson_file, 'lesson_files', ext)
                 else:
                     # URL orqali fayl
                     file_url_input = request.form.get('file_url', '').strip()
@@ -398,6 +284,11 @@ def create_lesson(id):
         )
         db.session.add(lesson)
         db.session.commit()
+        invalidate_subject(subject.id)
+        
+        for upload_id in (video_upload_id, lesson_file_upload_id):
+            if upload_id:
+                discard_upload(upload_id)
         
         flash("Dars muvaffaqiyatli qo'shildi", 'success')
         return redirect(url_for('courses.detail', id=id))
@@ -413,10 +304,7 @@ def edit_lesson(id):
     subject = lesson.subject
     
     # Faqat o'qituvchi yoki admin darsni tahrirlashi mumkin
-    is_teacher = TeacherSubject.query.filter_by(
-        teacher_id=current_user.id,
-        subject_id=subject.id
-    ).first() is not None
+    is_teacher = teaches_subject(current_user.id, subject.id)
     
     if not is_teacher and current_user.role != 'admin':
         flash("Sizda darsni tahrirlash uchun ruxsat yo'q", 'error')
@@ -426,24 +314,26 @@ def edit_lesson(id):
         video_filename = lesson.video_file  # Eski faylni saqlash
         lesson_file_url = lesson.file_url  # Eski faylni saqlash
         
+        # Almashtirilgan fayllar commit'dan keyin (boshqa murojaat qolmasa) o'chiriladi
+        old_video_file = lesson.video_file
+        old_file_url = lesson.file_url
+        
+        # Bo'laklab yuklangan fayllar (identifikator orqali)
+        video_upload_id = request.form.get('video_upload_id', '').strip()
+        lesson_file_upload_id = request.form.get('lesson_file_upload_id', '').strip()
+        
         # Video fayl yuklash (yangi fayl yuklansa, eski o'rniga yangisini qo'yish)
-        if 'video_file' in request.files:
+        if video_upload_id:
+            video_filename = finished_upload_filename(video_upload_id, current_user.id, 'video')
+            if not video_filename:
+                flash("Video yuklash hali yakunlanmagan yoki topilmadi", 'error')
+                return render_template('courses/edit_lesson.html', lesson=lesson, subject=subject)
+        elif 'video_file' in request.files:
             video = request.files['video_file']
             if video and video.filename and allowed_video(video.filename):
-                # Eski video faylni o'chirish
-                if lesson.video_file:
-                    old_video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', lesson.video_file)
-                    if os.path.exists(old_video_path):
-                        try:
-                            os.remove(old_video_path)
-                        except:
-                            pass
-                
                 # Yangi video faylni saqlash
                 ext = video.filename.rsplit('.', 1)[1].lower()
-                video_filename = f"{uuid.uuid4().hex}.{ext}"
-                video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', video_filename)
-                video.save(video_path)
+                video_filename = store_file(video, 'videos', ext)
         
         # Video URL faqat YouTube link bo'lishi kerak
         video_url = request.form.get('video_url', '').strip()
@@ -452,14 +342,7 @@ def edit_lesson(id):
             if 'youtube.com' not in video_url and 'youtu.be' not in video_url:
                 flash("Video URL faqat YouTube link bo'lishi kerak (youtube.com yoki youtu.be)", 'error')
                 return render_template('courses/edit_lesson.html', lesson=lesson, subject=subject)
-            # Agar yangi URL kiritilgan bo'lsa, video_file ni None qilish va eski faylni o'chirish
-            if lesson.video_file:
-                old_video_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', lesson.video_file)
-                if os.path.exists(old_video_path):
-                    try:
-                        os.remove(old_video_path)
-                    except:
-                        pass
+            # Agar yangi URL kiritilgan bo'lsa, video_file ni None qilish
             video_filename = None
         elif not video_filename:
             # Agar yangi video yuklanmagan bo'lsa, eski videoni saqlash
@@ -468,45 +351,29 @@ def edit_lesson(id):
         
         # O'qituvchi uchun fayl yuklash
         if current_user.role == 'teacher' or current_user.role == 'admin':
+            uploaded_file = None
+            if lesson_file_upload_id:
+                uploaded_file = finished_upload_filename(lesson_file_upload_id, current_user.id, 'lesson_file')
+            
             # Fayl yuklash
-            if 'lesson_file' in request.files:
+            if uploaded_file:
+                lesson_file_url = uploaded_file
+            elif 'lesson_file' in request.files:
                 lesson_file = request.files['lesson_file']
                 if lesson_file and lesson_file.filename:
-                    # Eski faylni o'chirish (agar yuklangan bo'lsa)
-                    if lesson.file_url and not ('http://' in lesson.file_url or 'https://' in lesson.file_url):
-                        old_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'lesson_files', lesson.file_url)
-                        if os.path.exists(old_file_path):
-                            try:
-                                os.remove(old_file_path)
-                            except:
-                                pass
-                    
                     # Fayl formatini tekshirish
-                    allowed_extensions = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt', 'zip', 'rar'}
+                    allowed_extensions = LESSON_FILE_EXTENSIONS
                     ext = lesson_file.filename.rsplit('.', 1)[1].lower() if '.' in lesson_file.filename else ''
                     if ext not in allowed_extensions:
                         flash("Ruxsat berilmagan fayl formati. Ruxsatli formatlar: PDF, DOC, DOCX, XLS, XLSX, PPT, PPTX, TXT, ZIP, RAR", 'error')
                         return render_template('courses/edit_lesson.html', lesson=lesson, subject=subject)
                     
                     # Faylni saqlash
-                    filename = f"{uuid.uuid4().hex}.{ext}"
-                    files_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'lesson_files')
-                    os.makedirs(files_folder, exist_ok=True)
-                    file_path = os.path.join(files_folder, filename)
-                    lesson_file.save(file_path)
-                    lesson_file_url = filename
+                    lesson_file_url = store_file(lesson_file, 'lesson_files', ext)
                 else:
                     # URL orqali fayl
                     file_url_input = request.form.get('file_url', '').strip()
                     if file_url_input:
-                        # Agar eski fayl yuklangan bo'lsa, o'chirish
-                        if lesson.file_url and not ('http://' in lesson.file_url or 'https://' in lesson.file_url):
-                            old_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'lesson_files', lesson.file_url)
-                            if os.path.exists(old_file_path):
-                                try:
-                                    os.remove(old_file_path)
-                                except:
-                                    pass
                         lesson_file_url = file_url_input
                     else:
                         # Agar yangi fayl yoki URL kiritilmagan bo'lsa, eski faylni saqlash
@@ -519,14 +386,6 @@ def edit_lesson(id):
             # Boshqa rollar uchun ixtiyoriy
             file_url_input = request.form.get('file_url', '').strip()
             if file_url_input:
-                # Agar eski fayl yuklangan bo'lsa, o'chirish
-                if lesson.file_url and not ('http://' in lesson.file_url or 'https://' in lesson.file_url):
-                    old_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'lesson_files', lesson.file_url)
-                    if os.path.exists(old_file_path):
-                        try:
-                            os.remove(old_file_path)
-                        except:
-                            pass
                 lesson_file_url = file_url_input
             else:
                 lesson_file_url = lesson.file_url  # Eski faylni saqlash
@@ -541,6 +400,17 @@ def edit_lesson(id):
         lesson.lesson_type = request.form.get('lesson_type', 'maruza')
         
         db.session.commit()
+        invalidate_subject(subject.id)
+        
+        # Eski fayllarni bo'shatish (boshqa darslar ishlatmayotgan bo'lsa)
+        if old_video_file and old_video_file != lesson.video_file:
+            release_file('videos', old_video_file)
+        if old_file_url and old_file_url != lesson.file_url:
+            release_file('lesson_files', old_file_url)
+        
+        for upload_id in (video_upload_id, lesson_file_upload_id):
+            if upload_id:
+                discard_upload(upload_id)
         
         flash("Dars muvaffaqiyatli yangilandi", 'success')
         return redirect(url_for('courses.lesson_detail', id=id))
@@ -548,18 +418,104 @@ def edit_lesson(id):
     return render_template('courses/edit_lesson.html', lesson=lesson, subject=subject)
 
 
+@bp.route('/uploads/chunked', methods=['POST'])
+@login_required
+def start_chunked_upload():
+    """Bo'laklab yuklashni boshlash API"""
+    if current_user.role not in ['teacher', 'admin']:
+        return jsonify({'success': False, 'error': "Sizda fayl yuklash uchun ruxsat yo'q"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    kind = data.get('kind', 'video')
+    
+    if kind == 'video' and not allowed_video(filename):
+        return jsonify({'success': False, 'error': "Ruxsat berilmagan video formati"}), 400
+    if kind == 'lesson_file':
+        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        if ext not in LESSON_FILE_EXTENSIONS:
+            return jsonify({'success': False, 'error': "Ruxsat berilmagan fayl formati"}), 400
+    
+    try:
+        meta = create_upload(
+            current_user.id,
+            filename,
+            kind,
+            data.get('total_size'),
+            data.get('chunk_size')
+        )
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': e.message}), e.status
+    
+    return jsonify({'success': True, **upload_status(meta)})
+
+
+@bp.route('/uploads/chunked/<upload_id>', methods=['GET'])
+@login_required
+def chunked_upload_status(upload_id):
+    """Bo'laklab yuklash holati (qaysi bo'laklar qabul qilingan)"""
+    try:
+        meta = load_upload(upload_id, current_user.id)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': e.message}), e.status
+    
+    return jsonify({'success': True, **upload_status(meta)})
+
+
+@bp.route('/uploads/chunked/<upload_id>/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id, index):
+    """Bitta bo'lakni qabul qilish (so'rov tanasi - bo'lak baytlari)"""
+    try:
+        meta = load_upload(upload_id, current_user.id)
+        digest = write_chunk(meta, index, request.stream, request.headers.get('X-Chunk-Sha256'))
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': e.message}), e.status
+    
+    return jsonify({'success': True, 'index': index, 'sha256': digest})
+
+
+@bp.route('/uploads/chunked/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_chunked_upload(upload_id):
+    """Bo'laklarni yakuniy faylga yig'ish"""
+    try:
+        meta = load_upload(upload_id, current_user.id)
+        complete_upload(meta)
+    except ChunkedUploadError as e:
+        return jsonify({'success': False, 'error': e.message}), e.status
+    
+    return jsonify({'success': True, 'upload_id': upload_id})
+
+
+def _can_view_subject(subject, include_dean=True):
+    """Foydalanuvchi fan materiallarini ko'rishi mumkinmi"""
+    if current_user.role == 'admin':
+        return True
+    if current_user.role == 'dean' and not include_dean:
+        return False
+    return can_view_subject(current_user, subject)
+
+
 @bp.route('/uploads/videos/<filename>')
 @login_required
 def serve_video(filename):
-    """Video faylni uzatish"""
-    videos_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos')
-    return send_from_directory(videos_folder, filename)
+    """Video faylni uzatish (Range / 206 qo'llab-quvvatlanadi)"""
+    # Ruxsatni tekshirish (bir xil fayl bir nechta darsda ishlatilishi mumkin)
+    lessons = Lesson.query.filter_by(video_file=filename).all()
+    if not lessons:
+        abort(404)
+    
+    if not any(_can_view_subject(lesson.subject) for lesson in lessons):
+        abort(403)
+    
+    return send_video(file_directory('videos', filename), filename)
 
 @bp.route('/uploads/lesson_files/<filename>')
 @login_required
 def serve_lesson_file(filename):
     """Dars faylini uzatish"""
-    files_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'lesson_files')
+    files_folder = file_directory('lesson_files', filename)
     file_path = os.path.join(files_folder, filename)
     
     # Fayl mavjudligini tekshirish
@@ -568,29 +524,12 @@ def serve_lesson_file(filename):
         return redirect(url_for('courses.index'))
     
     # Ruxsatni tekshirish
-    lesson = Lesson.query.filter_by(file_url=filename).first()
-    if not lesson:
+    lessons = Lesson.query.filter_by(file_url=filename).all()
+    if not lessons:
         # URL bo'lsa, to'g'ridan-to'g'ri qaytarish
         return send_from_directory(files_folder, filename, as_attachment=True)
     
-    subject = lesson.subject
-    
-    # Tekshirish
-    can_view = False
-    if current_user.role == 'admin':
-        can_view = True
-    elif current_user.role == 'teacher':
-        can_view = TeacherSubject.query.filter_by(
-            teacher_id=current_user.id,
-            subject_id=subject.id
-        ).first() is not None
-    elif current_user.role == 'student' and current_user.group_id:
-        can_view = TeacherSubject.query.filter_by(
-            group_id=current_user.group_id,
-            subject_id=subject.id
-        ).first() is not None
-    
-    if not can_view:
+    if not any(_can_view_subject(lesson.subject, include_dean=False) for lesson in lessons):
         flash("Sizda bu faylni ko'rish huquqi yo'q", 'error')
         return redirect(url_for('courses.index'))
     
@@ -600,7 +539,7 @@ def serve_lesson_file(filename):
 @login_required
 def serve_submission_file(filename):
     """Topshiriq faylini ko'rsatish"""
-    submissions_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'submissions')
+    submissions_folder = file_directory('submissions', filename)
     file_path = os.path.join(submissions_folder, filename)
     
     # Fayl mavjudligini tekshirish
@@ -609,24 +548,23 @@ def serve_submission_file(filename):
         return redirect(url_for('courses.index'))
     
     # Ruxsatni tekshirish - faqat fayl egasi yoki o'qituvchi ko'ra oladi
-    submission = Submission.query.filter_by(file_url=filename).first()
-    if not submission:
+    submissions = Submission.query.filter_by(file_url=filename).all()
+    if not submissions:
         flash("Fayl topilmadi", 'error')
         return redirect(url_for('courses.index'))
     
     # Talaba o'z faylini ko'ra oladi
-    if current_user.role == 'student' and submission.student_id != current_user.id:
-        flash("Sizda bu faylni ko'rish huquqi yo'q", 'error')
-        return redirect(url_for('courses.index'))
+    if current_user.role == 'student':
+        if not any(s.student_id == current_user.id for s in submissions):
+            flash("Sizda bu faylni ko'rish huquqi yo'q", 'error')
+            return redirect(url_for('courses.index'))
     
     # O'qituvchi o'z guruhlaridagi talabalarning fayllarini ko'ra oladi
     if current_user.role == 'teacher':
-        assignment = submission.assignment
-        teaching = TeacherSubject.query.filter_by(
-            teacher_id=current_user.id,
-            subject_id=assignment.subject_id,
-            group_id=assignment.group_id
-        ).first()
+        teaching = any(
+            teaches_group(current_user.id, s.assignment.group_id, s.assignment.subject_id)
+            for s in submissions
+        )
         if not teaching:
             flash("Sizda bu faylni ko'rish huquqi yo'q", 'error')
             return redirect(url_for('courses.index'))
@@ -642,23 +580,7 @@ def lesson_detail(id):
     subject = lesson.subject
     
     # Tekshirish
-    can_view = False
-    if current_user.role == 'admin':
-        can_view = True
-    elif current_user.role == 'dean':
-        can_view = subject.faculty_id == current_user.faculty_id
-    elif current_user.role == 'teacher':
-        can_view = TeacherSubject.query.filter_by(
-            teacher_id=current_user.id,
-            subject_id=subject.id
-        ).first() is not None
-    elif current_user.role == 'student' and current_user.group_id:
-        can_view = TeacherSubject.query.filter_by(
-            group_id=current_user.group_id,
-            subject_id=subject.id
-        ).first() is not None
-    
-    if not can_view:
+    if not _can_view_subject(subject):
         flash("Sizda bu darsni ko'rish huquqi yo'q", 'error')
         return redirect(url_for('courses.index'))
     
@@ -673,22 +595,8 @@ def lesson_detail(id):
         
         # Oldingi darslar to'liq ko'rilganligini tekshirish (faqat videoga ega darslar uchun)
         if lesson.video_file or lesson.video_url:
-            previous_lessons = Lesson.query.filter(
-                Lesson.subject_id == subject.id,
-                Lesson.lesson_type == lesson.lesson_type,
-                Lesson.order < lesson.order
-            ).order_by(Lesson.order).all()
-            
-            for prev_lesson in previous_lessons:
-                if prev_lesson.video_file or prev_lesson.video_url:
-                    prev_lesson_view = LessonView.query.filter_by(
-                        lesson_id=prev_lesson.id,
-                        student_id=current_user.id
-                    ).first()
-                    
-                    if not prev_lesson_view or not prev_lesson_view.is_completed:
-                        is_locked = True
-                        break
+            progression = LessonProgression(current_user.id, subject.id, lesson.lesson_type)
+            is_locked = progression.is_locked(lesson)
     
     return render_template('courses/lesson_detail.html', 
                          lesson=lesson, 
@@ -708,46 +616,17 @@ def watch_video(id):
         flash("Bu darsda video mavjud emas", 'warning')
         return redirect(url_for('courses.lesson_detail', id=id))
     
-    # Tekshirish
-    can_view = False
-    if current_user.role == 'admin':
-        can_view = True
-    elif current_user.role == 'teacher':
-        can_view = TeacherSubject.query.filter_by(
-            teacher_id=current_user.id,
-            subject_id=subject.id
-        ).first() is not None
-    elif current_user.role == 'student' and current_user.group_id:
-        can_view = TeacherSubject.query.filter_by(
-            group_id=current_user.group_id,
-            subject_id=subject.id
-        ).first() is not None
-    
-    if not can_view:
+    # Tekshirish (dekan video sahifasini ochmaydi)
+    if not _can_view_subject(subject, include_dean=False):
         flash("Sizda bu darsni ko'rish huquqi yo'q", 'error')
         return redirect(url_for('courses.index'))
     
     # Talaba uchun: oldingi darslar to'liq ko'rilganligini tekshirish
     is_locked = False
     if current_user.role == 'student':
-        # Bir xil fan va dars turidagi oldingi darslarni olish
-        previous_lessons = Lesson.query.filter(
-            Lesson.subject_id == subject.id,
-            Lesson.lesson_type == lesson.lesson_type,
-            Lesson.order < lesson.order
-        ).order_by(Lesson.order).all()
-        
-        # Har bir oldingi dars to'liq ko'rilganligini tekshirish
-        for prev_lesson in previous_lessons:
-            if prev_lesson.video_file or prev_lesson.video_url:  # Faqat videoga ega darslar
-                prev_lesson_view = LessonView.query.filter_by(
-                    lesson_id=prev_lesson.id,
-                    student_id=current_user.id
-                ).first()
-                
-                if not prev_lesson_view or not prev_lesson_view.is_completed:
-                    is_locked = True
-                    break
+        # Bir xil fan va dars turidagi oldingi video darslar to'liq ko'rilganmi
+        progression = LessonProgression(current_user.id, subject.id, lesson.lesson_type)
+        is_locked = progression.is_locked(lesson)
     
     if is_locked and current_user.role == 'student':
         flash("Avval oldingi videolarni to'liq ko'rib chiqing!", 'warning')
@@ -769,14 +648,16 @@ def watch_video(id):
             )
             db.session.add(lesson_view)
             db.session.commit()
+        else:
+            # Buferda hali yozilmagan ko'rish vaqtini hisobga olish
+            buffered = watch_buffer.buffered_duration(lesson.id, current_user.id)
+            if buffered and buffered > (lesson_view.watch_duration or 0):
+                lesson_view.watch_duration = buffered
         
         # Keyingi darsni topish (bir xil fan va dars turida)
-        next_lesson = Lesson.query.filter(
-            Lesson.subject_id == subject.id,
-            Lesson.lesson_type == lesson.lesson_type,
-            Lesson.order > lesson.order,
-            (Lesson.video_file != None) | (Lesson.video_url != None)
-        ).order_by(Lesson.order).first()
+        next_entry = get_video_sequence(subject.id, lesson.lesson_type).next_after(lesson.order)
+        if next_entry:
+            next_lesson = Lesson.query.get(next_entry[0])
     
     return render_template('courses/watch_video.html',
                          lesson=lesson,
@@ -813,15 +694,13 @@ def attention_check(id):
     
     db.session.commit()
     
+    if lesson_view.is_completed:
+        watch_buffer.mark_completed(lesson.id, current_user.id)
+    
     # Keyingi darsni topish (bir xil fan va dars turida)
     next_lesson = None
     if lesson_view.is_completed and not was_completed:
-        next_lesson = Lesson.query.filter(
-            Lesson.subject_id == lesson.subject_id,
-            Lesson.lesson_type == lesson.lesson_type,
-            Lesson.order > lesson.order,
-            (Lesson.video_file != None) | (Lesson.video_url != None)
-        ).order_by(Lesson.order).first()
+        next_lesson = get_video_sequence(lesson.subject_id, lesson.lesson_type).next_after(lesson.order)
     
     response = {
         'success': True,
@@ -830,10 +709,11 @@ def attention_check(id):
     }
     
     if next_lesson:
+        next_lesson_id, _, next_lesson_title = next_lesson
         response['next_lesson'] = {
-            'id': next_lesson.id,
-            'title': next_lesson.title,
-            'url': url_for('courses.watch_video', id=next_lesson.id)
+            'id': next_lesson_id,
+            'title': next_lesson_title,
+            'url': url_for('courses.watch_video', id=next_lesson_id)
         }
     
     return jsonify(response)
@@ -846,26 +726,45 @@ def update_watch_time(id):
     if current_user.role != 'student':
         return jsonify({'success': False}), 403
     
-    lesson_view = LessonView.query.filter_by(
-        lesson_id=id,
-        student_id=current_user.id
-    ).first()
-    
-    if lesson_view:
-        watch_duration = request.json.get('watch_duration', 0)
-        lesson_view.watch_duration = max(lesson_view.watch_duration, watch_duration)
-        db.session.commit()
-        
+    # Qiymat xotiradagi buferga yoziladi, bazaga paketlab yoziladi
+    data = request.get_json(silent=True) or {}
+    watch_duration = data.get('watch_duration', 0)
+    segments = parse_segments(data.get('segments'))
+    video_length = data.get('video_length')
+    if not isinstance(video_length, (int, float)) or video_length <= 0:
+        video_length = None
+    state = watch_buffer.record(
+        id,
+        current_user.id,
+        watch_duration,
+        segments=segments,
+        video_length=video_length
+    )
+    
+    if state:
         # Maksimal ko'rilgan vaqtni qaytarish
         return jsonify({
             'success': True,
-            'watch_duration': lesson_view.watch_duration,
-            'is_completed': lesson_view.is_completed
+            'watch_duration': state[0],
+            'is_completed': state[1]
         })
     
     return jsonify({'success': True, 'watch_duration': 0})
 
 
+@bp.route('/lessons/<int:id>/watch-analytics')
+@login_required
+def watch_analytics(id):
+    """Dars videosi bo'yicha qamrov va auditoriya xaritasi API"""
+    lesson = Lesson.query.get_or_404(id)
+    
+    if current_user.role == 'student' or not _can_view_subject(lesson.subject):
+        return jsonify({'success': False, 'error': "Sizda bu ma'lumotni ko'rish huquqi yo'q"}), 403
+    
+    report = lesson_coverage_report(lesson.id)
+    return jsonify({'success': True, 'lesson_id': lesson.id, **report})
+
+
 @bp.route('/<int:id>/assignments/create', methods=['GET', 'POST'])
 @login_required
 def create_assignment(id):
@@ -873,16 +772,13 @@ def create_assignment(id):
     subject = Subject.query.get_or_404(id)
     
     # O'qituvchi dars beradigan guruhlar
-    teacher_groups = TeacherSubject.query.filter_by(
-        teacher_id=current_user.id,
-        subject_id=subject.id
-    ).all()
+    teacher_group_id_set = teacher_group_ids(current_user.id, subject.id)
     
-    if not teacher_groups and current_user.role != 'admin':
+    if not teacher_group_id_set and current_user.role != 'admin':
         flash("Sizda topshiriq yaratish uchun ruxsat yo'q", 'error')
         return redirect(url_for('courses.detail', id=id))
     
-    groups = [tg.group for tg in teacher_groups]
+    groups = Group.query.filter(Group.id.in_(teacher_group_id_set)).order_by(Group.name).all() if teacher_group_id_set else []
     
     if request.method == 'POST':
         due_date_str = request.form.get('due_date')
@@ -917,29 +813,27 @@ def assignment_detail(id):
     subject = assignment.subject
     
     # O'qituvchi yoki adminmi?
-    is_teacher = TeacherSubject.query.filter_by(
-        teacher_id=current_user.id,
-        subject_id=subject.id,
-        group_id=assignment.group_id
-    ).first() is not None
+    is_teacher = teaches_group(current_user.id, assignment.group_id, subject.id)
     
     if is_teacher or current_user.role == 'admin':
-        submissions = assignment.submissions.all()
-        
-        # Guruh talabalari
-        group_students = User.query.filter_by(
-            role='student',
-            group_id=assignment.group_id
-        ).all()
-        
-        # Topshirmagan talabalar
-        submitted_ids = [s.student_id for s in submissions]
-        not_submitted = [s for s in group_students if s.id not in submitted_ids]
-        
+        # Javob yuborgan va yubormagan talabalar (keyset sahifalash)
+        submitted = submitted_page(
+            assignment,
+            after=request.args.get('submitted_after', type=int)
+        )
+        pending = not_submitted_page(
+            assignment,
+            after=request.args.get('not_submitted_after', type=int)
+        )
+
         return render_template('courses/assignment_submissions.html',
                              assignment=assignment,
-                             submissions=submissions,
-                             not_submitted=not_submitted)
+                             submissions=submitted.items,
+                             not_submitted=pending.items,
+                             submitted_count=submitted.total,
+                             not_submitted_count=pending.total,
+                             next_submitted_after=submitted.next_after,
+                             next_not_submitted_after=pending.next_after)
     else:
         submission = Submission.query.filter_by(
             student_id=current_user.id,
@@ -989,11 +883,7 @@ def submit_assignment(id):
             
             # Faylni saqlash
             ext = file.filename.rsplit('.', 1)[1].lower()
-            filename = f"{uuid.uuid4().hex}.{ext}"
-            submissions_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'submissions')
-            file_path = os.path.join(submissions_folder, filename)
-            file.save(file_path)
-            file_url = filename
+            file_url = store_file(file, 'submissions', ext)
     
     # Fayl majburiy bo'lsa tekshirish
     if assignment.file_required and not file_url:
@@ -1010,17 +900,11 @@ def submit_assignment(id):
         assignment_id=id
     ).first()
     
+    old_file_url = None
     if existing:
         existing.content = content
         if file_url:
-            # Eski faylni o'chirish
-            if existing.file_url:
-                old_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'submissions', existing.file_url)
-                if os.path.exists(old_file_path):
-                    try:
-                        os.remove(old_file_path)
-                    except:
-                        pass
+            old_file_url = existing.file_url
             existing.file_url = file_url
         existing.submitted_at = datetime.utcnow()
         flash("Javobingiz yangilandi", 'success')
@@ -1035,6 +919,10 @@ def submit_assignment(id):
         flash("Javobingiz muvaffaqiyatli yuborildi", 'success')
     
     db.session.commit()
+    
+    # Eski faylni bo'shatish
+    if old_file_url and old_file_url != file_url:
+        release_file('submissions', old_file_url)
     return redirect(url_for('courses.assignment_detail', id=id))
 
 
@@ -1047,11 +935,7 @@ def grade_submission(id):
     subject = assignment.subject
     
     # O'qituvchi yoki adminmi?
-    is_teacher = TeacherSubject.query.filter_by(
-        teacher_id=current_user.id,
-        subject_id=subject.id,
-        group_id=assignment.group_id
-    ).first() is not None
+    is_teacher = teaches_group(current_user.id, assignment.group_id, subject.id)
     
     if not is_teacher and current_user.role != 'admin':
         flash("Sizda baho qo'yish uchun ruxsat yo'q", 'error')
@@ -1067,46 +951,51 @@ def grade_submission(id):
     return redirect(url_for('courses.assignment_detail', id=assignment.id))
 
 
+@bp.route('/assignments/<int:id>/grade-bulk', methods=['POST'])
+@login_required
+def grade_bulk(id):
+    """Bir nechta javobni bitta so'rov va bitta tranzaksiyada baholash"""
+    assignment = Assignment.query.get_or_404(id)
+    wants_json = request.is_json
+
+    # Ruxsat topshiriq uchun bir marta tekshiriladi
+    is_teacher = teaches_group(current_user.id, assignment.group_id, assignment.subject_id)
+    if not is_teacher and current_user.role != 'admin':
+        if wants_json:
+            return jsonify({'success': False, 'error': "Sizda baho qo'yish uchun ruxsat yo'q"}), 403
+        flash("Sizda baho qo'yish uchun ruxsat yo'q", 'error')
+        return redirect(url_for('courses.assignment_detail', id=id))
+
+    rows = parse_grade_rows(request)
+    graded, errors = apply_bulk_grades(assignment, rows, current_user.id)
+
+    if wants_json:
+        if errors:
+            return jsonify({'success': False, 'graded': 0, 'errors': errors}), 400
+        return jsonify({'success': True, 'graded': graded, 'errors': []})
+
+    if errors:
+        for error in errors:
+            flash(f"#{error['submission_id']}: {error['error']}", 'error')
+    elif graded:
+        flash(f"{graded} ta javob baholandi", 'success')
+    else:
+        flash("Baholash uchun ball kiritilmagan", 'warning')
+    return redirect(url_for('courses.assignment_detail', id=id))
+
+
 @bp.route('/grades')
 @login_required
 def grades():
     """Baholar"""
     if current_user.role == 'student':
-        submissions = Submission.query.filter(
-            Submission.student_id == current_user.id,
-            Submission.score != None
-        ).order_by(Submission.graded_at.desc()).all()
-        
-        # Fanlar bo'yicha guruhlash
-        grades_by_subject = {}
-        for sub in submissions:
-            subject = sub.assignment.subject
-            if subject.id not in grades_by_subject:
-                grades_by_subject[subject.id] = {
-                    'subject': subject,
-                    'submissions': [],
-                    'total_score': 0,
-                    'max_score': 0
-                }
-            grades_by_subject[subject.id]['submissions'].append(sub)
-            grades_by_subject[subject.id]['total_score'] += sub.score
-            grades_by_subject[subject.id]['max_score'] += sub.assignment.max_score
-        
+        # Fanlar bo'yicha guruhlangan baholar (bitta proyeksiya so'rovi)
+        grades_by_subject = student_grades_by_subject(current_user.id)
         return render_template('courses/grades.html', grades_by_subject=grades_by_subject)
     
     elif current_user.role == 'teacher':
         # O'qituvchining fanlari va guruhlari
-        teacher_assignments = TeacherSubject.query.filter_by(teacher_id=current_user.id).all()
-        
-        subject_groups = {}
-        for ta in teacher_assignments:
-            if ta.subject.id not in subject_groups:
-                subject_groups[ta.subject.id] = {
-                    'subject': ta.subject,
-                    'groups': []
-                }
-            subject_groups[ta.subject.id]['groups'].append(ta.group)
-        
+        subject_groups = teacher_subject_groups(current_user.id)
         return render_template('courses/teacher_grades.html', subject_groups=subject_groups)
     
     else:
@@ -1121,44 +1010,19 @@ def group_grades(subject_id, group_id):
     group = Group.query.get_or_404(group_id)
     
     # Tekshirish
-    is_teacher = TeacherSubject.query.filter_by(
-        teacher_id=current_user.id,
-        subject_id=subject_id,
-        group_id=group_id
-    ).first() is not None
+    is_teacher = teaches_group(current_user.id, group_id, subject_id)
     
     if not is_teacher and current_user.role not in ['admin', 'dean']:
         flash("Sizda bu sahifani ko'rish huquqi yo'q", 'error')
         return redirect(url_for('courses.grades'))
     
-    # Guruh talabalari
-    students = User.query.filter_by(role='student', group_id=group_id).order_by(User.full_name).all()
-    
-    # Fan topshiriqlari
-    assignments = Assignment.query.filter_by(subject_id=subject_id, group_id=group_id).all()
-    
-    # Har bir talabaning baholari
-    student_grades = {}
-    for student in students:
-        student_grades[student.id] = {
-            'student': student,
-            'submissions': {},
-            'total': 0,
-            'max_total': 0
-        }
-        for assignment in assignments:
-            submission = Submission.query.filter_by(
-                student_id=student.id,
-                assignment_id=assignment.id
-            ).first()
-            student_grades[student.id]['submissions'][assignment.id] = submission
-            if submission and submission.score:
-                student_grades[student.id]['total'] += submission.score
-            student_grades[student.id]['max_total'] += assignment.max_score
+    # Talaba x topshiriq baholar jadvali (bitta so'rov)
+    gradebook = Gradebook(subject_id, group_id)
     
     return render_template('courses/group_grades.html',
                          subject=subject,
                          group=group,
-                         students=students,
-                         assignments=assignments,
-                         student_grades=student_grades)
+                         students=gradebook.students,
+                         assignments=gradebook.assignments,
+                         student_grades=gradebook.as_student_grades(),
+                         gradebook=gradebook)
@@ -2,8 +2,10 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from app.models import User, Faculty, Group, Subject, TeacherSubject, Schedule, Announcement
 from app import db
+from app.utils import access_index
+from app.utils.scopes import faculty_group_ids, faculty_students_filter
 from functools import wraps
-from sqlalchemy import func
+from sqlalchemy import func, select
 from datetime import datetime
 
 bp = Blueprint('dean', __name__, url_prefix='/dean')
@@ -82,6 +84,7 @@ def create_group():
         )
         db.session.add(group)
         db.session.commit()
+        access_index.invalidate()
         
         flash("Guruh muvaffaqiyatli yaratildi", 'success')
         return redirect(url_for('dean.groups'))
@@ -128,6 +131,7 @@ def delete_group(id):
     else:
         db.session.delete(group)
         db.session.commit()
+        access_index.invalidate()
         flash("Guruh o'chirildi", 'success')
     
     return redirect(url_for('dean.groups'))
@@ -260,6 +264,7 @@ def create_assignment():
         )
         db.session.add(assignment)
         db.session.commit()
+        access_index.invalidate()
         
         teacher = User.query.get(teacher_id)
         subject = Subject.query.get(subject_id)
@@ -284,6 +289,7 @@ def delete_assignment(id):
     
     db.session.delete(assignment)
     db.session.commit()
+    access_index.invalidate()
     flash("Biriktirma o'chirildi", 'success')
     
     return redirect(url_for('dean.teacher_assignments'))
@@ -303,13 +309,8 @@ def students():
     search = request.args.get('search', '')
     group_id = request.args.get('group', type=int)
     
-    # Fakultet guruhlari
-    faculty_group_ids = [g.id for g in faculty.groups.all()]
-    
-    query = User.query.filter(
-        User.role == 'student',
-        User.group_id.in_(faculty_group_ids)
-    )
+    # Fakultet talabalari
+    query = User.query.filter(faculty_students_filter(faculty.id))
     
     if search:
         query = query.filter(
@@ -454,10 +455,9 @@ def teachers():
         return redirect(url_for('main.dashboard'))
     
     # Fakultetda dars beradigan o'qituvchilar
-    teacher_ids = db.session.query(TeacherSubject.teacher_id).join(Subject).filter(
+    teacher_ids = select(TeacherSubject.teacher_id).join(Subject, Subject.id == TeacherSubject.subject_id).where(
         Subject.faculty_id == faculty.id
-    ).distinct().all()
-    teacher_ids = [t[0] for t in teacher_ids]
+    )
     
     teachers = User.query.filter(User.id.in_(teacher_ids)).order_by(User.full_name).all()
     
@@ -494,8 +494,7 @@ def schedule():
             Schedule.day_of_week, Schedule.start_time
         ).all()
     else:
-        group_ids = [g.id for g in groups]
-        schedules = Schedule.query.filter(Schedule.group_id.in_(group_ids)).order_by(
+        schedules = Schedule.query.filter(Schedule.group_id.in_(faculty_group_ids(faculty.id))).order_by(
             Schedule.day_of_week, Schedule.start_time
         ).all()
     
@@ -581,15 +580,10 @@ def reports():
         return redirect(url_for('main.dashboard'))
     
     # Fakultet statistikasi
-    faculty_group_ids = [g.id for g in faculty.groups.all()]
-    
     stats = {
         'total_groups': faculty.groups.count(),
         'total_subjects': faculty.subjects.count(),
-        'total_students': User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(faculty_group_ids)
-        ).count(),
+        'total_students': User.query.filter(faculty_students_filter(faculty.id)).count(),
         'total_teachers': db.session.query(TeacherSubject.teacher_id).join(Subject).filter(
             Subject.faculty_id == faculty.id
         ).distinct().count(),
@@ -633,11 +627,7 @@ def export_students():
         excel_file = create_students_excel(students, f"{faculty.name} - {group.name}")
         filename = f"talabalar_{group.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     else:
-        group_ids = [g.id for g in faculty.groups.all()]
-        students = User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(group_ids)
-        ).order_by(User.full_name).all()
+        students = User.query.filter(faculty_students_filter(faculty.id)).order_by(User.full_name).all()
         excel_file = create_students_excel(students, faculty.name)
         filename = f"talabalar_{faculty.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     
@@ -673,8 +663,7 @@ def export_schedule():
         excel_file = create_schedule_excel(schedules, group.name, None)
         filename = f"dars_jadvali_{group.name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     else:
-        group_ids = [g.id for g in faculty.groups.all()]
-        schedules = Schedule.query.filter(Schedule.group_id.in_(group_ids)).order_by(Schedule.day_of_week, Schedule.start_time).all()
+        schedules = Schedule.query.filter(Schedule.group_id.in_(faculty_group_ids(faculty.id))).order_by(Schedule.day_of_week, Schedule.start_time).all()
         excel_file = create_schedule_excel(schedules, None, faculty.name)
         filename = f"dars_jadvali_{faculty.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     
@@ -3,11 +3,34 @@ from flask_login import login_required, current_user
 from app.models import User, Subject, Assignment, Announcement, Schedule, Submission, Message, Group, Faculty, TeacherSubject
 from app import db
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, exists, and_
 from app.utils.translations import get_translation, get_current_language
+from app.utils.pending_feed import get_pending_feed, load_pending_feed
+from app.utils.fragment_cache import cached_fragment
+from app.utils.conversations import (
+    inbox_query, partner_column, build_chats, record_message, mark_conversation_read,
+    history_page, get_summary, publish_message, publish_read,
+    ensure_backfilled as ensure_conversations_backfilled
+)
+from app.utils.announcement_audience import (
+    targeted_announcements, index_announcement, audience_faculty_ids, unread_count, mark_seen,
+    backfill_audiences
+)
+from app.utils.access_index import (
+    teacher_group_ids, teacher_subject_ids
+)
+from app.utils.scopes import faculty_group_ids, faculty_students_filter
+from app.utils.message_policy import (
+    can_message as can_message_user, contactable_ids, available_users as available_contacts
+)
 
 bp = Blueprint('main', __name__)
 
+@bp.cli.command('backfill-announcements')
+def backfill_announcements_command():
+    """Eski e'lonlar auditoriya indeksini to'ldirish (deploydan keyin bir marta)"""
+    print(f"Indekslangan e'lonlar: {backfill_audiences()}")
+
 @bp.route('/set-language/<lang>')
 def set_language(lang):
     """Tilni o'zgartirish"""
@@ -30,43 +53,53 @@ def dashboard():
     }
     
     if current_user.role == 'admin':
-        context.update({
+        stats = cached_fragment('admin_stats', 'all', ('users', 'structure'), lambda: {
             'total_users': User.query.count(),
             'total_faculties': Faculty.query.count(),
             'total_teachers': User.query.filter_by(role='teacher').count(),
-            'total_students': User.query.filter_by(role='student').count(),
-            'recent_users': User.query.order_by(User.created_at.desc()).limit(5).all()
+            'total_students': User.query.filter_by(role='student').count()
         })
+        recent_user_ids = cached_fragment('recent_users', 'all', ('users',), lambda: [
+            user_id for (user_id,) in db.session.query(User.id).order_by(User.created_at.desc()).limit(5)
+        ])
+        context.update(stats)
+        context['recent_users'] = load_by_ids(User, recent_user_ids)
     
     elif current_user.role == 'dean':
         faculty = Faculty.query.get(current_user.faculty_id)
         if faculty:
-            faculty_group_ids = [g.id for g in faculty.groups.all()]
+            def faculty_stats():
+                return {
+                    'total_groups': faculty.groups.count(),
+                    'total_subjects': faculty.subjects.count(),
+                    'total_students': User.query.filter(faculty_students_filter(faculty.id)).count()
+                }
+            stats = cached_fragment('dean_stats', faculty.id, ('users', 'structure'), faculty_stats)
+            announcement_ids = cached_fragment('recent_announcements', faculty.id, ('announcements',), lambda: [
+                announcement_id for (announcement_id,) in targeted_announcements(
+                    current_user, (faculty.id,)
+                ).with_entities(Announcement.id).order_by(None).order_by(
+                    Announcement.created_at.desc()
+                ).limit(5)
+            ])
+            context.update(stats)
             context.update({
                 'faculty': faculty,
-                'total_groups': faculty.groups.count(),
-                'total_subjects': faculty.subjects.count(),
-                'total_students': User.query.filter(
-                    User.role == 'student',
-                    User.group_id.in_(faculty_group_ids)
-                ).count(),
-                'recent_announcements': Announcement.query.order_by(Announcement.created_at.desc()).limit(5).all()
+                'recent_announcements': load_by_ids(Announcement, announcement_ids)
             })
     
     elif current_user.role == 'teacher':
         # O'qituvchiga biriktirilgan fanlar
-        teaching = TeacherSubject.query.filter_by(teacher_id=current_user.id).all()
-        subjects = list(set([t.subject for t in teaching]))
-        groups = list(set([t.group for t in teaching]))
+        subject_ids = teacher_subject_ids(current_user.id)
+        group_ids = teacher_group_ids(current_user.id)
+        subjects = Subject.query.filter(Subject.id.in_(subject_ids)).order_by(Subject.code).all() if subject_ids else []
+        groups = Group.query.filter(Group.id.in_(group_ids)).order_by(Group.name).all() if group_ids else []
         
-        # Baholanmagan topshiriqlar
-        pending_count = 0
-        for ts in teaching:
-            pending_count += Submission.query.join(Assignment).filter(
-                Assignment.subject_id == ts.subject_id,
-                Assignment.group_id == ts.group_id,
-                Submission.score == None
-            ).count()
+        # Baholanmagan topshiriqlar (bitta so'rov)
+        pending_count = cached_fragment(
+            'teacher_pending', current_user.id, ('submissions', 'structure'),
+            lambda: get_teacher_pending_count(current_user)
+        )
         
         context.update({
             'my_subjects': subjects,
@@ -83,32 +116,39 @@ def dashboard():
         subjects = current_user.get_subjects() if group else []
         
         # To'lov ma'lumotlari
-        from app.models import StudentPayment
-        payment = StudentPayment.query.filter_by(student_id=current_user.id).first()
-        payment_info = None
-        if payment:
-            payment_info = {
-                'contract': float(payment.contract_amount),
-                'paid': float(payment.paid_amount),
-                'remaining': float(payment.get_remaining_amount()),
-                'percentage': payment.get_payment_percentage()
-            }
+        payment_info = cached_fragment(
+            'payment_info', current_user.id, ('payments',),
+            lambda: get_payment_info(current_user)
+        )
+        
+        # Javob yuborilmagan topshiriqlar (muddati o'tgan / yaqinlashayotgan)
+        pending_ids = cached_fragment(
+            'pending_feed', current_user.id, ('submissions',),
+            lambda: [assignment.id for assignment in get_pending_feed(current_user).items]
+        )
+        pending = load_pending_feed(pending_ids)
         
         context.update({
             'group': group,
             'my_subjects': subjects,
             'total_subjects': len(subjects),
-            'pending_assignments': get_pending_assignments(current_user),
+            'pending_assignments': pending.items,
+            'overdue_assignments': pending.overdue,
+            'upcoming_assignments': pending.upcoming,
             'recent_grades': get_recent_grades(current_user),
             'today_schedule': get_today_schedule(current_user),
             'payment_info': payment_info
         })
     
-    # E'lonlar
-    context['announcements'] = Announcement.query.order_by(
-        Announcement.is_important.desc(),
-        Announcement.created_at.desc()
-    ).limit(3).all()
+    # Foydalanuvchiga mo'ljallangan e'lonlar
+    audience_faculties = audience_faculty_ids(current_user)
+    announcement_ids = cached_fragment('dashboard_announcements', audience_faculties, ('announcements',), lambda: [
+        announcement_id for (announcement_id,) in targeted_announcements(
+            current_user, audience_faculties
+        ).with_entities(Announcement.id).limit(3)
+    ])
+    context['announcements'] = load_by_ids(Announcement, announcement_ids)
+    context['unread_announcements'] = unread_count(current_user)
     
     return render_template('dashboard.html', **context)
 
@@ -122,9 +162,9 @@ def schedule():
     elif current_user.role == 'student' and current_user.group_id:
         schedules = Schedule.query.filter_by(group_id=current_user.group_id).all()
     elif current_user.role == 'dean' and current_user.faculty_id:
-        faculty = Faculty.query.get(current_user.faculty_id)
-        group_ids = [g.id for g in faculty.groups.all()]
-        schedules = Schedule.query.filter(Schedule.group_id.in_(group_ids)).all()
+        schedules = Schedule.query.filter(
+            Schedule.group_id.in_(faculty_group_ids(current_user.faculty_id))
+        ).all()
     else:
         schedules = Schedule.query.all()
     
@@ -146,10 +186,11 @@ def schedule():
 @login_required
 def announcements():
     page = request.args.get('page', 1, type=int)
-    announcements = Announcement.query.order_by(
-        Announcement.is_important.desc(),
-        Announcement.created_at.desc()
-    ).paginate(page=page, per_page=10)
+    announcements = targeted_announcements(current_user).paginate(page=page, per_page=10)
+    
+    # Birinchi sahifa ochilganda barcha e'lonlar ko'rilgan deb belgilanadi
+    if page == 1:
+        mark_seen(current_user)
     
     return render_template('announcements.html', announcements=announcements)
 
@@ -175,6 +216,8 @@ def create_announcement():
             faculty_id=current_user.faculty_id if current_user.role == 'dean' else None
         )
         db.session.add(announcement)
+        db.session.flush()
+        index_announcement(announcement)
         db.session.commit()
         
         flash("E'lon muvaffaqiyatli yaratildi", 'success')
@@ -185,157 +228,32 @@ def create_announcement():
 @bp.route('/messages')
 @login_required
 def messages():
-    from app.models import TeacherSubject
-    
-    # Ruxsatli foydalanuvchilarni aniqlash
-    allowed_user_ids = set()
-    
-    if current_user.role == 'student':
-        # Talaba faqat o'ziga biriktirilgan o'qituvchi va dekanga yozishi mumkin
-        if current_user.group_id:
-            # O'z guruhiga biriktirilgan o'qituvchilar
-            teaching_assignments = TeacherSubject.query.filter_by(group_id=current_user.group_id).all()
-            teacher_ids = [ta.teacher_id for ta in teaching_assignments]
-            allowed_user_ids.update(teacher_ids)
-            
-            # O'z fakultetidagi dekan
-            student_group = Group.query.get(current_user.group_id)
-            if student_group and student_group.faculty_id:
-                faculty_dean = User.query.filter_by(
-                    role='dean',
-                    faculty_id=student_group.faculty_id
-                ).first()
-                if faculty_dean:
-                    allowed_user_ids.add(faculty_dean.id)
-        
-    elif current_user.role == 'dean':
-        # Dekan faqat o'z fakultetidagi talabalarga yozishi mumkin
-        if current_user.faculty_id:
-            faculty_groups = Group.query.filter_by(faculty_id=current_user.faculty_id).all()
-            group_ids = [g.id for g in faculty_groups]
-            students = User.query.filter(
-                User.role == 'student',
-                User.group_id.in_(group_ids)
-            ).all()
-            allowed_user_ids.update([s.id for s in students])
-        
-    elif current_user.role == 'teacher':
-        # O'qituvchi o'z guruhlaridagi talabalarga yozishi mumkin
-        teaching_groups = TeacherSubject.query.filter_by(teacher_id=current_user.id).all()
-        group_ids = [tg.group_id for tg in teaching_groups]
-        students = User.query.filter(
-            User.role == 'student',
-            User.group_id.in_(group_ids)
-        ).all()
-        allowed_user_ids.update([s.id for s in students])
-        
-        # O'qituvchilar o'rtasida ham yozish mumkin
-        teachers = User.query.filter_by(role='teacher').filter(User.id != current_user.id).all()
-        allowed_user_ids.update([t.id for t in teachers])
-        
-        # Dekanlarga ham yozish mumkin
-        deans = User.query.filter_by(role='dean').all()
-        allowed_user_ids.update([d.id for d in deans])
-        
-    else:
-        # Admin va boshqalar barcha foydalanuvchilar bilan yozishi mumkin
-        all_users = User.query.filter(User.id != current_user.id).all()
-        allowed_user_ids.update([u.id for u in all_users])
-    
-    # Barcha suhbatlar (faqat ruxsatli foydalanuvchilar bilan)
-    sent = db.session.query(Message.receiver_id).filter_by(sender_id=current_user.id).filter(Message.receiver_id.in_(allowed_user_ids)).distinct()
-    received = db.session.query(Message.sender_id).filter_by(receiver_id=current_user.id).filter(Message.sender_id.in_(allowed_user_ids)).distinct()
-    
-    user_ids = set([r[0] for r in sent] + [r[0] for r in received])
-    chat_users = User.query.filter(User.id.in_(user_ids)).all()
-    
-    # Har bir foydalanuvchi bilan so'nggi xabar
-    chats = []
-    for user in chat_users:
-        last_message = Message.query.filter(
-            ((Message.sender_id == current_user.id) & (Message.receiver_id == user.id)) |
-            ((Message.sender_id == user.id) & (Message.receiver_id == current_user.id))
-        ).order_by(Message.created_at.desc()).first()
-        
-        unread_count = Message.query.filter_by(
-            sender_id=user.id,
-            receiver_id=current_user.id,
-            is_read=False
-        ).count()
-        
-        chats.append({
-            'user': user,
-            'last_message': last_message,
-            'unread_count': unread_count
-        })
-    
-    chats.sort(key=lambda x: x['last_message'].created_at if x['last_message'] else datetime.min, reverse=True)
+    # Suhbatlar (faqat ruxsatli foydalanuvchilar bilan), so'nggi xabar bo'yicha
+    page = request.args.get('page', 1, type=int)
+    conversations = inbox_query(current_user.id).filter(
+        partner_column(current_user.id).in_(contactable_ids(current_user))
+    ).paginate(page=page, per_page=20)
+    chats = build_chats(current_user.id, conversations.items)
     
     # Ruxsatli foydalanuvchilar ro'yxati (yangi suhbat boshlash uchun)
-    available_users = User.query.filter(User.id.in_(allowed_user_ids)).filter(User.id != current_user.id).all()
+    available_users = available_contacts(current_user)
     
-    return render_template('messages.html', chats=chats, available_users=available_users)
+    return render_template('messages.html', chats=chats, conversations=conversations, available_users=available_users)
 
 @bp.route('/messages/<int:user_id>', methods=['GET', 'POST'])
 @login_required
 def chat(user_id):
-    from app.models import TeacherSubject, Group
-    
     other_user = User.query.get_or_404(user_id)
     
     # Ruxsatni tekshirish
-    can_message = False
-    
-    if current_user.role == 'student':
-        # Talaba faqat o'ziga biriktirilgan o'qituvchi va dekanga yozishi mumkin
-        can_message = False
-        
-        if current_user.group_id:
-            # O'z guruhiga biriktirilgan o'qituvchilarga
-            if other_user.role == 'teacher':
-                teaching = TeacherSubject.query.filter_by(
-                    teacher_id=other_user.id,
-                    group_id=current_user.group_id
-                ).first()
-                can_message = teaching is not None
-            
-            # O'z fakultetidagi dekanga
-            elif other_user.role == 'dean':
-                student_group = Group.query.get(current_user.group_id)
-                if student_group and student_group.faculty_id:
-                    can_message = other_user.faculty_id == student_group.faculty_id
-        
-    elif current_user.role == 'dean':
-        # Dekan faqat o'z fakultetidagi talabalarga yozishi mumkin
-        if other_user.role == 'student' and current_user.faculty_id:
-            if other_user.group_id:
-                group = Group.query.get(other_user.group_id)
-                can_message = group and group.faculty_id == current_user.faculty_id
-        else:
-            can_message = False
-            
-    elif current_user.role == 'teacher':
-        # O'qituvchi o'z guruhlaridagi talabalarga, boshqa o'qituvchilarga va dekanlarga yozishi mumkin
-        if other_user.role == 'student':
-            if other_user.group_id:
-                teaching = TeacherSubject.query.filter_by(
-                    teacher_id=current_user.id,
-                    group_id=other_user.group_id
-                ).first()
-                can_message = teaching is not None
-        elif other_user.role in ['teacher', 'dean']:
-            can_message = True
-        else:
-            can_message = False
-            
-    else:
-        # Admin va boshqalar barcha foydalanuvchilar bilan yozishi mumkin
-        can_message = True
+    can_message = can_message_user(current_user, other_user)
     
     if not can_message:
         flash("Siz bu foydalanuvchiga xabar yubora olmaysiz", 'error')
         return redirect(url_for('main.messages'))
     
+    ensure_conversations_backfilled()
+    
     if request.method == 'POST':
         content = request.form.get('content')
         if content:
@@ -345,23 +263,29 @@ def chat(user_id):
                 content=content
             )
             db.session.add(message)
+            db.session.flush()
+            record_message(message)
             db.session.commit()
+            publish_message(message)
     
-    # Xabarlarni o'qilgan deb belgilash
-    Message.query.filter_by(
-        sender_id=user_id,
-        receiver_id=current_user.id,
-        is_read=False
-    ).update({'is_read': True})
-    db.session.commit()
-    
-    # Barcha xabarlar
-    messages = Message.query.filter(
-        ((Message.sender_id == current_user.id) & (Message.receiver_id == user_id)) |
-        ((Message.sender_id == user_id) & (Message.receiver_id == current_user.id))
-    ).order_by(Message.created_at.asc()).all()
-    
-    return render_template('chat.html', other_user=other_user, messages=messages)
+    # O'qilgan xabarlar chegarasini (high-water mark) surish
+    if mark_conversation_read(current_user.id, user_id):
+        db.session.commit()
+        publish_read(current_user.id, user_id)
+    
+    # Suhbat tarixi (eng so'nggi xabarlar, `before` bilan eskilari)
+    messages, has_older = history_page(
+        current_user.id,
+        user_id,
+        before=request.args.get('before', type=int)
+    )
+    summary = get_summary(current_user.id, user_id)
+    
+    return render_template('chat.html',
+                         other_user=other_user,
+                         messages=messages,
+                         older_cursor=messages[0].id if has_older and messages else None,
+                         partner_read_id=summary.read_id_for(user_id) if summary else 0)
 
 @bp.route('/settings', methods=['GET', 'POST'])
 @login_required
@@ -395,40 +319,64 @@ def get_greeting():
         return "Xayrli kun"
     return "Xayrli kech"
 
+def load_by_ids(model, ids):
+    """Keshlangan identifikatorlar bo'yicha obyektlar (tartib saqlanadi)"""
+    if not ids:
+        return []
+    objects = {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()}
+    return [objects[obj_id] for obj_id in ids if obj_id in objects]
+
 def get_today_schedule(user):
     today = datetime.now().weekday()
     if today > 5:
         return []
     
     if user.role == 'teacher':
-        return Schedule.query.filter(
-            Schedule.teacher_id == user.id,
-            Schedule.day_of_week == today
-        ).order_by(Schedule.start_time).all()
+        condition = Schedule.teacher_id == user.id
     elif user.role == 'student' and user.group_id:
-        return Schedule.query.filter(
-            Schedule.group_id == user.group_id,
-            Schedule.day_of_week == today
-        ).order_by(Schedule.start_time).all()
-    return []
-
-def get_pending_assignments(user):
-    if not user.group_id:
+        condition = Schedule.group_id == user.group_id
+    else:
         return []
     
-    assignments = Assignment.query.filter_by(group_id=user.group_id).all()
-    pending = []
-    for assignment in assignments:
-        submission = Submission.query.filter_by(
-            student_id=user.id,
-            assignment_id=assignment.id
-        ).first()
-        if not submission:
-            pending.append(assignment)
-    return pending[:5]
+    schedule_ids = cached_fragment('today_schedule', (user.id, today), ('schedule',), lambda: [
+        schedule_id for (schedule_id,) in db.session.query(Schedule.id).filter(
+            condition,
+            Schedule.day_of_week == today
+        ).order_by(Schedule.start_time)
+    ])
+    return load_by_ids(Schedule, schedule_ids)
+
+def get_payment_info(user):
+    from app.models import StudentPayment
+    payment = StudentPayment.query.filter_by(student_id=user.id).first()
+    if not payment:
+        return None
+    return {
+        'contract': float(payment.contract_amount),
+        'paid': float(payment.paid_amount),
+        'remaining': float(payment.get_remaining_amount()),
+        'percentage': payment.get_payment_percentage()
+    }
+
+def get_teacher_pending_count(user):
+    """O'qituvchi dars beradigan fan-guruhlardagi baholanmagan javoblar soni"""
+    teaches = exists().where(and_(
+        TeacherSubject.teacher_id == user.id,
+        TeacherSubject.subject_id == Assignment.subject_id,
+        TeacherSubject.group_id == Assignment.group_id
+    ))
+    return db.session.query(func.count(Submission.id)).join(
+        Assignment, Assignment.id == Submission.assignment_id
+    ).filter(
+        Submission.score == None,
+        teaches
+    ).scalar() or 0
 
 def get_recent_grades(user):
-    return Submission.query.filter(
-        Submission.student_id == user.id,
-        Submission.score != None
-    ).order_by(Submission.graded_at.desc()).limit(5).all()
+    submission_ids = cached_fragment('recent_grades', user.id, ('submissions',), lambda: [
+        submission_id for (submission_id,) in db.session.query(Submission.id).filter(
+            Submission.student_id == user.id,
+            Submission.score != None
+        ).order_by(Submission.graded_at.desc()).limit(5)
+    ])
+    return load_by_ids(Submission, submission_ids)
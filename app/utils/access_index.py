@@ -0,0 +1,254 @@
+import time
+import threading
+from itertools import chain
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import TeacherSubject, Group, Subject, Faculty, User
+from app import db
+
+
+# O'zgarishi indeksga ta'sir qiladigan modellar
+WATCHED_MODELS = (TeacherSubject, Group, Subject, Faculty)
+
+
+class AccessIndexVersion(db.Model):
+    """Indeks versiyasi (bitta qator) - barcha ishchi jarayonlar uchun umumiy.
+
+    Biriktirma, guruh, fan yoki fakultet o'zgargan tranzaksiya versiyani
+    oshiradi; har bir jarayon so'rov boshida versiyani tekshirib, eskirgan
+    indeksni qayta yuklaydi.
+    """
+    __tablename__ = 'access_index_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AccessIndex:
+    """O'qituvchi-fan-guruh biriktirmalarining xotiradagi indeksi.
+
+    TeacherSubject jadvali (teacher, subject, group, lesson_type) bitta so'rov
+    bilan yuklanadi va har tomonlama kalitlangan to'plamlarga joylanadi.
+    Guruhlarning fakulteti ham shu yerda saqlanadi.
+    """
+
+    def __init__(self):
+        self.teacher_subjects = {}
+        self.teacher_groups = {}
+        self.group_subjects = {}
+        self.group_teachers = {}
+        self.teacher_subject_groups = {}
+        self.sections = set()
+        self.group_faculty = {}
+
+        rows = db.session.query(
+            TeacherSubject.teacher_id,
+            TeacherSubject.subject_id,
+            TeacherSubject.group_id,
+            TeacherSubject.lesson_type
+        ).all()
+        for teacher_id, subject_id, group_id, lesson_type in rows:
+            self.teacher_subjects.setdefault(teacher_id, set()).add(subject_id)
+            self.teacher_groups.setdefault(teacher_id, set()).add(group_id)
+            self.group_subjects.setdefault(group_id, set()).add(subject_id)
+            self.group_teachers.setdefault(group_id, set()).add(teacher_id)
+            self.teacher_subject_groups.setdefault((teacher_id, subject_id), set()).add(group_id)
+            self.sections.add((teacher_id, subject_id, group_id, lesson_type))
+
+        for group_id, faculty_id in db.session.query(Group.id, Group.faculty_id).all():
+            self.group_faculty[group_id] = faculty_id
+
+
+_lock = threading.Lock()
+_state = {'index': None, 'loaded_at': 0.0, 'version': 0, 'db_version': None}
+
+
+def _db_version():
+    """Bazadagi indeks versiyasi (so'rov davomida bir marta o'qiladi)"""
+    if 'access_index_version' in g:
+        return g.access_index_version
+    version = db.session.query(AccessIndexVersion.version).filter_by(id=1).scalar() or 0
+    g.access_index_version = version
+    return version
+
+
+def get_access_index():
+    """Joriy indeks (bazadagi versiya o'zgargan, muddati o'tgan yoki bekor
+    qilingan bo'lsa qayta yuklanadi)"""
+    ttl = current_app.config.get('ACCESS_INDEX_TTL', 60)
+    db_version = _db_version()
+    with _lock:
+        index = _state['index']
+        fresh = (
+            index is not None
+            and _state['db_version'] == db_version
+            and time.monotonic() - _state['loaded_at'] < ttl
+        )
+        version = _state['version']
+    if fresh:
+        return index
+
+    index = AccessIndex()
+    with _lock:
+        # Yuklash paytida invalidate() chaqirilgan bo'lsa, eski natijani saqlamaslik
+        if _state['version'] == version:
+            _state['index'] = index
+            _state['loaded_at'] = time.monotonic()
+            _state['db_version'] = db_version
+    return index
+
+
+def invalidate():
+    """Joriy jarayondagi indeksni bekor qilish.
+
+    Boshqa jarayonlar bazadagi versiya orqali xabardor bo'ladi - u
+    WATCHED_MODELS o'zgargan har bir flush'da avtomatik oshiriladi.
+    """
+    with _lock:
+        _state['index'] = None
+        _state['version'] += 1
+    if has_app_context():
+        g.pop('access_index_version', None)
+
+
+# ==================== MODEL HODISALARI ====================
+def _touches_index(session):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, WATCHED_MODELS):
+            return True
+        # O'chirilgan foydalanuvchi biriktirmalari bilan birga ketadi
+        if isinstance(obj, User) and obj in session.deleted:
+            return True
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_version(session, flush_context):
+    if session.info.get('access_index_changed') or not _touches_index(session):
+        return
+    # Versiya o'zgarish bilan bir tranzaksiyada oshiriladi
+    table = AccessIndexVersion.__table__
+    bump = update(table).where(table.c.id == 1).values(version=table.c.version + 1)
+    connection = session.connection()
+    if not connection.execute(bump).rowcount:
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(id=1, version=1))
+        except IntegrityError:
+            # Qatorni boshqa jarayon bir vaqtda yaratgan
+            connection.execute(bump)
+    session.info['access_index_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    if session.info.pop('access_index_changed', None):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_change(session):
+    session.info.pop('access_index_changed', None)
+
+
+# ==================== YORDAMCHI FUNKSIYALAR ====================
+def teaches_subject(teacher_id, subject_id):
+    """O'qituvchi fanga (qaysidir guruhda) biriktirilganmi"""
+    return subject_id in get_access_index().teacher_subjects.get(teacher_id, ())
+
+
+def teaches_group(teacher_id, group_id, subject_id=None):
+    """O'qituvchi guruhga (berilgan bo'lsa, shu fan bo'yicha) dars beradimi"""
+    index = get_access_index()
+    if subject_id is None:
+        return group_id in index.teacher_groups.get(teacher_id, ())
+    return group_id in index.teacher_subject_groups.get((teacher_id, subject_id), ())
+
+
+def group_has_subject(group_id, subject_id):
+    """Guruhga fan biriktirilganmi"""
+    return subject_id in get_access_index().group_subjects.get(group_id, ())
+
+
+def teacher_subject_ids(teacher_id):
+    return set(get_access_index().teacher_subjects.get(teacher_id, ()))
+
+
+def teacher_group_ids(teacher_id, subject_id=None):
+    index = get_access_index()
+    if subject_id is None:
+        return set(index.teacher_groups.get(teacher_id, ()))
+    return set(index.teacher_subject_groups.get((teacher_id, subject_id), ()))
+
+
+def teacher_sections(teacher_id):
+    """O'qituvchining (subject_id, group_id) juftliklari"""
+    index = get_access_index()
+    return {
+        (subject_id, group_id)
+        for subject_id in index.teacher_subjects.get(teacher_id, ())
+        for group_id in index.teacher_subject_groups.get((teacher_id, subject_id), ())
+    }
+
+
+def group_subject_ids(group_id):
+    return set(get_access_index().group_subjects.get(group_id, ()))
+
+
+def group_teacher_ids(group_id):
+    return set(get_access_index().group_teachers.get(group_id, ()))
+
+
+def group_faculty_id(group_id):
+    """Guruh fakulteti (indeksda bo'lmasa, bazadan olinadi)"""
+    if not group_id:
+        return None
+    index = get_access_index()
+    if group_id not in index.group_faculty:
+        group = Group.query.get(group_id)
+        index.group_faculty[group_id] = group.faculty_id if group else None
+    return index.group_faculty[group_id]
+
+
+def can_view_subject(user, subject):
+    """Foydalanuvchi fan sahifasi va materiallarini ko'rishi mumkinmi"""
+    if user.role == 'admin':
+        return True
+    if user.role == 'dean':
+        return subject.faculty_id == user.faculty_id
+    if user.role == 'teacher':
+        return teaches_subject(user.id, subject.id)
+    if user.role == 'student' and user.group_id:
+        return group_has_subject(user.group_id, subject.id)
+    return False
+
+
+def can_message(user, other):
+    """Foydalanuvchi boshqa foydalanuvchiga xabar yozishi mumkinmi"""
+    if user.role == 'student':
+        # Talaba faqat o'ziga biriktirilgan o'qituvchi va dekanga yozishi mumkin
+        if not user.group_id:
+            return False
+        if other.role == 'teacher':
+            return teaches_group(other.id, user.group_id)
+        if other.role == 'dean':
+            faculty_id = group_faculty_id(user.group_id)
+            return bool(faculty_id) and other.faculty_id == faculty_id
+        return False
+
+    if user.role == 'dean':
+        # Dekan faqat o'z fakultetidagi talabalarga yozishi mumkin
+        if other.role == 'student' and user.faculty_id and other.group_id:
+            return group_faculty_id(other.group_id) == user.faculty_id
+        return False
+
+    if user.role == 'teacher':
+        # O'qituvchi o'z guruhlaridagi talabalarga, boshqa o'qituvchilarga va dekanlarga yozishi mumkin
+        if other.role == 'student':
+            return bool(other.group_id) and teaches_group(user.id, other.group_id)
+        return other.role in ['teacher', 'dean']
+
+    # Admin va boshqalar barcha foydalanuvchilar bilan yozishi mumkin
+    return True
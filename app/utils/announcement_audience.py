@@ -0,0 +1,173 @@
+from sqlalchemy import and_, exists, func, or_
+from sqlalchemy.exc import IntegrityError
+from app.models import Announcement, User
+from app.utils.access_index import group_faculty_id, teacher_group_ids
+from app import db
+
+
+# Barcha rollar uchun e'lon
+ALL_ROLES = '*'
+# Barcha fakultetlar uchun e'lon (NULL o'rniga - unikal cheklov ishlashi uchun)
+ALL_FACULTIES = 0
+
+
+class AnnouncementAudience(db.Model):
+    """E'lon auditoriyasi indeksi: (rol x fakultet) bo'yicha bitta qator.
+
+    `target_roles` vergul bilan ajratilgan satr bo'lgani uchun uni so'rovda
+    indeks bilan filtrlash mumkin emas. Bu jadval har bir e'lon uchun
+    maqsadli rollarni (bo'sh bo'lsa '*') va fakultetni (bo'sh bo'lsa
+    ALL_FACULTIES) alohida qatorlarda saqlaydi.
+    """
+    __tablename__ = 'announcement_audience'
+    __table_args__ = (
+        db.UniqueConstraint('announcement_id', 'role', 'faculty_id', name='uq_announcement_audience'),
+        db.Index('ix_announcement_audience_lookup', 'role', 'faculty_id', 'announcement_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    announcement_id = db.Column(db.Integer, db.ForeignKey(Announcement.id, ondelete='CASCADE'), nullable=False, index=True)
+    role = db.Column(db.String(20), nullable=False)
+    faculty_id = db.Column(db.Integer, nullable=False, default=ALL_FACULTIES)
+
+
+class AnnouncementReadMarker(db.Model):
+    """Foydalanuvchi ko'rgan eng oxirgi e'lon (o'qilmaganlar soni uchun)"""
+    __tablename__ = 'announcement_read_marker'
+
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
+    last_seen_id = db.Column(db.Integer, nullable=False, default=0)
+
+
+def parse_target_roles(target_roles):
+    roles = [role.strip() for role in (target_roles or '').split(',') if role.strip()]
+    return roles or [ALL_ROLES]
+
+
+def index_announcement(announcement):
+    """E'lon uchun auditoriya qatorlarini qo'shish (commit chaqiruvchida).
+
+    Har bir qator alohida savepoint'da qo'shiladi: boshqa jarayon xuddi shu
+    qatorni allaqachon yozgan bo'lsa (unikal cheklov), u o'tkazib yuboriladi.
+    """
+    for role in dict.fromkeys(parse_target_roles(announcement.target_roles)):
+        try:
+            with db.session.begin_nested():
+                db.session.add(AnnouncementAudience(
+                    announcement_id=announcement.id,
+                    role=role,
+                    faculty_id=announcement.faculty_id or ALL_FACULTIES
+                ))
+        except IntegrityError:
+            continue
+
+
+def backfill_audiences(batch_size=500):
+    """Indekslanmagan eski e'lonlarni indekslash (`flask main backfill-announcements`).
+
+    So'rovlar ichida chaqirilmaydi. Indekslangan e'lonlar sonini qaytaradi.
+    """
+    count = 0
+    while True:
+        missing = Announcement.query.filter(
+            ~exists().where(AnnouncementAudience.announcement_id == Announcement.id)
+        ).order_by(Announcement.id).limit(batch_size).all()
+        if not missing:
+            return count
+        for announcement in missing:
+            index_announcement(announcement)
+        db.session.commit()
+        count += len(missing)
+
+
+def audience_faculty_ids(user):
+    """Foydalanuvchi qaysi fakultetlar e'lonlarini ko'radi (saralangan kortej).
+
+    O'qituvchiga fakultet biriktirilmaydi - u dars beradigan guruhlar
+    fakultetlari olinadi. Buxgalteriya butun universitet bilan ishlaydi:
+    None - barcha fakultetlar.
+    """
+    if user.role == 'student':
+        faculty_ids = {group_faculty_id(user.group_id)} if user.group_id else set()
+    elif user.role == 'teacher':
+        faculty_ids = {group_faculty_id(group_id) for group_id in teacher_group_ids(user.id)}
+        faculty_ids.add(user.faculty_id)
+    elif user.role == 'accounting' and not user.faculty_id:
+        return None
+    else:
+        faculty_ids = {user.faculty_id}
+    return tuple(sorted(faculty_id for faculty_id in faculty_ids if faculty_id))
+
+
+def audience_filter(user, faculty_ids, announcement_id=None):
+    """Foydalanuvchiga tegishli e'lonlar sharti (admin hammasini ko'radi).
+
+    `faculty_ids` - `audience_faculty_ids` natijasi (None - barcha fakultetlar),
+    `announcement_id` - e'lon identifikatori ustuni (standart: Announcement.id).
+    """
+    if user.role == 'admin':
+        return None
+    if announcement_id is None:
+        announcement_id = Announcement.id
+    conditions = [
+        AnnouncementAudience.announcement_id == announcement_id,
+        AnnouncementAudience.role.in_([user.role, ALL_ROLES])
+    ]
+    if faculty_ids is not None:
+        faculty_condition = AnnouncementAudience.faculty_id == ALL_FACULTIES
+        if faculty_ids:
+            faculty_condition = or_(faculty_condition, AnnouncementAudience.faculty_id.in_(faculty_ids))
+        conditions.append(faculty_condition)
+    return exists().where(and_(*conditions))
+
+
+def targeted_announcements(user, faculty_ids=None):
+    """Foydalanuvchiga mo'ljallangan e'lonlar so'rovi (muhimlari birinchi)"""
+    if faculty_ids is None:
+        faculty_ids = audience_faculty_ids(user)
+    query = Announcement.query
+    condition = audience_filter(user, faculty_ids)
+    if condition is not None:
+        query = query.filter(condition)
+    return query.order_by(
+        Announcement.is_important.desc(),
+        Announcement.created_at.desc()
+    )
+
+
+def unread_count(user):
+    """Oxirgi ko'rilgan e'londan keyingi mo'ljallangan e'lonlar soni"""
+    last_seen_id = db.session.query(AnnouncementReadMarker.last_seen_id).filter(
+        AnnouncementReadMarker.user_id == user.id
+    ).scalar() or 0
+    query = db.session.query(func.count(Announcement.id)).filter(Announcement.id > last_seen_id)
+    condition = audience_filter(user, audience_faculty_ids(user))
+    if condition is not None:
+        query = query.filter(condition)
+    return query.scalar() or 0
+
+
+def mark_seen(user):
+    """Foydalanuvchi barcha mo'ljallangan e'lonlarni ko'rdi deb belgilash"""
+    query = db.session.query(func.max(Announcement.id))
+    condition = audience_filter(user, audience_faculty_ids(user))
+    if condition is not None:
+        query = query.filter(condition)
+    latest_id = query.scalar()
+    if not latest_id:
+        return
+
+    # Belgi faqat oldinga suriladi: parallel so'rovlar uni orqaga qaytarmaydi
+    advance = AnnouncementReadMarker.query.filter(
+        AnnouncementReadMarker.user_id == user.id,
+        AnnouncementReadMarker.last_seen_id < latest_id
+    )
+    if not advance.update({'last_seen_id': latest_id}, synchronize_session=False):
+        if db.session.query(exists().where(AnnouncementReadMarker.user_id == user.id)).scalar():
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(AnnouncementReadMarker(user_id=user.id, last_seen_id=latest_id))
+        except IntegrityError:
+            advance.update({'last_seen_id': latest_id}, synchronize_session=False)
+    db.session.commit()
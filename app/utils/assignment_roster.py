@@ -0,0 +1,57 @@
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import and_, exists, func
+from sqlalchemy.orm import contains_eager
+from app.models import Submission, User
+from app import db
+
+
+# items - joriy sahifa, total - umumiy soni, next_after - keyingi sahifa kursori (yoki None)
+RosterPage = namedtuple('RosterPage', ['items', 'total', 'next_after'])
+
+
+def roster_page_size():
+    return current_app.config.get('ASSIGNMENT_ROSTER_PAGE_SIZE', 50)
+
+
+def _paginate(query, key_column, after, limit):
+    """Keyset sahifalash: `after` dan keyingi `limit` ta qator"""
+    if after:
+        query = query.filter(key_column > after)
+    rows = query.order_by(key_column).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1].id if has_more else None)
+
+
+def submitted_page(assignment, after=None, limit=None):
+    """Topshiriqqa javob yuborgan talabalar (Submission.id bo'yicha)"""
+    limit = limit or roster_page_size()
+    condition = Submission.assignment_id == assignment.id
+
+    # Talaba shu so'rovning o'zida yuklanadi - shablonda submission.student so'rovsiz
+    query = Submission.query.outerjoin(User, User.id == Submission.student_id).options(
+        contains_eager(Submission.student)
+    ).filter(condition)
+    submissions, next_after = _paginate(query, Submission.id, after, limit)
+    total = db.session.query(func.count(Submission.id)).filter(condition).scalar()
+    return RosterPage(submissions, total, next_after)
+
+
+def not_submitted_page(assignment, after=None, limit=None):
+    """Guruhdagi javob yubormagan talabalar (NOT EXISTS, User.id bo'yicha)"""
+    limit = limit or roster_page_size()
+    conditions = (
+        User.role == 'student',
+        User.group_id == assignment.group_id,
+        ~exists().where(and_(
+            Submission.assignment_id == assignment.id,
+            Submission.student_id == User.id
+        ))
+    )
+
+    students, next_after = _paginate(
+        User.query.filter(*conditions), User.id, after, limit
+    )
+    total = db.session.query(func.count(User.id)).filter(*conditions).scalar()
+    return RosterPage(students, total, next_after)
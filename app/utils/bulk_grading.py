@@ -0,0 +1,97 @@
+from datetime import datetime
+from app.models import Submission
+from app.utils.fragment_cache import fragment_cache
+from app import db
+
+
+def parse_grade_rows(request):
+    """So'rovdan (submission_id, score, feedback) qatorlarini olish.
+
+    JSON: {"grades": [{"submission_id": 1, "score": 80, "feedback": "..."}]}
+    Forma: score_<submission_id> va feedback_<submission_id> maydonlari
+    (bo'sh ball maydonlari o'tkazib yuboriladi).
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        items = data.get('grades') if isinstance(data, dict) else None
+        rows = []
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict):
+                rows.append((item.get('submission_id'), item.get('score'), item.get('feedback')))
+            else:
+                rows.append((None, None, None))
+        return rows
+
+    rows = []
+    for field, value in request.form.items():
+        if not field.startswith('score_') or value.strip() == '':
+            continue
+        submission_id = field[len('score_'):]
+        rows.append((submission_id, value, request.form.get(f'feedback_{submission_id}')))
+    return rows
+
+
+def apply_bulk_grades(assignment, rows, grader_id):
+    """Baholarni tekshirish va bitta tranzaksiyada yozish.
+
+    Har bir qator alohida tekshiriladi va barcha xatolar birga qaytariladi.
+    Xato bo'lsa hech narsa yozilmaydi. (yozilgan qatorlar soni, xatolar) qaytaradi.
+    """
+    errors = []
+    parsed = {}
+    for position, (submission_id, score, feedback) in enumerate(rows, start=1):
+        try:
+            submission_id = int(submission_id)
+        except (TypeError, ValueError):
+            errors.append({'row': position, 'submission_id': submission_id, 'error': "Noto'g'ri topshiriq javobi identifikatori"})
+            continue
+        try:
+            score = int(score)
+        except (TypeError, ValueError):
+            errors.append({'row': position, 'submission_id': submission_id, 'error': "Ball butun son bo'lishi kerak"})
+            continue
+        if score < 0 or score > assignment.max_score:
+            errors.append({'row': position, 'submission_id': submission_id, 'error': f"Ball 0 dan {assignment.max_score} gacha bo'lishi kerak"})
+            continue
+        if submission_id in parsed:
+            errors.append({'row': position, 'submission_id': submission_id, 'error': "Javob bir necha marta berilgan"})
+            continue
+        parsed[submission_id] = (position, score, feedback)
+
+    # Javoblar shu topshiriqqa tegishliligini bitta so'rov bilan tekshirish
+    known_ids = set()
+    if parsed:
+        known_ids = {
+            submission_id for (submission_id,) in db.session.query(Submission.id).filter(
+                Submission.assignment_id == assignment.id,
+                Submission.id.in_(list(parsed))
+            ).all()
+        }
+    for submission_id, (position, _, _) in parsed.items():
+        if submission_id not in known_ids:
+            errors.append({'row': position, 'submission_id': submission_id, 'error': "Javob bu topshiriqqa tegishli emas"})
+
+    if errors:
+        errors.sort(key=lambda error: error['row'])
+        return 0, errors
+    if not parsed:
+        return 0, []
+
+    graded_at = datetime.utcnow()
+    mappings = []
+    for submission_id, (_, score, feedback) in parsed.items():
+        mapping = {
+            'id': submission_id,
+            'score': score,
+            'graded_at': graded_at,
+            'graded_by': grader_id
+        }
+        # Izoh berilmagan bo'lsa, mavjud izoh saqlanadi
+        if feedback is not None:
+            mapping['feedback'] = feedback
+        mappings.append(mapping)
+    db.session.bulk_update_mappings(Submission, mappings)
+    db.session.commit()
+    # Paketli UPDATE sessiya hodisalarini chaqirmaydi
+    fragment_cache.invalidate_tags('submissions')
+    return len(parsed), []
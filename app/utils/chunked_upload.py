@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from flask import current_app
+from app.utils.file_store import adopt_file, release_file
+
+
+# Yuklash turlari va yakuniy fayl papkalari
+UPLOAD_KINDS = {
+    'video': 'videos',
+    'lesson_file': 'lesson_files',
+}
+
+STREAM_BLOCK_SIZE = 64 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 32 * 1024 * 1024
+
+_UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChunkedUploadError(Exception):
+    """Bo'laklab yuklashdagi xatolik (foydalanuvchiga ko'rsatiladigan xabar bilan)"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _spool_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'videos', '.chunks')
+
+
+def _spool_dir(upload_id):
+    if not upload_id or not _UPLOAD_ID_RE.match(upload_id):
+        raise ChunkedUploadError("Yuklash identifikatori noto'g'ri", 404)
+    return os.path.join(_spool_root(), upload_id)
+
+
+def _part_path(spool, index):
+    return os.path.join(spool, f'part-{index:06d}')
+
+
+def _write_meta(spool, meta):
+    tmp_path = os.path.join(spool, 'meta.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(spool, 'meta.json'))
+
+
+def _received_chunks(spool):
+    return sorted(
+        int(name[5:]) for name in os.listdir(spool)
+        if name.startswith('part-') and name[5:].isdigit()
+    )
+
+
+def create_upload(owner_id, filename, kind, total_size, chunk_size=None):
+    """Yangi bo'laklab yuklash sessiyasini ochish"""
+    if kind not in UPLOAD_KINDS:
+        raise ChunkedUploadError("Noma'lum yuklash turi")
+    if not filename or '.' not in filename:
+        raise ChunkedUploadError("Fayl nomi noto'g'ri")
+    if not isinstance(total_size, int) or total_size <= 0:
+        raise ChunkedUploadError("Fayl hajmi noto'g'ri")
+
+    max_size = current_app.config.get('MAX_CHUNKED_UPLOAD_SIZE', 4 * 1024 * 1024 * 1024)
+    if total_size > max_size:
+        raise ChunkedUploadError(f"Fayl hajmi {max_size / (1024 * 1024):.0f} MB dan oshmasligi kerak")
+
+    chunk_size = chunk_size or current_app.config.get('UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    if not isinstance(chunk_size, int) or chunk_size <= 0 or chunk_size > MAX_CHUNK_SIZE:
+        raise ChunkedUploadError("Bo'lak hajmi noto'g'ri")
+
+    cleanup_stale_uploads()
+
+    upload_id = uuid.uuid4().hex
+    spool = _spool_dir(upload_id)
+    os.makedirs(spool, exist_ok=True)
+
+    meta = {
+        'id': upload_id,
+        'owner_id': owner_id,
+        'kind': kind,
+        'original_name': filename,
+        'ext': filename.rsplit('.', 1)[1].lower(),
+        'total_size': total_size,
+        'chunk_size': chunk_size,
+        'total_chunks': (total_size + chunk_size - 1) // chunk_size,
+        'created_at': time.time(),
+        'filename': None,
+    }
+    _write_meta(spool, meta)
+    return meta
+
+
+def load_upload(upload_id, owner_id):
+    """Sessiya ma'lumotlarini olish (faqat egasi uchun)"""
+    spool = _spool_dir(upload_id)
+    try:
+        meta = _read_meta(spool)
+    except (OSError, ValueError):
+        raise ChunkedUploadError("Yuklash topilmadi", 404)
+
+    if meta['owner_id'] != owner_id:
+        raise ChunkedUploadError("Sizda bu yuklashga ruxsat yo'q", 403)
+    return meta
+
+
+def upload_status(meta):
+    """Qabul qilingan bo'laklar ro'yxati (yuklashni davom ettirish uchun)"""
+    spool = _spool_dir(meta['id'])
+    return {
+        'upload_id': meta['id'],
+        'chunk_size': meta['chunk_size'],
+        'total_chunks': meta['total_chunks'],
+        'received': [] if meta['filename'] else _received_chunks(spool),
+        'completed': meta['filename'] is not None,
+    }
+
+
+def write_chunk(meta, index, stream, checksum=None):
+    """Bitta bo'lakni oqim bilan diskka yozish va SHA-256 bo'yicha tekshirish"""
+    if meta['filename']:
+        raise ChunkedUploadError("Yuklash allaqachon yakunlangan", 409)
+    if index < 0 or index >= meta['total_chunks']:
+        raise ChunkedUploadError("Bo'lak raqami noto'g'ri")
+
+    is_last = index == meta['total_chunks'] - 1
+    expected_size = meta['total_size'] - index * meta['chunk_size'] if is_last else meta['chunk_size']
+
+    spool = _spool_dir(meta['id'])
+    tmp_path = _part_path(spool, index) + f'.{uuid.uuid4().hex}.tmp'
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            while True:
+                block = stream.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > expected_size:
+                    raise ChunkedUploadError("Bo'lak hajmi kutilganidan katta")
+                digest.update(block)
+                f.write(block)
+
+        if size != expected_size:
+            raise ChunkedUploadError("Bo'lak hajmi kutilgan hajmga mos emas")
+        if checksum and digest.hexdigest() != checksum.strip().lower():
+            raise ChunkedUploadError("Bo'lak nazorat summasi mos kelmadi")
+
+        os.replace(tmp_path, _part_path(spool, index))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return digest.hexdigest()
+
+
+def _read_meta(spool):
+    with open(os.path.join(spool, 'meta.json')) as f:
+        return json.load(f)
+
+
+def complete_upload(meta):
+    """Barcha bo'laklarni yakuniy faylga yig'ish.
+
+    Yig'ishni faqat bitta so'rov bajaradi: `completing` fayli atomar
+    (O_EXCL) yaratiladi, parallel so'rovlar 409 oladi.
+    """
+    if meta['filename']:
+        raise ChunkedUploadError("Yuklash allaqachon yakunlangan", 409)
+
+    spool = _spool_dir(meta['id'])
+    lock_path = os.path.join(spool, 'completing')
+    try:
+        os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        raise ChunkedUploadError("Yuklash hozir yakunlanmoqda", 409)
+    except OSError:
+        raise ChunkedUploadError("Yuklash topilmadi", 404)
+
+    assembled_path = os.path.join(spool, f'assembled-{uuid.uuid4().hex}.tmp')
+    try:
+        # Qulf olinguncha boshqa so'rov yakunlab ulgurgan bo'lishi mumkin
+        meta = _read_meta(spool)
+        if meta['filename']:
+            raise ChunkedUploadError("Yuklash allaqachon yakunlangan", 409)
+
+        missing = sorted(set(range(meta['total_chunks'])) - set(_received_chunks(spool)))
+        if missing:
+            raise ChunkedUploadError(f"{len(missing)} ta bo'lak hali yuklanmagan", 409)
+
+        digest = hashlib.sha256()
+
+        # Bo'laklarni ketma-ket yozish va bir vaqtda butun faylni xeshlash
+        with open(assembled_path, 'wb') as out:
+            for index in range(meta['total_chunks']):
+                with open(_part_path(spool, index), 'rb') as part:
+                    while True:
+                        block = part.read(STREAM_BLOCK_SIZE)
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+
+        if os.path.getsize(assembled_path) != meta['total_size']:
+            raise ChunkedUploadError("Yig'ilgan fayl hajmi mos kelmadi", 409)
+
+        filename = adopt_file(assembled_path, UPLOAD_KINDS[meta['kind']], meta['ext'], digest.hexdigest())
+        meta['filename'] = filename
+        _write_meta(spool, meta)
+        for index in range(meta['total_chunks']):
+            os.remove(_part_path(spool, index))
+        return filename
+    finally:
+        if os.path.exists(assembled_path):
+            os.remove(assembled_path)
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+
+
+def finished_upload_filename(upload_id, owner_id, kind):
+    """Dars formasi uchun: yakunlangan yuklashning fayl nomi (yoki None)"""
+    try:
+        meta = load_upload(upload_id, owner_id)
+    except ChunkedUploadError:
+        return None
+    if meta['kind'] != kind or not meta['filename']:
+        return None
+    return meta['filename']
+
+
+def discard_upload(upload_id):
+    """Sessiya papkasini o'chirish (yakuniy fayl saqlanib qoladi)"""
+    try:
+        spool = _spool_dir(upload_id)
+    except ChunkedUploadError:
+        return
+    shutil.rmtree(spool, ignore_errors=True)
+
+
+def cleanup_stale_uploads():
+    """Muddati o'tgan yuklashlarni tozalash.
+
+    Tugallanmagan yuklashlar ham, yakunlangan, lekin darsga biriktirilmagan
+    yuklashlar ham o'chiriladi. Yakuniy fayl `release_file` orqali
+    navbatga qo'yiladi - boshqa dars xuddi shu faylni ishlatayotgan bo'lsa,
+    u saqlanib qoladi.
+    """
+    root = _spool_root()
+    if not os.path.isdir(root):
+        return
+    max_age = current_app.config.get('CHUNKED_UPLOAD_TTL', 24 * 60 * 60)
+    now = time.time()
+    for name in os.listdir(root):
+        spool = os.path.join(root, name)
+        try:
+            if now - os.path.getmtime(spool) <= max_age:
+                continue
+        except OSError:
+            continue
+        try:
+            meta = _read_meta(spool)
+        except (OSError, ValueError):
+            meta = None
+        if meta and meta.get('filename') and meta.get('kind') in UPLOAD_KINDS:
+            release_file(UPLOAD_KINDS[meta['kind']], meta['filename'])
+        shutil.rmtree(spool, ignore_errors=True)
@@ -0,0 +1,202 @@
+from flask import current_app
+from sqlalchemy import and_, event, false, inspect, literal_column, or_, select, text, table, column
+from app.models import Subject, Lesson, Assignment, Announcement
+from app.utils.fts import FtsTable, match_expression
+from app.utils.access_index import (
+    teacher_subject_ids, teacher_sections, group_subject_ids
+)
+from app.utils.lesson_progress import locked_lesson_ids
+from app.utils.announcement_audience import audience_filter, audience_faculty_ids
+from app import db
+
+
+# Hujjat turlari va ularning kodlari: rowid = ref_id * len(KINDS) + kod
+KINDS = ('subject', 'lesson', 'assignment', 'announcement')
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+content_index = FtsTable('content_search', [
+    ('kind', True),
+    ('ref_id', True),
+    ('subject_id', True),
+    ('group_id', True),
+    ('title', False),
+    ('body', False),
+])
+
+_fts = table(
+    content_index.name,
+    column('rowid'), column('kind'), column('ref_id'), column('subject_id'),
+    column('group_id'), column('title'), column('rank')
+)
+
+# Model -> (tur, indekslanadigan maydonlar)
+_MODELS = {
+    Subject: ('subject', ('name', 'code', 'description')),
+    Lesson: ('lesson', ('title', 'content', 'subject_id')),
+    Assignment: ('assignment', ('title', 'description', 'subject_id', 'group_id')),
+    Announcement: ('announcement', ('title', 'content')),
+}
+
+
+def _rowid(kind, ref_id):
+    return ref_id * len(KINDS) + KIND_CODES[kind]
+
+
+def _document(obj):
+    """Obyektdan indeks yozuvi: (tur, qiymatlar)"""
+    if isinstance(obj, Subject):
+        return 'subject', {
+            'subject_id': obj.id, 'group_id': None,
+            'title': f"{obj.code or ''} {obj.name or ''}".strip(),
+            'body': getattr(obj, 'description', None) or ''
+        }
+    if isinstance(obj, Lesson):
+        return 'lesson', {
+            'subject_id': obj.subject_id, 'group_id': None,
+            'title': obj.title or '', 'body': obj.content or ''
+        }
+    if isinstance(obj, Assignment):
+        return 'assignment', {
+            'subject_id': obj.subject_id, 'group_id': obj.group_id,
+            'title': obj.title or '', 'body': obj.description or ''
+        }
+    return 'announcement', {
+        'subject_id': None, 'group_id': None,
+        'title': obj.title or '', 'body': obj.content or ''
+    }
+
+
+def _write_document(connection, obj):
+    kind, values = _document(obj)
+    content_index.write(connection, _rowid(kind, obj.id), dict(values, kind=kind, ref_id=obj.id))
+
+
+def build_content_index():
+    """Indeksni yaratish va to'ldirish (`flask api rebuild-search-index`).
+
+    Indekslangan hujjatlar sonini, FTS5 mavjud bo'lmasa None qaytaradi.
+    """
+    if not content_index.create():
+        return None
+    return rebuild_content_index()
+
+
+def rebuild_content_index():
+    """Indeksni fan, dars, topshiriq va e'lonlardan to'liq qayta qurish"""
+    connection = db.session.connection()
+    if not content_index.state(connection)['enabled']:
+        return 0
+    connection.execute(text(f"DELETE FROM {content_index.name}"))
+    count = 0
+    for model in _MODELS:
+        for obj in model.query.yield_per(500):
+            _write_document(connection, obj)
+            count += 1
+    db.session.commit()
+    return count
+
+
+# ==================== SINXRONLASH ====================
+def _index_new(mapper, connection, target):
+    if content_index.state(connection)['enabled']:
+        _write_document(connection, target)
+
+
+def _reindex(mapper, connection, target):
+    if not content_index.state(connection)['enabled']:
+        return
+    attrs = inspect(target).attrs
+    _, fields = _MODELS[type(target)]
+    if any(attrs[field].history.has_changes() for field in fields if field in attrs):
+        _write_document(connection, target)
+
+
+def _unindex(mapper, connection, target):
+    if content_index.state(connection)['enabled']:
+        kind, _ = _MODELS[type(target)]
+        content_index.delete(connection, _rowid(kind, target.id))
+
+
+for _model in _MODELS:
+    event.listen(_model, 'after_insert', _index_new)
+    event.listen(_model, 'after_update', _reindex)
+    event.listen(_model, 'after_delete', _unindex)
+
+
+# ==================== QIDIRUV ====================
+def _scope_filter(user):
+    """Foydalanuvchi ko'rishi mumkin bo'lgan hujjatlar sharti"""
+    if user.role == 'admin':
+        return None
+
+    announcements = and_(
+        _fts.c.kind == 'announcement',
+        audience_filter(user, audience_faculty_ids(user), announcement_id=_fts.c.ref_id)
+    )
+    course_kinds = _fts.c.kind.in_(['subject', 'lesson'])
+
+    if user.role == 'dean':
+        if not user.faculty_id:
+            return announcements
+        faculty_subjects = select(Subject.id).where(Subject.faculty_id == user.faculty_id)
+        return or_(
+            and_(_fts.c.kind != 'announcement', _fts.c.subject_id.in_(faculty_subjects)),
+            announcements
+        )
+
+    if user.role == 'teacher':
+        subject_ids = teacher_subject_ids(user.id)
+        sections = teacher_sections(user.id)
+        course = and_(course_kinds, _fts.c.subject_id.in_(subject_ids)) if subject_ids else false()
+        assignments = and_(_fts.c.kind == 'assignment', or_(*[
+            and_(_fts.c.subject_id == subject_id, _fts.c.group_id == group_id)
+            for subject_id, group_id in sections
+        ])) if sections else false()
+        return or_(course, assignments, announcements)
+
+    if user.role == 'student' and user.group_id:
+        subject_ids = group_subject_ids(user.group_id)
+        course = and_(course_kinds, _fts.c.subject_id.in_(subject_ids)) if subject_ids else false()
+        # Qulflangan darslar (oldingi videolar tugatilmagan) natijalarga chiqmaydi
+        locked_ids = locked_lesson_ids(user.id, subject_ids)
+        if locked_ids:
+            course = and_(course, or_(_fts.c.kind != 'lesson', _fts.c.ref_id.notin_(locked_ids)))
+        assignments = and_(_fts.c.kind == 'assignment', _fts.c.group_id == user.group_id)
+        return or_(course, assignments, announcements)
+
+    return announcements
+
+
+def search_content(user, query, page=1, per_page=None):
+    """Ruxsat doirasidagi hujjatlarda to'liq matnli qidiruv (bm25 bo'yicha).
+
+    (natijalar, yana natijalar bormi, indeks mavjudmi) qaytaradi. Natija:
+    {'kind', 'id', 'title', 'snippet'}. Indeks so'rov ichida qurilmaydi:
+    u hali yaratilmagan bo'lsa, indeks mavjud emas deb qaytariladi.
+    """
+    per_page = per_page or current_app.config.get('SEARCH_PAGE_SIZE', 20)
+    page = max(page, 1)
+
+    state = content_index.state(db.session.connection())
+    if not state['enabled']:
+        return [], False, False
+    match = match_expression(query.strip(), state['tokenizer'])
+    if not match:
+        return [], False, True
+
+    snippet = literal_column(f"snippet({content_index.name}, 5, '', '', '...', 16)")
+    stmt = select(_fts.c.kind, _fts.c.ref_id, _fts.c.title, snippet).where(
+        text(f"{content_index.name} MATCH :match").bindparams(match=match)
+    )
+    scope = _scope_filter(user)
+    if scope is not None:
+        stmt = stmt.where(scope)
+    stmt = stmt.order_by(_fts.c.rank).limit(per_page + 1).offset((page - 1) * per_page)
+
+    rows = db.session.execute(stmt).all()
+    has_more = len(rows) > per_page
+    results = [
+        {'kind': kind, 'id': ref_id, 'title': title, 'snippet': snippet_text}
+        for kind, ref_id, title, snippet_text in rows[:per_page]
+    ]
+    return results, has_more, True
@@ -0,0 +1,314 @@
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from app.models import Message, User
+from app.utils.notify import notifier
+from app import db
+
+
+class ConversationSummary(db.Model):
+    """Ikki foydalanuvchi o'rtasidagi suhbat holati (inbox uchun).
+
+    Juftlik tartiblanmagan: (kichik id, katta id) kalit sifatida olinadi.
+    Har bir tomonning o'qilmagan xabarlari soni va o'qilgan eng oxirgi xabar
+    (high-water mark) alohida saqlanadi va xabar yuborilganda yoki
+    o'qilganda xuddi shu tranzaksiyada yangilanadi.
+    """
+    __tablename__ = 'conversation_summary'
+    __table_args__ = (
+        db.Index('ix_conversation_low_last', 'user_low_id', 'last_at'),
+        db.Index('ix_conversation_high_last', 'user_high_id', 'last_at'),
+    )
+
+    user_low_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
+    user_high_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
+    last_message_id = db.Column(db.Integer, db.ForeignKey(Message.id))
+    last_at = db.Column(db.DateTime)
+    low_unread = db.Column(db.Integer, nullable=False, default=0)
+    high_unread = db.Column(db.Integer, nullable=False, default=0)
+    low_read_id = db.Column(db.Integer, nullable=False, default=0)
+    high_read_id = db.Column(db.Integer, nullable=False, default=0)
+
+    def partner_id(self, user_id):
+        return self.user_high_id if self.user_low_id == user_id else self.user_low_id
+
+    def unread_for(self, user_id):
+        return self.low_unread if self.user_low_id == user_id else self.high_unread
+
+    def read_id_for(self, user_id):
+        return self.low_read_id if self.user_low_id == user_id else self.high_read_id
+
+
+def pair(user_a, user_b):
+    return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+
+def _unread_column(reader_id, low):
+    return 'low_unread' if reader_id == low else 'high_unread'
+
+
+def _read_column(reader_id, low):
+    return 'low_read_id' if reader_id == low else 'high_read_id'
+
+
+def record_message(message):
+    """Yangi xabarni suhbat holatiga yozish.
+
+    Xabar flush qilingan bo'lishi kerak, commit chaqiruvchida. Tiklash
+    (ensure_backfilled) xabar qo'shilishidan oldin chaqirilgan bo'lishi kerak.
+    """
+    low, high = pair(message.sender_id, message.receiver_id)
+    side = _unread_column(message.receiver_id, low)
+    last_at = message.created_at or datetime.utcnow()
+
+    values = {
+        'last_message_id': message.id,
+        'last_at': last_at,
+        side: getattr(ConversationSummary, side) + 1
+    }
+    updated = ConversationSummary.query.filter_by(
+        user_low_id=low, user_high_id=high
+    ).update(values, synchronize_session=False)
+    if updated:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(ConversationSummary(
+                user_low_id=low,
+                user_high_id=high,
+                last_message_id=message.id,
+                last_at=last_at,
+                **{side: 1}
+            ))
+    except IntegrityError:
+        # Boshqa so'rov shu juftlikni bir vaqtda yaratgan
+        ConversationSummary.query.filter_by(
+            user_low_id=low, user_high_id=high
+        ).update(values, synchronize_session=False)
+
+
+def mark_conversation_read(reader_id, other_id, up_to=None):
+    """O'quvchi tomonining high-water mark'ini so'nggi xabarga surish.
+
+    `up_to` berilsa, chegara faqat shu xabargacha suriladi (mijozga hali
+    yetkazilmagan xabarlar o'qilgan deb belgilanmaydi) va o'qilmaganlar
+    soni chegaradan keyingi xabarlar bo'yicha qayta sanaladi.
+    Xabar qatorlari qayta yozilmaydi - faqat suhbat holatidagi bitta qator
+    yangilanadi. Hech narsa o'zgarmagan bo'lsa qator yozilmaydi.
+    Yangilangan qatorlar sonini qaytaradi, commit chaqiruvchida.
+    """
+    low, high = pair(reader_id, other_id)
+    unread_column = _unread_column(reader_id, low)
+    read_column = _read_column(reader_id, low)
+
+    if up_to is not None:
+        read_id = case(
+            (ConversationSummary.last_message_id < up_to, ConversationSummary.last_message_id),
+            else_=up_to
+        )
+        unread = select(func.count(Message.id)).where(
+            Message.sender_id == other_id,
+            Message.receiver_id == reader_id,
+            Message.id > read_id
+        ).scalar_subquery()
+        return ConversationSummary.query.filter(
+            ConversationSummary.user_low_id == low,
+            ConversationSummary.user_high_id == high,
+            getattr(ConversationSummary, read_column) < read_id
+        ).update({
+            unread_column: unread,
+            read_column: read_id
+        }, synchronize_session=False)
+
+    return ConversationSummary.query.filter(
+        ConversationSummary.user_low_id == low,
+        ConversationSummary.user_high_id == high,
+        or_(
+            getattr(ConversationSummary, unread_column) > 0,
+            getattr(ConversationSummary, read_column) < ConversationSummary.last_message_id
+        )
+    ).update({
+        unread_column: 0,
+        read_column: ConversationSummary.last_message_id
+    }, synchronize_session=False)
+
+
+def get_summary(user_a, user_b):
+    low, high = pair(user_a, user_b)
+    return ConversationSummary.query.get((low, high))
+
+
+def unread_total(user_id):
+    """Foydalanuvchining barcha suhbatlardagi o'qilmagan xabarlari soni"""
+    ensure_backfilled()
+    return db.session.query(func.coalesce(func.sum(case(
+        (ConversationSummary.user_low_id == user_id, ConversationSummary.low_unread),
+        else_=ConversationSummary.high_unread
+    )), 0)).filter(or_(
+        ConversationSummary.user_low_id == user_id,
+        ConversationSummary.user_high_id == user_id
+    )).scalar()
+
+
+def partner_column(user_id):
+    return case(
+        (ConversationSummary.user_low_id == user_id, ConversationSummary.user_high_id),
+        else_=ConversationSummary.user_low_id
+    )
+
+
+def inbox_query(user_id):
+    """Foydalanuvchi suhbatlari (so'nggi xabar vaqti bo'yicha, yangilari birinchi)"""
+    ensure_backfilled()
+    return ConversationSummary.query.filter(or_(
+        ConversationSummary.user_low_id == user_id,
+        ConversationSummary.user_high_id == user_id
+    )).order_by(ConversationSummary.last_at.desc())
+
+
+def build_chats(user_id, summaries):
+    """Sahifadagi suhbatlar uchun foydalanuvchilar va so'nggi xabarlar (ikki IN so'rovi)"""
+    partner_ids = [summary.partner_id(user_id) for summary in summaries]
+    message_ids = [summary.last_message_id for summary in summaries if summary.last_message_id]
+    users = {u.id: u for u in User.query.filter(User.id.in_(partner_ids)).all()} if partner_ids else {}
+    messages = {m.id: m for m in Message.query.filter(Message.id.in_(message_ids)).all()} if message_ids else {}
+
+    chats = []
+    for summary in summaries:
+        user = users.get(summary.partner_id(user_id))
+        if user is None:
+            continue
+        chats.append({
+            'user': user,
+            'last_message': messages.get(summary.last_message_id),
+            'unread_count': summary.unread_for(user_id)
+        })
+    return chats
+
+
+def chat_page_size():
+    return current_app.config.get('CHAT_PAGE_SIZE', 50)
+
+
+def history_page(user_id, other_id, before=None, after=None, limit=None):
+    """Suhbat tarixi (Message.id bo'yicha keyset sahifalash).
+
+    `after` berilsa - undan keyingi yangi xabarlar, `before` berilsa -
+    undan oldingi eski xabarlar, aks holda eng so'nggi xabarlar.
+    (o'sish tartibidagi xabarlar, yana xabarlar bormi) qaytaradi.
+    """
+    limit = limit or chat_page_size()
+    query = Message.query.filter(or_(
+        and_(Message.sender_id == user_id, Message.receiver_id == other_id),
+        and_(Message.sender_id == other_id, Message.receiver_id == user_id)
+    ))
+
+    if after:
+        rows = query.filter(Message.id > after).order_by(Message.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        return rows[:limit], has_more
+
+    if before:
+        query = query.filter(Message.id < before)
+    rows = query.order_by(Message.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    return list(reversed(rows[:limit])), has_more
+
+
+def serialize_message(message, summary=None):
+    """Xabar JSON ko'rinishi (o'qilganlik qabul qiluvchining high-water mark'idan)"""
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id,
+        'content': message.content,
+        'created_at': message.created_at.isoformat() if message.created_at else None,
+        'is_read': bool(summary) and message.id <= summary.read_id_for(message.receiver_id)
+    }
+
+
+def publish_message(message):
+    """Yangi xabar va o'qilmaganlar sonini qabul qiluvchiga yuborish (commit'dan keyin)"""
+    if not notifier.is_online(message.receiver_id):
+        return
+    notifier.publish(message.receiver_id, 'message', {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'content': message.content[:200],
+        'created_at': message.created_at.isoformat() if message.created_at else None
+    })
+    notifier.publish(message.receiver_id, 'unread', {'count': unread_total(message.receiver_id)})
+
+
+def publish_read(reader_id, other_id):
+    """O'qilgan chegarasi surilganini ikkala tomonga yuborish (commit'dan keyin)"""
+    if notifier.is_online(reader_id):
+        notifier.publish(reader_id, 'unread', {'count': unread_total(reader_id)})
+    if notifier.is_online(other_id):
+        summary = get_summary(reader_id, other_id)
+        notifier.publish(other_id, 'read', {
+            'user_id': reader_id,
+            'read_id': summary.read_id_for(reader_id) if summary else 0
+        })
+
+
+_backfill_lock = threading.Lock()
+_backfilled = False
+
+
+def ensure_backfilled():
+    """Mavjud xabarlardan suhbat holatlarini jarayon davomida bir marta tiklash"""
+    global _backfilled
+    if _backfilled:
+        return
+    with _backfill_lock:
+        if _backfilled:
+            return
+        low = case((Message.sender_id < Message.receiver_id, Message.sender_id), else_=Message.receiver_id)
+        high = case((Message.sender_id < Message.receiver_id, Message.receiver_id), else_=Message.sender_id)
+        unread = Message.is_read == False
+        read = Message.is_read == True
+        rows = db.session.query(
+            low.label('low'),
+            high.label('high'),
+            func.max(Message.id),
+            func.max(Message.created_at),
+            func.sum(case((unread & (Message.receiver_id == low), 1), else_=0)),
+            func.sum(case((unread & (Message.receiver_id == high), 1), else_=0)),
+            func.max(case((read & (Message.receiver_id == low), Message.id), else_=0)),
+            func.max(case((read & (Message.receiver_id == high), Message.id), else_=0))
+        ).group_by(low, high).all()
+
+        existing = set(db.session.query(
+            ConversationSummary.user_low_id,
+            ConversationSummary.user_high_id
+        ).all())
+        for low_id, high_id, last_id, last_at, low_unread, high_unread, low_read_id, high_read_id in rows:
+            if (low_id, high_id) in existing:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ConversationSummary(
+                        user_low_id=low_id,
+                        user_high_id=high_id,
+                        last_message_id=last_id,
+                        last_at=last_at,
+                        low_unread=low_unread or 0,
+                        high_unread=high_unread or 0,
+                        low_read_id=low_read_id or 0,
+                        high_read_id=high_read_id or 0
+                    ))
+            except IntegrityError:
+                # Shu juftlikni boshqa jarayon bir vaqtda yaratgan - qolganlari davom etadi
+                continue
+        try:
+            db.session.commit()
+        except Exception:
+            # Bayroq qo'yilmaydi - keyingi so'rovda qayta urinib ko'riladi
+            db.session.rollback()
+            current_app.logger.exception("Suhbat holatlarini tiklashda xatolik")
+            return
+        _backfilled = True
@@ -0,0 +1,149 @@
+import os
+import re
+import time
+import uuid
+import threading
+import hashlib
+from flask import current_app
+from app.models import Lesson, Submission
+
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Kontent-manzilli fayl nomi: <sha256>.<kengaytma>
+_DIGEST_NAME_RE = re.compile(r'^([0-9a-f]{64})\.[a-z0-9]+$')
+
+# Fayl nusxasini qayta ishlatish va o'chirish bir vaqtda bo'lmasligi uchun
+_blob_lock = threading.Lock()
+
+
+def _folder_root(folder):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], folder)
+
+
+def _shard_dir(folder, digest):
+    return os.path.join(_folder_root(folder), digest[:2], digest[2:4])
+
+
+def _new_temp_path(folder):
+    tmp_folder = os.path.join(_folder_root(folder), '.tmp')
+    os.makedirs(tmp_folder, exist_ok=True)
+    return os.path.join(tmp_folder, f'{uuid.uuid4().hex}.part')
+
+
+def file_directory(folder, name):
+    """Fayl joylashgan papka: kontent-manzilli fayllar uchun shard papka,
+    eski (uuid nomli) fayllar uchun papkaning o'zi"""
+    match = _DIGEST_NAME_RE.match(name or '')
+    if match:
+        return _shard_dir(folder, match.group(1))
+    return _folder_root(folder)
+
+
+def file_path(folder, name):
+    """Faylning diskdagi to'liq yo'li"""
+    return os.path.join(file_directory(folder, name), name)
+
+
+def adopt_file(path, folder, ext, digest):
+    """Xeshi hisoblangan vaqtinchalik faylni omborga joylash.
+
+    Xuddi shu kontentli fayl allaqachon mavjud bo'lsa, vaqtinchalik fayl
+    o'chiriladi va mavjud nusxa ishlatiladi. Mavjud nusxaning vaqti
+    yangilanadi - bu uni `release_file` tozalashidan himoya qiladi.
+    """
+    name = f'{digest}.{ext.lower()}'
+    shard = _shard_dir(folder, digest)
+    os.makedirs(shard, exist_ok=True)
+    target = os.path.join(shard, name)
+
+    with _blob_lock:
+        try:
+            os.utime(target)
+            os.remove(path)
+        except FileNotFoundError:
+            os.replace(path, target)
+    return name
+
+
+def store_file(file, folder, ext):
+    """Yuklangan faylni oqim bilan xeshlab, bir marta saqlash.
+
+    Qaytariladigan nom (`<sha256>.<ext>`) ma'lumotlar bazasida saqlanadi.
+    """
+    tmp_path = _new_temp_path(folder)
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                block = file.stream.read(STREAM_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+        return adopt_file(tmp_path, folder, ext, digest.hexdigest())
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def reference_count(folder, name):
+    """Faylga murojaat qilayotgan yozuvlar soni"""
+    if folder == 'videos':
+        return Lesson.query.filter_by(video_file=name).count()
+    if folder == 'lesson_files':
+        return Lesson.query.filter_by(file_url=name).count()
+    if folder == 'submissions':
+        return Submission.query.filter_by(file_url=name).count()
+    return 0
+
+
+def _released_dir(folder):
+    return os.path.join(_folder_root(folder), '.released')
+
+
+def release_file(folder, name):
+    """Faylni o'chirish uchun navbatga qo'yish (o'zgarishlar commit qilingandan keyin).
+
+    Fayl darhol o'chirilmaydi: parallel so'rov xuddi shu kontentni hozirgina
+    qayta ishlatgan, lekin hali commit qilmagan bo'lishi mumkin. Belgilangan
+    fayllar `FILE_RELEASE_GRACE` muddatidan keyin, murojaat qolmagani va shu
+    vaqt ichida qayta ishlatilmagani tekshirilib o'chiriladi.
+    """
+    if not name or 'http://' in name or 'https://' in name:
+        return
+    if os.path.basename(name) != name:
+        return
+
+    released = _released_dir(folder)
+    os.makedirs(released, exist_ok=True)
+    marker = os.path.join(released, name)
+    with open(marker, 'a'):
+        pass
+    os.utime(marker)
+    cleanup_released_files(folder)
+
+
+def cleanup_released_files(folder):
+    """Muddati o'tgan, murojaatsiz qolgan fayllarni diskdan o'chirish"""
+    released = _released_dir(folder)
+    if not os.path.isdir(released):
+        return
+    grace = current_app.config.get('FILE_RELEASE_GRACE', 60 * 60)
+    now = time.time()
+    for name in os.listdir(released):
+        marker = os.path.join(released, name)
+        try:
+            if now - os.path.getmtime(marker) <= grace:
+                continue
+            if reference_count(folder, name) == 0:
+                path = file_path(folder, name)
+                with _blob_lock:
+                    # Muddat ichida qayta ishlatilgan nusxa keyingi tozalashgacha qoladi
+                    if os.path.exists(path) and now - os.path.getmtime(path) <= grace:
+                        continue
+                    if os.path.exists(path):
+                        os.remove(path)
+            os.remove(marker)
+        except OSError:
+            pass
@@ -0,0 +1,156 @@
+import time
+import threading
+from flask import current_app
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.models import (
+    User, Faculty, Group, Subject, TeacherSubject, Assignment, Submission,
+    Announcement, Schedule, StudentPayment
+)
+from app.utils.translations import get_current_language
+
+
+# Model o'zgarganda bekor qilinadigan teglar
+MODEL_TAGS = {
+    Announcement: ('announcements',),
+    Submission: ('submissions',),
+    Assignment: ('submissions',),
+    StudentPayment: ('payments',),
+    User: ('users',),
+    Faculty: ('structure',),
+    Group: ('structure', 'users'),
+    Subject: ('structure',),
+    TeacherSubject: ('structure',),
+    Schedule: ('schedule',),
+}
+
+# Dashboard ko'rsatkichlariga ta'sir qilmaydigan ustunlar (masalan, har kirishda yangilanadigan)
+IGNORED_ATTRIBUTES = {
+    User: {'last_login'},
+}
+
+
+class FragmentCache:
+    """Dashboard bo'laklari uchun TTL va teglar bo'yicha bekor qilinadigan kesh.
+
+    Kalit: (bo'lak nomi, rol, qamrov, til). Faqat sonlar, lug'atlar va
+    identifikatorlar ro'yxati saqlanadi - ORM obyektlari sessiyaga bog'liq
+    bo'lgani uchun keshlanmaydi.
+    """
+
+    def __init__(self, prune_interval=60):
+        self._lock = threading.Lock()
+        # key -> (tugash vaqti, qiymat, teglar)
+        self._entries = {}
+        # tag -> {key, ...}
+        self._tags = {}
+        # tag -> bekor qilishlar soni (hisoblash paytidagi bekor qilishni aniqlash uchun)
+        self._tag_versions = {}
+        # clear() chaqiruvlari soni
+        self._generation = 0
+        self._prune_interval = prune_interval
+        self._next_prune = time.monotonic() + prune_interval
+
+    def get_or_set(self, key, tags, compute, ttl):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(key)
+            versions = self._versions(tags)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        value = compute()
+        with self._lock:
+            # Hisoblash paytida teg bekor qilingan bo'lsa, eskirgan qiymat saqlanmaydi
+            if versions != self._versions(tags):
+                return value
+            self._remove(key)
+            self._entries[key] = (now + ttl, value, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            if now >= self._next_prune:
+                self._prune(now)
+        return value
+
+    def _versions(self, tags):
+        return self._generation, [self._tag_versions.get(tag, 0) for tag in tags]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _prune(self, now):
+        """Muddati o'tgan yozuvlarni olib tashlash (kalitlar foydalanuvchi/kun bo'yicha ko'payadi)"""
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            self._remove(key)
+        self._next_prune = now + self._prune_interval
+
+    def invalidate_tags(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+def cached_fragment(name, scope, tags, compute, ttl=None):
+    """Joriy foydalanuvchi roli va tili bo'yicha keshlangan bo'lak"""
+    if ttl is None:
+        ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 60)
+    key = (name, current_user.role, scope, get_current_language())
+    return fragment_cache.get_or_set(key, tags, compute, ttl)
+
+
+# ==================== MODEL HODISALARI ====================
+def _only_ignored_changes(obj):
+    ignored = IGNORED_ATTRIBUTES.get(type(obj))
+    if not ignored:
+        return False
+    changed = {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+    return changed <= ignored
+
+
+def _changed_tags(session):
+    tags = set()
+    for obj in list(session.new) + list(session.deleted):
+        tags.update(MODEL_TAGS.get(type(obj), ()))
+    for obj in session.dirty:
+        if type(obj) in MODEL_TAGS and not _only_ignored_changes(obj):
+            tags.update(MODEL_TAGS[type(obj)])
+    return tags
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_tags(session, flush_context):
+    tags = _changed_tags(session)
+    if tags:
+        session.info.setdefault('fragment_tags', set()).update(tags)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    tags = session.info.pop('fragment_tags', None)
+    if tags:
+        fragment_cache.invalidate_tags(*tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tags(session):
+    session.info.pop('fragment_tags', None)
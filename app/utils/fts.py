@@ -0,0 +1,102 @@
+import threading
+from sqlalchemy import text
+from app import db
+
+
+class FtsTable:
+    """SQLite FTS5 virtual jadvali (jarayon ichidagi holat bilan).
+
+    Avval trigram (ichki moslik), u bo'lmasa unicode61 (prefiks) tokenizatori
+    bilan yaratiladi. Boshqa bazalarda `enabled` False bo'ladi va
+    chaqiruvchi oddiy so'rovga qaytadi.
+    """
+
+    def __init__(self, name, columns):
+        self.name = name
+        # [(nom, indekslanmaydimi), ...]
+        self.columns = columns
+        self._lock = threading.Lock()
+        self._state = None
+
+    def state(self, connection):
+        """Jadval mavjudligi va tokenizatori.
+
+        Faqat yakuniy natija keshlanadi: jadval topilgan yoki baza SQLite
+        emas. SQLite'da jadval hali yo'q bo'lsa har safar qayta tekshiriladi -
+        uni keyinroq `create()` (CLI) yoki boshqa jarayon yaratishi mumkin.
+        """
+        if self._state is not None:
+            return self._state
+        state = {'enabled': False, 'tokenizer': None}
+        if connection.dialect.name != 'sqlite':
+            self._state = state
+            return state
+        sql = connection.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': self.name}
+        ).scalar()
+        if sql:
+            state = {'enabled': True, 'tokenizer': 'trigram' if 'trigram' in sql else 'unicode61'}
+            self._state = state
+        return state
+
+    def create(self):
+        """Jadval bo'lmasa yaratish (commit chaqiruvchida).
+
+        So'rovlar ichida chaqirilmaydi - jadval CLI buyrug'i bilan yaratiladi
+        va to'ldiriladi. FTS5 ishlatish mumkinmi - shuni qaytaradi.
+        """
+        with self._lock:
+            connection = db.session.connection()
+            if self.state(connection)['enabled']:
+                return True
+            if connection.dialect.name != 'sqlite':
+                return False
+            self._create(connection)
+            return self.state(connection)['enabled']
+
+    def _create(self, connection):
+        definition = ', '.join(
+            f'{name} UNINDEXED' if unindexed else name
+            for name, unindexed in self.columns
+        )
+        for tokenizer in ('trigram', 'unicode61'):
+            try:
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE {self.name} USING fts5({definition}, tokenize='{tokenizer}')"
+                ))
+                return True
+            except Exception:
+                continue
+        return False
+
+    def write(self, connection, rowid, values):
+        """Yozuvni almashtirish (DELETE + INSERT)"""
+        self.delete(connection, rowid)
+        names = ', '.join(values)
+        params = ', '.join(f':{name}' for name in values)
+        connection.execute(
+            text(f"INSERT INTO {self.name} (rowid, {names}) VALUES (:rowid, {params})"),
+            dict(values, rowid=rowid)
+        )
+
+    def delete(self, connection, rowid):
+        connection.execute(text(f"DELETE FROM {self.name} WHERE rowid = :rowid"), {'rowid': rowid})
+
+
+def match_expression(query, tokenizer):
+    """Foydalanuvchi so'rovini FTS5 MATCH ifodasiga aylantirish.
+
+    Trigram indeksi 3 belgidan qisqa so'zlarni topa olmaydi - bunday
+    holatda bo'sh satr qaytariladi va chaqiruvchi ilike'ga o'tadi.
+    """
+    terms = []
+    for token in query.split():
+        quoted = '"' + token.replace('"', '""') + '"'
+        if tokenizer == 'trigram':
+            if len(token) < 3:
+                return ''
+            terms.append(quoted)
+        else:
+            terms.append(quoted + '*')
+    return ' '.join(terms)
@@ -0,0 +1,84 @@
+from collections import namedtuple
+from app.models import Submission, Assignment, Subject, TeacherSubject, Group
+from app import db
+
+
+# Shablonlardagi sub.assignment.subject.name kabi murojaatlar saqlanishi uchun
+# ORM obyektlari o'rniga faqat kerakli ustunlardan iborat yengil qatorlar
+SubjectRow = namedtuple('SubjectRow', ['id', 'name', 'code'])
+GroupRow = namedtuple('GroupRow', ['id', 'name'])
+AssignmentRow = namedtuple('AssignmentRow', ['id', 'title', 'max_score', 'subject'])
+GradeRow = namedtuple('GradeRow', ['id', 'score', 'feedback', 'graded_at', 'submitted_at', 'assignment'])
+
+
+def student_grades_by_subject(student_id):
+    """Talabaning baholangan javoblari fanlar bo'yicha (bitta so'rov)"""
+    rows = db.session.query(
+        Submission.id,
+        Submission.score,
+        Submission.feedback,
+        Submission.graded_at,
+        Submission.submitted_at,
+        Assignment.id,
+        Assignment.title,
+        Assignment.max_score,
+        Subject.id,
+        Subject.name,
+        Subject.code
+    ).join(
+        Assignment, Assignment.id == Submission.assignment_id
+    ).join(
+        Subject, Subject.id == Assignment.subject_id
+    ).filter(
+        Submission.student_id == student_id,
+        Submission.score != None
+    ).order_by(Submission.graded_at.desc()).all()
+
+    grades_by_subject = {}
+    subjects = {}
+    for (submission_id, score, feedback, graded_at, submitted_at,
+         assignment_id, title, max_score, subject_id, subject_name, subject_code) in rows:
+        subject = subjects.get(subject_id)
+        if subject is None:
+            subject = subjects[subject_id] = SubjectRow(subject_id, subject_name, subject_code)
+            grades_by_subject[subject_id] = {
+                'subject': subject,
+                'submissions': [],
+                'total_score': 0,
+                'max_score': 0
+            }
+        entry = grades_by_subject[subject_id]
+        entry['submissions'].append(GradeRow(
+            submission_id, score, feedback, graded_at, submitted_at,
+            AssignmentRow(assignment_id, title, max_score, subject)
+        ))
+        entry['total_score'] += score
+        entry['max_score'] += max_score or 0
+    return grades_by_subject
+
+
+def teacher_subject_groups(teacher_id):
+    """O'qituvchining fanlari va har bir fan bo'yicha guruhlari (bitta so'rov)"""
+    rows = db.session.query(
+        Subject.id,
+        Subject.name,
+        Subject.code,
+        Group.id,
+        Group.name
+    ).select_from(TeacherSubject).join(
+        Subject, Subject.id == TeacherSubject.subject_id
+    ).join(
+        Group, Group.id == TeacherSubject.group_id
+    ).filter(
+        TeacherSubject.teacher_id == teacher_id
+    ).distinct().order_by(Subject.code, Group.name).all()
+
+    subject_groups = {}
+    for subject_id, subject_name, subject_code, group_id, group_name in rows:
+        if subject_id not in subject_groups:
+            subject_groups[subject_id] = {
+                'subject': SubjectRow(subject_id, subject_name, subject_code),
+                'groups': []
+            }
+        subject_groups[subject_id]['groups'].append(GroupRow(group_id, group_name))
+    return subject_groups
@@ -0,0 +1,83 @@
+from sqlalchemy import func
+from app.models import Assignment, Submission, TeacherSubject
+from app import db
+
+
+def empty_grades():
+    """Bo'sh ballar lug'ati (shablonlar kutgan shaklda)"""
+    return {
+        'maruza': {'score': 0, 'max': 0},
+        'amaliyot': {'score': 0, 'max': 0},
+        'total': {'score': 0, 'max': 0}
+    }
+
+
+def get_student_grade_rollup(student_id, group_id, subject_ids):
+    """Talabaning bir nechta fan bo'yicha maruza, amaliyot va jami ballari.
+
+    Ikki so'rov bilan hisoblanadi: fan bo'limlari o'qituvchilari va
+    (fan, topshiriq muallifi, topshiriq turi) bo'yicha guruhlangan ballar.
+    Natija: {subject_id: {'maruza': {...}, 'amaliyot': {...}, 'total': {...}}}
+    """
+    subject_ids = list(subject_ids)
+    rollup = {subject_id: empty_grades() for subject_id in subject_ids}
+    if not subject_ids or not group_id:
+        return rollup
+
+    # Har bir fan uchun maruza va amaliyot o'qituvchisi (birinchi biriktirma)
+    section_teachers = {}
+    teacher_rows = db.session.query(
+        TeacherSubject.subject_id,
+        TeacherSubject.lesson_type,
+        TeacherSubject.teacher_id
+    ).filter(
+        TeacherSubject.group_id == group_id,
+        TeacherSubject.subject_id.in_(subject_ids),
+        TeacherSubject.lesson_type.in_(['maruza', 'amaliyot'])
+    ).order_by(TeacherSubject.id).all()
+    for subject_id, lesson_type, teacher_id in teacher_rows:
+        section_teachers.setdefault((subject_id, lesson_type), teacher_id)
+
+    # Baholangan topshiriqlar: fan, muallif va nomdagi "amaliy" belgisi bo'yicha yig'indi
+    is_practical = func.lower(Assignment.title).like('%amaliy%')
+    score_rows = db.session.query(
+        Assignment.subject_id,
+        Assignment.created_by,
+        is_practical.label('is_practical'),
+        func.sum(Submission.score),
+        func.sum(Assignment.max_score)
+    ).join(
+        Submission, Submission.assignment_id == Assignment.id
+    ).filter(
+        Submission.student_id == student_id,
+        Submission.score != None,
+        Assignment.group_id == group_id,
+        Assignment.subject_id.in_(subject_ids)
+    ).group_by(
+        Assignment.subject_id,
+        Assignment.created_by,
+        is_practical
+    ).all()
+
+    for subject_id, created_by, practical, score, max_score in score_rows:
+        maruza_teacher = section_teachers.get((subject_id, 'maruza'))
+        amaliyot_teacher = section_teachers.get((subject_id, 'amaliyot'))
+
+        # Topshiriq muallifi maruza yoki amaliyot o'qituvchisimi,
+        # aks holda topshiriq nomiga qarab aniqlash
+        if maruza_teacher and created_by and created_by == maruza_teacher:
+            bucket = 'maruza'
+        elif amaliyot_teacher and created_by and created_by == amaliyot_teacher:
+            bucket = 'amaliyot'
+        elif practical:
+            bucket = 'amaliyot'
+        else:
+            bucket = 'maruza'
+
+        grades = rollup[subject_id]
+        grades[bucket]['score'] += score or 0
+        grades[bucket]['max'] += max_score or 0
+        grades['total']['score'] += score or 0
+        grades['total']['max'] += max_score or 0
+
+    return rollup
@@ -0,0 +1,84 @@
+from app.models import Assignment, Submission, User
+
+
+class Gradebook:
+    """Fan va guruh uchun talaba x topshiriq baholar jadvali.
+
+    Barcha topshiriq javoblari bitta so'rov bilan olinadi va zich matritsaga
+    joylanadi: `cells[i][j]` - i-talabaning j-topshiriqqa javobi (yoki None),
+    `scores[i][j]` - qo'yilgan ball (yoki None). Qator yig'indilari, ustun
+    o'rtachalari va maksimal ball oldindan hisoblanadi, shu sababli sahifa
+    ham, eksportlar ham shu obyektdan o'qiydi.
+    """
+
+    def __init__(self, subject_id, group_id):
+        self.subject_id = subject_id
+        self.group_id = group_id
+
+        self.students = User.query.filter_by(
+            role='student',
+            group_id=group_id
+        ).order_by(User.full_name).all()
+        self.assignments = Assignment.query.filter_by(
+            subject_id=subject_id,
+            group_id=group_id
+        ).order_by(Assignment.id).all()
+
+        self._student_index = {student.id: i for i, student in enumerate(self.students)}
+        self._assignment_index = {assignment.id: j for j, assignment in enumerate(self.assignments)}
+
+        columns = len(self.assignments)
+        self.cells = [[None] * columns for _ in self.students]
+        self.scores = [[None] * columns for _ in self.students]
+
+        # Fan va guruhning barcha javoblari (bitta so'rov)
+        submissions = Submission.query.join(
+            Assignment, Submission.assignment_id == Assignment.id
+        ).filter(
+            Assignment.subject_id == subject_id,
+            Assignment.group_id == group_id
+        ).all() if columns else []
+
+        for submission in submissions:
+            i = self._student_index.get(submission.student_id)
+            j = self._assignment_index.get(submission.assignment_id)
+            if i is None or j is None:
+                continue
+            self.cells[i][j] = submission
+            self.scores[i][j] = submission.score
+
+        self.max_scores = [assignment.max_score or 0 for assignment in self.assignments]
+        self.max_total = sum(self.max_scores)
+        self.row_totals = [sum(score for score in row if score) for row in self.scores]
+        self.column_averages = []
+        for j in range(columns):
+            graded = [row[j] for row in self.scores if row[j] is not None]
+            self.column_averages.append(sum(graded) / len(graded) if graded else None)
+
+    def submission(self, student_id, assignment_id):
+        """Talabaning topshiriqqa javobi (yoki None)"""
+        i = self._student_index.get(student_id)
+        j = self._assignment_index.get(assignment_id)
+        if i is None or j is None:
+            return None
+        return self.cells[i][j]
+
+    def rows(self):
+        """Eksport uchun qatorlar: (talaba, ballar ro'yxati, jami)"""
+        for i, student in enumerate(self.students):
+            yield student, self.scores[i], self.row_totals[i]
+
+    def as_student_grades(self):
+        """group_grades.html shabloni kutgan {student_id: {...}} ko'rinishi"""
+        student_grades = {}
+        for i, student in enumerate(self.students):
+            student_grades[student.id] = {
+                'student': student,
+                'submissions': {
+                    assignment.id: self.cells[i][j]
+                    for j, assignment in enumerate(self.assignments)
+                },
+                'total': self.row_totals[i],
+                'max_total': self.max_total
+            }
+        return student_grades
@@ -0,0 +1,74 @@
+from app.models import LessonView
+from app import db
+from app.utils.lesson_sequence import get_subject_sequences, get_video_sequence
+
+
+class LessonProgression:
+    """Talabaning fan bo'yicha video darslar ketma-ketligi va tugatgan darslari.
+
+    Video darslar ketma-ketligi keshdan olinadi, talabaning tugatgan darslari
+    esa bitta so'rov bilan yuklanadi. Har bir dars turi uchun tugatilmagan eng
+    birinchi video dars tartibi saqlanadi, shuning uchun qulf holati
+    qo'shimcha so'rovsiz aniqlanadi.
+    """
+
+    def __init__(self, student_id, subject_id, lesson_type=None):
+        if lesson_type:
+            sequences = {lesson_type: get_video_sequence(subject_id, lesson_type)}
+        else:
+            sequences = get_subject_sequences(subject_id)
+
+        lesson_ids = [lesson_id for sequence in sequences.values() for lesson_id in sequence.ids]
+        self.completed_ids = completed_lesson_ids(student_id, lesson_ids)
+
+        self._first_incomplete_order = {}
+        for kind, sequence in sequences.items():
+            for lesson_id, order, _ in sequence:
+                if lesson_id not in self.completed_ids:
+                    self._first_incomplete_order[kind] = order
+                    break
+
+    def is_locked(self, lesson):
+        """Oldingi video darslardan biri tugatilmagan bo'lsa, dars qulflangan"""
+        if not (lesson.video_file or lesson.video_url):
+            return False
+        first_incomplete = self._first_incomplete_order.get(lesson.lesson_type)
+        return first_incomplete is not None and first_incomplete < lesson.order
+
+    def locked_status(self, lessons):
+        """Darslar ro'yxati uchun {lesson_id: is_locked}"""
+        return {lesson.id: self.is_locked(lesson) for lesson in lessons}
+
+
+def completed_lesson_ids(student_id, lesson_ids):
+    """Berilgan darslardan talaba tugatganlari (bitta so'rov)"""
+    if not lesson_ids:
+        return set()
+    return {
+        lesson_id for (lesson_id,) in db.session.query(LessonView.lesson_id).filter(
+            LessonView.student_id == student_id,
+            LessonView.lesson_id.in_(lesson_ids),
+            LessonView.is_completed == True
+        ).all()
+    }
+
+
+def locked_lesson_ids(student_id, subject_ids):
+    """Bir nechta fan bo'yicha talaba uchun qulflangan video darslar identifikatorlari"""
+    sequences = [
+        sequence
+        for subject_id in subject_ids
+        for sequence in get_subject_sequences(subject_id).values()
+    ]
+    completed_ids = completed_lesson_ids(
+        student_id, [lesson_id for sequence in sequences for lesson_id in sequence.ids]
+    )
+
+    locked = set()
+    for sequence in sequences:
+        first_incomplete = next(
+            (order for lesson_id, order, _ in sequence if lesson_id not in completed_ids), None
+        )
+        if first_incomplete is not None:
+            locked.update(lesson_id for lesson_id, order, _ in sequence if order > first_incomplete)
+    return locked
@@ -0,0 +1,82 @@
+import time
+import bisect
+import threading
+from flask import current_app
+from app.models import Lesson
+from app import db
+
+
+class LessonSequence:
+    """Bitta fan va dars turidagi videoga ega darslarning tartiblangan ro'yxati"""
+
+    def __init__(self, entries):
+        # entries: [(lesson_id, order, title), ...] tartib bo'yicha
+        self.entries = tuple(entries)
+        self.ids = tuple(entry[0] for entry in self.entries)
+        self.orders = tuple(entry[1] for entry in self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def next_after(self, order):
+        """Berilgan tartibdan keyingi video dars (lesson_id, order, title) yoki None"""
+        index = bisect.bisect_right(self.orders, order)
+        return self.entries[index] if index < len(self.entries) else None
+
+    def previous_before(self, order):
+        """Berilgan tartibdan oldingi video dars yoki None"""
+        index = bisect.bisect_left(self.orders, order)
+        return self.entries[index - 1] if index > 0 else None
+
+    def ids_before(self, order):
+        """Berilgan tartibdan oldingi barcha video darslar identifikatorlari"""
+        return self.ids[:bisect.bisect_left(self.orders, order)]
+
+
+_lock = threading.Lock()
+# subject_id -> (yuklangan vaqt, {lesson_type: LessonSequence})
+_cache = {}
+
+_EMPTY = LessonSequence([])
+
+
+def get_subject_sequences(subject_id):
+    """Fan bo'yicha {lesson_type: LessonSequence} (keshdan yoki bitta so'rov bilan)"""
+    ttl = current_app.config.get('LESSON_SEQUENCE_TTL', 300)
+    with _lock:
+        cached = _cache.get(subject_id)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    rows = db.session.query(
+        Lesson.id,
+        Lesson.order,
+        Lesson.title,
+        Lesson.lesson_type,
+        Lesson.video_file,
+        Lesson.video_url
+    ).filter(Lesson.subject_id == subject_id).order_by(Lesson.order, Lesson.id).all()
+
+    grouped = {}
+    for lesson_id, order, title, lesson_type, video_file, video_url in rows:
+        if video_file or video_url:
+            grouped.setdefault(lesson_type, []).append((lesson_id, order, title))
+    sequences = {lesson_type: LessonSequence(entries) for lesson_type, entries in grouped.items()}
+
+    with _lock:
+        _cache[subject_id] = (time.monotonic(), sequences)
+    return sequences
+
+
+def get_video_sequence(subject_id, lesson_type):
+    """(subject_id, lesson_type) bo'yicha video darslar ketma-ketligi"""
+    return get_subject_sequences(subject_id).get(lesson_type, _EMPTY)
+
+
+def invalidate_subject(subject_id):
+    """Dars yaratilganda yoki tahrirlanganda keshni tozalash"""
+    with _lock:
+        _cache.pop(subject_id, None)
@@ -0,0 +1,69 @@
+from flask import current_app
+from sqlalchemy import and_, or_, select, true
+from app.models import User, Group, TeacherSubject
+from app.utils import access_index
+
+
+def contactable_filter(user):
+    """`user` xabar yozishi mumkin bo'lgan foydalanuvchilar sharti (SQL).
+
+    Ruxsat qoidalari ro'yxatlarni Python'ga yuklamasdan quyi so'rovlar
+    orqali ifodalanadi, shuning uchun so'rov hajmi foydalanuvchilar soniga
+    bog'liq emas. Juftlikni tekshirish uchun `can_message` ishlatiladi.
+    """
+    if user.role == 'student':
+        # O'z guruhiga dars beradigan o'qituvchilar va o'z fakultetidagi dekan
+        if not user.group_id:
+            return User.id == None
+        rule = and_(
+            User.role == 'teacher',
+            User.id.in_(select(TeacherSubject.teacher_id).where(
+                TeacherSubject.group_id == user.group_id
+            ))
+        )
+        faculty_id = access_index.group_faculty_id(user.group_id)
+        if faculty_id:
+            rule = or_(rule, and_(User.role == 'dean', User.faculty_id == faculty_id))
+
+    elif user.role == 'dean':
+        # O'z fakultetidagi talabalar
+        if not user.faculty_id:
+            return User.id == None
+        rule = and_(
+            User.role == 'student',
+            User.group_id.in_(select(Group.id).where(Group.faculty_id == user.faculty_id))
+        )
+
+    elif user.role == 'teacher':
+        # O'z guruhlaridagi talabalar, boshqa o'qituvchilar va dekanlar
+        rule = or_(
+            and_(
+                User.role == 'student',
+                User.group_id.in_(select(TeacherSubject.group_id).where(
+                    TeacherSubject.teacher_id == user.id
+                ))
+            ),
+            User.role.in_(['teacher', 'dean'])
+        )
+
+    else:
+        # Admin va boshqalar barcha foydalanuvchilar bilan yozishi mumkin
+        rule = true()
+
+    return and_(User.id != user.id, rule)
+
+
+def contactable_ids(user):
+    """Ruxsatli foydalanuvchilar identifikatorlari quyi so'rovi (IN uchun)"""
+    return select(User.id).where(contactable_filter(user))
+
+
+def available_users(user, limit=None):
+    """Yangi suhbat boshlash uchun ruxsatli foydalanuvchilar (cheklangan ro'yxat)"""
+    limit = limit or current_app.config.get('MESSAGE_PICKER_LIMIT', 50)
+    return User.query.filter(contactable_filter(user)).order_by(User.full_name).limit(limit).all()
+
+
+def can_message(user, other):
+    """Juftlikni tekshirish (xotiradagi indeks orqali)"""
+    return user.id != other.id and access_index.can_message(user, other)
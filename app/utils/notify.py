@@ -0,0 +1,81 @@
+import json
+import queue
+import threading
+import time
+
+
+class Notifier:
+    """Foydalanuvchilarga hodisalarni yetkazuvchi jarayon ichidagi pub/sub.
+
+    Har bir ochiq SSE ulanish o'z navbatiga obuna bo'ladi. Navbat to'lib
+    qolsa (mijoz o'qimayapti) hodisa tashlab yuboriladi - keyingi `unread`
+    hodisasi holatni baribir to'g'rilaydi. Faqat bitta jarayon ichida
+    ishlaydi; bir nechta ishchi jarayonda mijoz qayta ulanganda boshlang'ich
+    holatni bazadan oladi.
+    """
+
+    def __init__(self, queue_size=100):
+        self._lock = threading.Lock()
+        # user_id -> {queue, ...}
+        self._subscribers = {}
+        self._queue_size = queue_size
+
+    def subscribe(self, user_id):
+        channel = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(channel)
+        return channel
+
+    def unsubscribe(self, user_id, channel):
+        with self._lock:
+            channels = self._subscribers.get(user_id)
+            if channels:
+                channels.discard(channel)
+                if not channels:
+                    del self._subscribers[user_id]
+
+    def is_online(self, user_id):
+        with self._lock:
+            return bool(self._subscribers.get(user_id))
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            channels = list(self._subscribers.get(user_id, ()))
+        for channel in channels:
+            try:
+                channel.put_nowait((event, data))
+            except queue.Full:
+                pass
+
+
+notifier = Notifier()
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def event_stream(user_id, channel, initial_events, heartbeat=25, max_duration=300):
+    """SSE oqimi generatori (bazaga murojaat qilmaydi).
+
+    `channel` boshlang'ich holat o'qilishidan oldin `notifier.subscribe`
+    bilan olingan bo'lishi kerak - aks holda oradagi hodisalar yo'qoladi.
+    `max_duration` dan keyin ulanish yopiladi, EventSource avtomatik qayta
+    ulanadi - bu ishchi oqimlarni cheksiz band qilmaslik uchun.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        for event, data in initial_events:
+            yield format_event(event, data)
+
+        deadline = time.monotonic() + max_duration
+        while time.monotonic() < deadline:
+            try:
+                event, data = channel.get(timeout=heartbeat)
+            except queue.Empty:
+                # Proksi ulanishni yopmasligi uchun izoh qatori
+                yield ": ping\n\n"
+                continue
+            yield format_event(event, data)
+    finally:
+        notifier.unsubscribe(user_id, channel)
@@ -0,0 +1,57 @@
+from sqlalchemy import case, func
+from app.models import User, StudentPayment, Group
+from app.utils.fragment_cache import cached_fragment
+from app import db
+
+
+BUCKETS = ('0%', '25%', '50%', '75%', '100%')
+
+
+def payment_bucket():
+    """To'lov foizi oralig'i (SQL CASE), get_payment_percentage() asosida.
+
+    Model foizni round(paid / contract * 100, 2) sifatida hisoblaydi
+    (shartnoma 0 bo'lsa - 0), shuning uchun chegaralar yaxlitlangan foiz
+    bilan solishtiriladi. Manfiy foiz (masalan, manfiy shartnoma) avvalgi
+    Python taqsimotidagidek '100%' ga tushadi.
+    """
+    paid = func.coalesce(StudentPayment.paid_amount, 0)
+    contract = func.coalesce(StudentPayment.contract_amount, 0)
+    percentage = func.round(paid * 100.0 / func.nullif(contract, 0), 2)
+    return case(
+        (contract == 0, '0%'),
+        (percentage < 0, '100%'),
+        (percentage <= 25, '0%'),
+        (percentage <= 50, '25%'),
+        (percentage <= 75, '50%'),
+        (percentage < 100, '75%'),
+        else_='100%'
+    )
+
+
+def _compute_stats_by_course(faculty_id):
+    bucket = payment_bucket().label('bucket')
+    query = db.session.query(Group.course_year, bucket, func.count(StudentPayment.id)).select_from(
+        StudentPayment
+    ).join(User, User.id == StudentPayment.student_id).join(Group, Group.id == User.group_id)
+    if faculty_id:
+        query = query.filter(User.role == 'student', Group.faculty_id == faculty_id)
+
+    stats = {}
+    for course_year, bucket_name, count in query.group_by(Group.course_year, bucket):
+        row = stats.setdefault(course_year, dict.fromkeys(BUCKETS + ('total',), 0))
+        row[bucket_name] += count
+        row['total'] += count
+    return dict(sorted(stats.items()))
+
+
+def payment_stats_by_course(faculty_id=None):
+    """Kurs bo'yicha to'lov foizi statistikasi: {course_year: {'0%': n, ..., 'total': n}}.
+
+    Bitta guruhlangan so'rov bilan hisoblanadi va to'lovlar importida
+    ('payments' tegi) bekor qilinadigan keshda saqlanadi.
+    """
+    return cached_fragment(
+        'payment_stats_by_course', faculty_id or 'all', ('payments', 'users', 'structure'),
+        lambda: _compute_stats_by_course(faculty_id)
+    )
@@ -0,0 +1,70 @@
+from collections import namedtuple
+from datetime import datetime, date, time
+from sqlalchemy import and_, exists
+from sqlalchemy.orm import contains_eager
+from app.models import Assignment, Submission
+
+
+# items - muddat bo'yicha tartiblangan topshiriqlar, overdue/upcoming - ularning bo'linishi
+PendingFeed = namedtuple('PendingFeed', ['items', 'overdue', 'upcoming'])
+
+
+def get_pending_feed(student, limit=5):
+    """Talaba hali javob yubormagan topshiriqlar (bitta NOT EXISTS so'rovi).
+
+    Topshiriqlar muddat bo'yicha (muddatsizlari oxirida) tartiblanadi va
+    faqat `limit` tasi olinadi. Muddati o'tganlar alohida ajratiladi.
+    """
+    if not student.group_id:
+        return PendingFeed([], [], [])
+
+    submitted = exists().where(and_(
+        Submission.assignment_id == Assignment.id,
+        Submission.student_id == student.id
+    ))
+    items = Assignment.query.join(Assignment.subject).options(
+        contains_eager(Assignment.subject)
+    ).filter(
+        Assignment.group_id == student.group_id,
+        ~submitted
+    ).order_by(
+        Assignment.due_date.is_(None),
+        Assignment.due_date,
+        Assignment.id
+    ).limit(limit).all()
+    return split_feed(items)
+
+
+def load_pending_feed(assignment_ids):
+    """Keshlangan identifikatorlar bo'yicha feed (tartib saqlanadi)"""
+    if not assignment_ids:
+        return PendingFeed([], [], [])
+    assignments = {
+        a.id: a for a in Assignment.query.join(Assignment.subject).options(
+            contains_eager(Assignment.subject)
+        ).filter(Assignment.id.in_(assignment_ids)).all()
+    }
+    return split_feed([assignments[i] for i in assignment_ids if i in assignments])
+
+
+def split_feed(items):
+    overdue = [a for a in items if is_overdue(a)]
+    upcoming = [a for a in items if not is_overdue(a)]
+    return PendingFeed(items, overdue, upcoming)
+
+
+def is_overdue(assignment):
+    """Muddat kuni tugagan bo'lsa (muddat sana sifatida saqlanadi)"""
+    today = datetime.combine(date.today(), time.min)
+    return bool(assignment.due_date and assignment.due_date < today)
+
+
+def serialize_assignment(assignment):
+    return {
+        'id': assignment.id,
+        'title': assignment.title,
+        'subject': assignment.subject.name,
+        'max_score': assignment.max_score,
+        'due_date': assignment.due_date.isoformat() if assignment.due_date else None,
+        'overdue': is_overdue(assignment)
+    }
@@ -0,0 +1,98 @@
+from sqlalchemy import event, inspect, text, table, column
+from app.models import User
+from app.utils.fts import FtsTable, match_expression
+from app.utils.message_policy import contactable_filter
+from app import db
+
+
+# Qidiruv natijalari uchun qat'iy chegara
+MAX_RESULTS = 10
+
+people_index = FtsTable('user_search', [('full_name', False), ('email', False)])
+
+_fts = table(people_index.name, column('rowid'), column('rank'))
+
+
+def build_people_index():
+    """Indeksni yaratish va to'ldirish (`flask api rebuild-search-index`).
+
+    Indekslangan foydalanuvchilar sonini, FTS5 mavjud bo'lmasa None qaytaradi.
+    """
+    if not people_index.create():
+        return None
+    return rebuild_people_index()
+
+
+def rebuild_people_index():
+    """Indeksni foydalanuvchilar jadvalidan to'liq qayta qurish"""
+    connection = db.session.connection()
+    if not people_index.state(connection)['enabled']:
+        return 0
+    connection.execute(text(f"DELETE FROM {people_index.name}"))
+    rows = [
+        {'rowid': user_id, 'full_name': full_name or '', 'email': email or ''}
+        for user_id, full_name, email in db.session.query(User.id, User.full_name, User.email)
+    ]
+    if rows:
+        connection.execute(text(
+            f"INSERT INTO {people_index.name} (rowid, full_name, email) VALUES (:rowid, :full_name, :email)"
+        ), rows)
+    db.session.commit()
+    return len(rows)
+
+
+# ==================== SINXRONLASH ====================
+def _write_entry(connection, target):
+    people_index.write(connection, target.id, {
+        'full_name': target.full_name or '',
+        'email': target.email or ''
+    })
+
+
+@event.listens_for(User, 'after_insert')
+def _index_new_user(mapper, connection, target):
+    if people_index.state(connection)['enabled']:
+        _write_entry(connection, target)
+
+
+@event.listens_for(User, 'after_update')
+def _reindex_user(mapper, connection, target):
+    if not people_index.state(connection)['enabled']:
+        return
+    # Har kirishdagi last_login kabi o'zgarishlarda indeks yozilmaydi
+    attrs = inspect(target).attrs
+    if attrs.full_name.history.has_changes() or attrs.email.history.has_changes():
+        _write_entry(connection, target)
+
+
+@event.listens_for(User, 'after_delete')
+def _unindex_user(mapper, connection, target):
+    if people_index.state(connection)['enabled']:
+        people_index.delete(connection, target.id)
+
+
+# ==================== QIDIRUV ====================
+def search_people(user, query, limit=MAX_RESULTS):
+    """`user` xabar yozishi mumkin bo'lgan foydalanuvchilar orasida qidirish.
+
+    SQLite'da FTS5 indeksi (trigram - ichki moslik, unicode61 - prefiks)
+    bm25 bo'yicha tartib bilan ishlatiladi; boshqa bazalarda yoki juda
+    qisqa so'rovlarda, shuningdek indeks hali qurilmagan bo'lsa ilike
+    ishlatiladi. Ruxsat sharti va LIMIT indeks so'rovining o'zida qo'llanadi.
+    """
+    query = query.strip()
+    limit = min(limit, MAX_RESULTS)
+    base = User.query.filter(contactable_filter(user))
+
+    state = people_index.state(db.session.connection())
+    if state['enabled']:
+        match = match_expression(query, state['tokenizer'])
+        if match:
+            return base.join(_fts, _fts.c.rowid == User.id).filter(
+                text(f"{people_index.name} MATCH :match")
+            ).params(match=match).order_by(_fts.c.rank).limit(limit).all()
+
+    return base.filter(
+        (User.full_name.ilike(f'%{query}%')) |
+        (User.email.ilike(f'%{query}%'))
+    ).order_by(User.full_name).limit(limit).all()
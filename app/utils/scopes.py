@@ -0,0 +1,35 @@
+from sqlalchemy import select
+from app.models import User, Group, StudentPayment
+
+
+def faculty_group_ids(faculty_id):
+    """Fakultet guruhlari identifikatorlari quyi so'rovi (IN uchun)"""
+    return select(Group.id).where(Group.faculty_id == faculty_id)
+
+
+def faculty_students_filter(faculty_id):
+    """Fakultet talabalari sharti (User ustida)"""
+    return (User.role == 'student') & User.group_id.in_(faculty_group_ids(faculty_id))
+
+
+def faculty_student_ids(faculty_id):
+    """Fakultet talabalari identifikatorlari quyi so'rovi"""
+    return select(User.id).where(faculty_students_filter(faculty_id))
+
+
+def group_student_ids(group_id):
+    """Guruh talabalari identifikatorlari quyi so'rovi"""
+    return select(User.id).where(User.role == 'student', User.group_id == group_id)
+
+
+def payments_in_scope(query, faculty_id=None, group_id=None):
+    """StudentPayment so'roviga fakultet va/yoki guruh chegarasini qo'shish.
+
+    Talabalar ro'yxati Python'ga yuklanmaydi - shartlar quyi so'rov sifatida
+    bazaning o'zida bajariladi.
+    """
+    if faculty_id:
+        query = query.filter(StudentPayment.student_id.in_(faculty_student_ids(faculty_id)))
+    if group_id:
+        query = query.filter(StudentPayment.student_id.in_(group_student_ids(group_id)))
+    return query
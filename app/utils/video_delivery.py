@@ -0,0 +1,44 @@
+import os
+import mimetypes
+from flask import current_app, send_from_directory, make_response, abort
+from werkzeug.security import safe_join
+
+
+def send_video(directory, filename):
+    """Video faylni qisman uzatish (Range / 206) qo'llab-quvvatlagan holda yuborish.
+
+    - `Range`, `If-Range`, `If-None-Match` va `If-Modified-Since` sarlavhalari
+      werkzeug'ning shartli javob mexanizmi orqali ishlanadi; ETag kuchli
+      (mtime, hajm va yo'ldan hosil qilinadi).
+    - `VIDEO_ACCEL_REDIRECT_PREFIX` sozlangan bo'lsa, faylni nginx o'zi
+      (sendfile bilan, Range va keshni hisobga olib) uzatadi, ishchi jarayon
+      faqat ruxsatni tekshiradi.
+    - Aks holda `USE_X_SENDFILE` yoki WSGI serverning `wsgi.file_wrapper`
+      (gunicorn'da os.sendfile) ishlatiladi.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    max_age = current_app.config.get('VIDEO_CACHE_MAX_AGE', 3600)
+    accel_prefix = current_app.config.get('VIDEO_ACCEL_REDIRECT_PREFIX')
+
+    if accel_prefix:
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+        response.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    else:
+        response = send_from_directory(
+            directory,
+            filename,
+            conditional=True,
+            etag=True,
+            max_age=max_age
+        )
+
+    # Video faqat tizimga kirgan foydalanuvchilarga tegishli - umumiy keshlarga yozilmasin
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.max_age = max_age
+    return response
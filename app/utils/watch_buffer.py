@@ -0,0 +1,180 @@
+import atexit
+import threading
+from flask import current_app
+from sqlalchemy import update, bindparam, case, func
+from app.models import LessonView
+from app.utils.watch_coverage import merge_segments, save_pending_coverage
+from app import db
+
+
+class WatchTimeBuffer:
+    """Video ko'rish vaqti (heartbeat) yozuvlarini xotirada jamlovchi bufer.
+
+    Har bir (lesson_id, student_id) uchun faqat eng katta `watch_duration`
+    saqlanadi, ko'rilgan oraliqlar esa birlashtirilib turadi. Yig'ilgan
+    qiymatlar fon oqimida taymer bo'yicha, kutilayotgan yozuvlar soni
+    chegaraga yetganda (oqim uyg'otiladi) yoki jarayon tugaganda bitta
+    paketli UPDATE bilan bazaga yoziladi. So'rovning o'z sessiyasi hech
+    qachon commit qilinmaydi.
+    UPDATE ham MAX semantikasida bo'lgani uchun bir nechta ishchi jarayon
+    bir xil yozuvni yangilasa ham qiymat kamaymaydi.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> {'duration', 'completed', 'touched'}
+        self._entries = {}
+        self._dirty = set()
+        # key -> (birlashtirilgan oraliqlar, video uzunligi)
+        self._segments = {}
+        self._app = None
+        self._wake = threading.Event()
+
+    def _ensure_started(self):
+        if self._app is not None:
+            return
+        with self._lock:
+            if self._app is not None:
+                return
+            self._app = current_app._get_current_object()
+        thread = threading.Thread(target=self._run, name='watch-time-flusher', daemon=True)
+        thread.start()
+        atexit.register(self._flush_on_exit)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._app.config.get('WATCH_TIME_FLUSH_INTERVAL', 10))
+            self._wake.clear()
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    self._app.logger.exception("Ko'rish vaqtlarini yozishda xatolik")
+
+    def _flush_on_exit(self):
+        with self._app.app_context():
+            self.flush()
+
+    def record(self, lesson_id, student_id, watch_duration, segments=None, video_length=None):
+        """Heartbeat qiymatini qabul qilish.
+
+        `segments` - ko'rilgan [boshlanish, tugash] oraliqlari; ular xotirada
+        birlashtiriladi va flush paytida qamrov bitmap'iga qo'shiladi.
+        Ko'rish yozuvi mavjud bo'lmasa None, aks holda
+        (eng katta watch_duration, is_completed) qaytaradi.
+        """
+        self._ensure_started()
+        key = (lesson_id, student_id)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            # Birinchi heartbeat: bazadagi holatni bir marta o'qish
+            view = db.session.query(
+                LessonView.watch_duration,
+                LessonView.is_completed
+            ).filter_by(lesson_id=lesson_id, student_id=student_id).first()
+            if view is None:
+                return None
+            with self._lock:
+                entry = self._entries.setdefault(key, {
+                    'duration': view.watch_duration or 0,
+                    'completed': bool(view.is_completed),
+                    'touched': True
+                })
+
+        with self._lock:
+            if watch_duration > entry['duration']:
+                entry['duration'] = watch_duration
+                self._dirty.add(key)
+            entry['touched'] = True
+            if segments:
+                known_segments, known_length = self._segments.get(key, ([], None))
+                self._segments[key] = (
+                    merge_segments(known_segments + list(segments)),
+                    video_length or known_length
+                )
+            result = (entry['duration'], entry['completed'])
+            pending = len(self._dirty) + len(self._segments)
+
+        if pending >= current_app.config.get('WATCH_TIME_FLUSH_SIZE', 500):
+            # So'rov sessiyasini commit qilmaslik uchun yozishni fon oqimi bajaradi
+            self._wake.set()
+        return result
+
+    def buffered_duration(self, lesson_id, student_id):
+        """Hali bazaga yozilmagan eng katta qiymat (yoki None)"""
+        with self._lock:
+            entry = self._entries.get((lesson_id, student_id))
+            return entry['duration'] if entry else None
+
+    def mark_completed(self, lesson_id, student_id):
+        """attention_check darsni tugatganda bufer holatini yangilash"""
+        with self._lock:
+            entry = self._entries.get((lesson_id, student_id))
+            if entry:
+                entry['completed'] = True
+
+    def flush(self):
+        """Kutilayotgan qiymatlarni bitta paketli UPDATE bilan yozish"""
+        with self._lock:
+            rows = [
+                {'l': key[0], 's': key[1], 'd': self._entries[key]['duration']}
+                for key in self._dirty
+            ]
+            self._dirty.clear()
+            segments = self._segments
+            self._segments = {}
+
+            # Oxirgi davrda heartbeat kelmagan yozuvlarni xotiradan chiqarish
+            for key in list(self._entries):
+                if self._entries[key]['touched']:
+                    self._entries[key]['touched'] = False
+                else:
+                    del self._entries[key]
+
+        if not rows and not segments:
+            return 0
+
+        table = LessonView.__table__
+        stmt = update(table).where(
+            table.c.lesson_id == bindparam('l'),
+            table.c.student_id == bindparam('s')
+        ).values(
+            watch_duration=case(
+                (func.coalesce(table.c.watch_duration, 0) < bindparam('d'), bindparam('d')),
+                else_=table.c.watch_duration
+            )
+        )
+
+        try:
+            if rows:
+                db.session.execute(stmt, rows)
+            save_pending_coverage(segments)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Keyingi urinishda qayta yozish uchun qaytarish
+            with self._lock:
+                for row in rows:
+                    key = (row['l'], row['s'])
+                    entry = self._entries.setdefault(key, {
+                        'duration': row['d'],
+                        'completed': False,
+                        'touched': True
+                    })
+                    entry['duration'] = max(entry['duration'], row['d'])
+                    self._dirty.add(key)
+                for key, (key_segments, key_length) in segments.items():
+                    known_segments, known_length = self._segments.get(key, ([], None))
+                    self._segments[key] = (
+                        merge_segments(known_segments + key_segments),
+                        known_length or key_length
+                    )
+            raise
+
+        return len(rows) + len(segments)
+
+
+watch_buffer = WatchTimeBuffer()
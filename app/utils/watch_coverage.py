@@ -0,0 +1,224 @@
+import math
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import Lesson, User
+from app import db
+
+
+# Bitmap juda katta bo'lib ketmasligi uchun video uzunligi chegarasi (12 soat)
+MAX_VIDEO_SECONDS = 12 * 60 * 60
+
+# Parallel yozishda bitmap'ni qayta birlashtirish urinishlari
+MAX_MERGE_ATTEMPTS = 5
+
+
+class LessonWatchCoverage(db.Model):
+    """Talabaning video dars bo'yicha ko'rilgan qismlari (bitmap).
+
+    Har bir bit `bucket_seconds` soniyalik oraliqni bildiradi: bit yoqilgan
+    bo'lsa, talaba shu oraliqni ko'rgan. Bitta (dars, talaba) uchun bitta
+    qator va bir necha yuz bayt saqlanadi.
+    """
+    __tablename__ = 'lesson_watch_coverage'
+
+    lesson_id = db.Column(db.Integer, db.ForeignKey(Lesson.id), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey(User.id), primary_key=True)
+    bucket_seconds = db.Column(db.Integer, nullable=False, default=5)
+    video_length = db.Column(db.Integer)  # soniya
+    bitmap = db.Column(db.LargeBinary, nullable=False, default=b'')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_coverage_percentage(self):
+        """Video uzunligiga nisbatan ko'rilgan qism (foiz)"""
+        return coverage_percent(self.bitmap, self.video_length, self.bucket_seconds)
+
+
+def default_bucket_seconds():
+    return current_app.config.get('WATCH_COVERAGE_BUCKET_SECONDS', 5)
+
+
+def parse_segments(raw_segments):
+    """So'rovdagi [[boshlanish, tugash], ...] ro'yxatini tekshirish"""
+    segments = []
+    if not isinstance(raw_segments, list):
+        return segments
+    for item in raw_segments:
+        try:
+            start, end = float(item[0]), float(item[1])
+        except (TypeError, ValueError, IndexError):
+            continue
+        start = max(0.0, start)
+        end = min(float(MAX_VIDEO_SECONDS), end)
+        if end > start:
+            segments.append((start, end))
+    return segments
+
+
+def merge_segments(segments):
+    """Kesishgan yoki tutashgan oraliqlarni birlashtirish"""
+    merged = []
+    for start, end in sorted(segments):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def segments_to_bitmap(segments, bucket_seconds, bitmap=b''):
+    """Oraliqlarni mavjud bitmap ustiga yozish (OR)"""
+    bits = bytearray(bitmap)
+    for start, end in segments:
+        first = int(start // bucket_seconds)
+        last = int(math.ceil(end / bucket_seconds)) - 1
+        if last >= len(bits) * 8:
+            bits.extend(b'\x00' * (last // 8 + 1 - len(bits)))
+        for bucket in range(first, last + 1):
+            bits[bucket // 8] |= 1 << (bucket % 8)
+    return bytes(bits)
+
+
+def bucket_is_set(bitmap, bucket):
+    byte = bucket // 8
+    return byte < len(bitmap) and bool(bitmap[byte] & (1 << (bucket % 8)))
+
+
+def set_buckets(bitmap):
+    """Yoqilgan bitlar (ko'rilgan oraliqlar) raqamlari"""
+    for index, byte in enumerate(bitmap):
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte & (1 << bit):
+                yield index * 8 + bit
+
+
+def coverage_percent(bitmap, video_length, bucket_seconds):
+    """Ko'rilgan oraliqlar ulushi (foiz)"""
+    if not bitmap:
+        return 0
+    if video_length:
+        total_buckets = int(math.ceil(video_length / bucket_seconds))
+    else:
+        total_buckets = len(bitmap) * 8
+    if total_buckets <= 0:
+        return 0
+    watched = sum(1 for bucket in set_buckets(bitmap) if bucket < total_buckets)
+    return round(watched * 100 / total_buckets, 1)
+
+
+def _load_coverage_state(lesson_id, student_id):
+    return db.session.query(
+        LessonWatchCoverage.bucket_seconds, LessonWatchCoverage.bitmap
+    ).filter_by(lesson_id=lesson_id, student_id=student_id).first()
+
+
+def _merge_coverage(key, segments, video_length, state):
+    """Bitmap'ga oraliqlarni compare-and-set bilan qo'shish.
+
+    UPDATE faqat bitmap o'qilgandan beri o'zgarmagan bo'lsa bajariladi;
+    aks holda (boshqa ishchi jarayon yozgan) qator qayta o'qilib, birlashtirish
+    takrorlanadi. Bitmap faqat o'sgani uchun solishtirish xavfsiz.
+    """
+    lesson_id, student_id = key
+    length = min(int(video_length), MAX_VIDEO_SECONDS) if video_length else None
+
+    for _ in range(MAX_MERGE_ATTEMPTS):
+        if state is None:
+            try:
+                with db.session.begin_nested():
+                    bucket_seconds = default_bucket_seconds()
+                    db.session.add(LessonWatchCoverage(
+                        lesson_id=lesson_id,
+                        student_id=student_id,
+                        bucket_seconds=bucket_seconds,
+                        video_length=length,
+                        bitmap=segments_to_bitmap(segments, bucket_seconds)
+                    ))
+                return
+            except IntegrityError:
+                # Boshqa jarayon qatorni bir vaqtda yaratgan
+                state = _load_coverage_state(lesson_id, student_id)
+                continue
+
+        bucket_seconds, bitmap = state
+        values = {'bitmap': segments_to_bitmap(segments, bucket_seconds, bitmap)}
+        if length:
+            values['video_length'] = length
+        elif values['bitmap'] == bitmap:
+            return
+        values['updated_at'] = datetime.utcnow()
+
+        updated = LessonWatchCoverage.query.filter(
+            LessonWatchCoverage.lesson_id == lesson_id,
+            LessonWatchCoverage.student_id == student_id,
+            LessonWatchCoverage.bitmap == bitmap
+        ).update(values, synchronize_session=False)
+        if updated:
+            return
+        state = _load_coverage_state(lesson_id, student_id)
+
+    raise StaleDataError(f"Qamrov bitmap'ini yozib bo'lmadi: {key}")
+
+
+def save_pending_coverage(pending):
+    """Bufer yig'gan oraliqlarni bazadagi bitmap'larga qo'shish.
+
+    pending: {(lesson_id, student_id): (segments, video_length)}.
+    Mavjud holat bitta so'rov bilan olinadi, commit chaqiruvchida.
+    """
+    if not pending:
+        return
+    lesson_ids = {key[0] for key in pending}
+    student_ids = {key[1] for key in pending}
+    existing = {
+        (lesson_id, student_id): (bucket_seconds, bitmap)
+        for lesson_id, student_id, bucket_seconds, bitmap in db.session.query(
+            LessonWatchCoverage.lesson_id,
+            LessonWatchCoverage.student_id,
+            LessonWatchCoverage.bucket_seconds,
+            LessonWatchCoverage.bitmap
+        ).filter(
+            LessonWatchCoverage.lesson_id.in_(lesson_ids),
+            LessonWatchCoverage.student_id.in_(student_ids)
+        )
+    }
+
+    for key, (segments, video_length) in pending.items():
+        _merge_coverage(key, segments, video_length, existing.get(key))
+
+
+def lesson_coverage_report(lesson_id):
+    """Dars bo'yicha talabalar qamrovi va soniyalik auditoriya xaritasi"""
+    rows = db.session.query(LessonWatchCoverage, User.full_name).join(
+        User, User.id == LessonWatchCoverage.student_id
+    ).filter(LessonWatchCoverage.lesson_id == lesson_id).order_by(User.full_name).all()
+
+    video_length = max((row.video_length or 0 for row, _ in rows), default=0)
+    if not video_length:
+        video_length = max(
+            (len(row.bitmap) * 8 * row.bucket_seconds for row, _ in rows),
+            default=0
+        )
+
+    # Har bir soniyani nechta talaba ko'rgan
+    heatmap = [0] * video_length
+    students = []
+    for row, full_name in rows:
+        for bucket in set_buckets(row.bitmap):
+            start = bucket * row.bucket_seconds
+            for second in range(start, min(start + row.bucket_seconds, video_length)):
+                heatmap[second] += 1
+        students.append({
+            'student_id': row.student_id,
+            'full_name': full_name,
+            'coverage': row.get_coverage_percentage()
+        })
+
+    return {
+        'video_length': video_length,
+        'students': students,
+        'heatmap': heatmap
+    }
@@ -0,0 +1,69 @@
+import itertools
+import pytest
+
+
+class TestingConfig:
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    WTF_CSRF_ENABLED = False
+
+
+def _reset_process_state():
+    """Jarayon ichidagi kesh va bayroqlarni testlar orasida tozalash"""
+    from app.utils import access_index, conversations
+    from app.utils.content_search import content_index
+    from app.utils.people_search import people_index
+
+    access_index.invalidate()
+    conversations._backfilled = False
+    content_index._state = None
+    people_index._state = None
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app, db
+
+    config = type('Config', (TestingConfig,), {'UPLOAD_FOLDER': str(tmp_path / 'uploads')})
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        _reset_process_state()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        _reset_process_state()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client):
+    """Flask-Login sessiyasiga foydalanuvchini yozish (parolsiz)"""
+    def login(user):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+    return login
+
+
+@pytest.fixture
+def make_user(app):
+    from app import db
+    from app.models import User
+
+    counter = itertools.count(1)
+
+    def make_user(role='student', **fields):
+        n = next(counter)
+        user = User(email=f'user{n}@example.com', full_name=f'User {n}', role=role, **fields)
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
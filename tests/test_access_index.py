@@ -0,0 +1,104 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from flask import g
+from sqlalchemy import update
+from app import db
+from app.models import Faculty, Group, Subject, TeacherSubject
+from app.utils import access_index
+from app.utils.access_index import (
+    AccessIndexVersion, teaches_subject, teaches_group, group_subject_ids
+)
+
+
+@pytest.fixture
+def section(app):
+    faculty = Faculty(name='Informatika', code='IT')
+    db.session.add(faculty)
+    db.session.flush()
+    subject = Subject(name='Algoritmlar', code='ALG101', faculty_id=faculty.id)
+    group = Group(name='IT-21', faculty_id=faculty.id, course_year=1)
+    db.session.add_all([subject, group])
+    db.session.commit()
+    return subject, group
+
+
+def assign(teacher, subject, group):
+    link = TeacherSubject(
+        teacher_id=teacher.id, subject_id=subject.id, group_id=group.id,
+        lesson_type='maruza', academic_year='2025-2026', semester=1
+    )
+    db.session.add(link)
+    db.session.commit()
+    return link
+
+
+def test_new_assignment_is_visible_after_commit(make_user, section):
+    subject, group = section
+    teacher = make_user('teacher')
+    assert not teaches_subject(teacher.id, subject.id)
+
+    assign(teacher, subject, group)
+
+    assert teaches_subject(teacher.id, subject.id)
+    assert teaches_group(teacher.id, group.id, subject.id)
+    assert subject.id in group_subject_ids(group.id)
+
+
+def test_deleted_assignment_revokes_access(make_user, section):
+    subject, group = section
+    teacher = make_user('teacher')
+    link = assign(teacher, subject, group)
+    assert teaches_subject(teacher.id, subject.id)
+
+    db.session.delete(link)
+    db.session.commit()
+
+    assert not teaches_subject(teacher.id, subject.id)
+
+
+def test_rolled_back_write_keeps_index(make_user, section):
+    subject, group = section
+    teacher = make_user('teacher')
+    assert not teaches_subject(teacher.id, subject.id)
+
+    db.session.add(TeacherSubject(
+        teacher_id=teacher.id, subject_id=subject.id, group_id=group.id,
+        lesson_type='maruza', academic_year='2025-2026', semester=1
+    ))
+    db.session.flush()
+    db.session.rollback()
+
+    assert not teaches_subject(teacher.id, subject.id)
+
+
+def test_commit_bumps_shared_version(make_user, section):
+    subject, group = section
+    teacher = make_user('teacher')
+    before = db.session.query(AccessIndexVersion.version).scalar() or 0
+
+    assign(teacher, subject, group)
+
+    assert db.session.query(AccessIndexVersion.version).scalar() == before + 1
+
+
+def test_version_bump_from_another_worker_reloads_index(make_user, section):
+    subject, group = section
+    teacher = make_user('teacher')
+    assert not teaches_subject(teacher.id, subject.id)
+
+    # Boshqa ishchi jarayonning yozuvi: ORM hodisalarisiz, faqat bazada
+    connection = db.session.connection()
+    connection.execute(TeacherSubject.__table__.insert().values(
+        teacher_id=teacher.id, subject_id=subject.id, group_id=group.id,
+        lesson_type='maruza', academic_year='2025-2026', semester=1
+    ))
+    if not connection.execute(update(AccessIndexVersion).values(version=AccessIndexVersion.version + 1)).rowcount:
+        connection.execute(AccessIndexVersion.__table__.insert().values(id=1, version=1))
+    db.session.commit()
+
+    # Keyingi so'rov: bazadagi versiya qayta o'qiladi
+    g.pop('access_index_version', None)
+    assert teaches_subject(teacher.id, subject.id)
+    assert access_index._state['db_version'] >= 1
@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import db
+from app.models import Faculty, Group, Announcement
+from app.utils.announcement_audience import (
+    AnnouncementAudience, AnnouncementReadMarker, ALL_FACULTIES,
+    index_announcement, backfill_audiences, targeted_announcements, unread_count, mark_seen
+)
+
+
+@pytest.fixture
+def faculties(app):
+    pair = [Faculty(name=f'Fakultet {code}', code=code) for code in ('A', 'B')]
+    db.session.add_all(pair)
+    db.session.flush()
+    groups = [Group(name=f'{f.code}-21', faculty_id=f.id, course_year=1) for f in pair]
+    db.session.add_all(groups)
+    db.session.commit()
+    return list(zip(pair, groups))
+
+
+def announce(author, target_roles='', faculty=None, indexed=True):
+    announcement = Announcement(title='E\'lon', content='', target_roles=target_roles,
+                                author_id=author.id, faculty_id=faculty.id if faculty else None)
+    db.session.add(announcement)
+    db.session.flush()
+    if indexed:
+        index_announcement(announcement)
+    db.session.commit()
+    return announcement
+
+
+def test_students_get_their_role_and_faculty(make_user, faculties):
+    (faculty_a, group_a), (faculty_b, _) = faculties
+    author = make_user('admin')
+    everyone = announce(author)
+    own_faculty = announce(author, 'student', faculty_a)
+    announce(author, 'student', faculty_b)
+    announce(author, 'teacher,dean')
+
+    student = make_user('student', group_id=group_a.id)
+    assert {a.id for a in targeted_announcements(student)} == {everyone.id, own_faculty.id}
+
+
+def test_repeated_roles_are_indexed_once(make_user):
+    announcement = announce(make_user('admin'), 'student, student')
+    index_announcement(announcement)
+    db.session.commit()
+
+    rows = AnnouncementAudience.query.filter_by(announcement_id=announcement.id).all()
+    assert [(row.role, row.faculty_id) for row in rows] == [('student', ALL_FACULTIES)]
+
+
+def test_backfill_indexes_only_missing_announcements(make_user):
+    author = make_user('admin')
+    announce(author)
+    missing = [announce(author, 'teacher', indexed=False) for _ in range(3)]
+
+    assert backfill_audiences(batch_size=2) == 3
+    assert backfill_audiences() == 0
+    assert AnnouncementAudience.query.filter(
+        AnnouncementAudience.announcement_id.in_([a.id for a in missing])
+    ).count() == 3
+
+
+def test_mark_seen_resets_unread_and_never_moves_back(make_user):
+    author = make_user('admin')
+    teacher = make_user('teacher')
+    first = announce(author, 'teacher')
+    assert unread_count(teacher) == 1
+
+    mark_seen(teacher)
+    assert unread_count(teacher) == 0
+
+    latest = announce(author)
+    assert unread_count(teacher) == 1
+    mark_seen(teacher)
+
+    db.session.expire_all()
+    assert db.session.get(AnnouncementReadMarker, teacher.id).last_seen_id == latest.id > first.id
+
+    # Boshqa so'rov belgini allaqachon oldinroqqa surgan bo'lsa, u qaytarilmaydi
+    AnnouncementReadMarker.query.filter_by(user_id=teacher.id).update(
+        {'last_seen_id': latest.id + 100}, synchronize_session=False
+    )
+    db.session.commit()
+    mark_seen(teacher)
+    db.session.expire_all()
+    assert db.session.get(AnnouncementReadMarker, teacher.id).last_seen_id == latest.id + 100
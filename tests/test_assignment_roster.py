@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import db
+from app.models import Faculty, Group, Subject, Assignment, Submission
+from app.utils.assignment_roster import submitted_page, not_submitted_page
+
+
+@pytest.fixture
+def roster(make_user):
+    """Guruhda 5 talaba: 2 tasi javob yuborgan, bittasi boshqa guruhda"""
+    faculty = Faculty(name='Informatika', code='IT')
+    db.session.add(faculty)
+    db.session.flush()
+    subject = Subject(name='Algoritmlar', code='ALG101', faculty_id=faculty.id)
+    group = Group(name='IT-21', faculty_id=faculty.id, course_year=1)
+    other_group = Group(name='IT-22', faculty_id=faculty.id, course_year=1)
+    db.session.add_all([subject, group, other_group])
+    db.session.flush()
+    assignment = Assignment(title='Laboratoriya', description='', max_score=100,
+                            subject_id=subject.id, group_id=group.id,
+                            created_by=make_user('teacher').id)
+    db.session.add(assignment)
+    db.session.commit()
+
+    students = [make_user('student', group_id=group.id) for _ in range(5)]
+    make_user('student', group_id=other_group.id)
+    submissions = [
+        Submission(assignment_id=assignment.id, student_id=student.id, content='javob')
+        for student in (students[1], students[3])
+    ]
+    db.session.add_all(submissions)
+    db.session.commit()
+    return assignment, students, submissions
+
+
+def walk(page_function, assignment, limit):
+    """Kursor bo'yicha barcha sahifalarni yig'ish"""
+    pages, after = [], None
+    while True:
+        page = page_function(assignment, after=after, limit=limit)
+        pages.append([row.id for row in page.items])
+        if page.next_after is None:
+            return pages, page.total
+        after = page.next_after
+
+
+def test_not_submitted_pages_follow_the_cursor(roster):
+    assignment, students, _ = roster
+    pending = [students[i].id for i in (0, 2, 4)]
+
+    pages, total = walk(not_submitted_page, assignment, limit=2)
+
+    assert pages == [pending[:2], pending[2:]]
+    assert total == 3
+
+
+def test_exact_page_boundary_has_no_next_cursor(roster):
+    assignment, _, _ = roster
+    page = not_submitted_page(assignment, limit=3)
+    assert len(page.items) == 3
+    assert page.next_after is None
+
+
+def test_submitted_pages_carry_their_students(roster):
+    assignment, students, submissions = roster
+
+    pages, total = walk(submitted_page, assignment, limit=1)
+
+    assert pages == [[submissions[0].id], [submissions[1].id]]
+    assert total == 2
+    page = submitted_page(assignment, limit=5)
+    assert [s.student.id for s in page.items] == [students[1].id, students[3].id]
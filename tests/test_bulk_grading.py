@@ -0,0 +1,95 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import db
+from app.models import Faculty, Group, Subject, Assignment, Submission
+from app.utils.bulk_grading import apply_bulk_grades
+
+
+@pytest.fixture
+def assignments(make_user):
+    teacher = make_user('teacher')
+    faculty = Faculty(name='Informatika', code='IT')
+    db.session.add(faculty)
+    db.session.flush()
+    subject = Subject(name='Algoritmlar', code='ALG101', faculty_id=faculty.id)
+    group = Group(name='IT-21', faculty_id=faculty.id, course_year=1)
+    db.session.add_all([subject, group])
+    db.session.flush()
+    pair = [
+        Assignment(title=f'Laboratoriya {n}', description='', max_score=100,
+                   subject_id=subject.id, group_id=group.id, created_by=teacher.id)
+        for n in (1, 2)
+    ]
+    db.session.add_all(pair)
+    db.session.commit()
+    return pair
+
+
+def submit(assignment, student, feedback=None):
+    submission = Submission(assignment_id=assignment.id, student_id=student.id,
+                            content='javob', feedback=feedback)
+    db.session.add(submission)
+    db.session.commit()
+    return submission
+
+
+def scores(*submissions):
+    db.session.expire_all()
+    return [db.session.get(Submission, s.id).score for s in submissions]
+
+
+def test_all_rows_are_written_together(make_user, assignments):
+    first, second = (submit(assignments[0], make_user()) for _ in range(2))
+
+    graded, errors = apply_bulk_grades(assignments[0], [(first.id, '90', 'Yaxshi'), (second.id, 75, None)], 1)
+
+    assert (graded, errors) == (2, [])
+    assert scores(first, second) == [90, 75]
+    assert db.session.get(Submission, first.id).feedback == 'Yaxshi'
+
+
+def test_one_invalid_row_rolls_back_the_batch(make_user, assignments):
+    first, second = (submit(assignments[0], make_user()) for _ in range(2))
+
+    graded, errors = apply_bulk_grades(assignments[0], [(first.id, 80, None), (second.id, 101, None)], 1)
+
+    assert graded == 0
+    assert [error['row'] for error in errors] == [2]
+    assert scores(first, second) == [None, None]
+
+
+def test_every_error_is_reported(make_user, assignments):
+    mine = submit(assignments[0], make_user())
+    foreign = submit(assignments[1], make_user())
+
+    graded, errors = apply_bulk_grades(assignments[0], [
+        ('abc', 50, None),
+        (mine.id, 'yuz', None),
+        (foreign.id, 50, None),
+        (mine.id, -1, None),
+    ], 1)
+
+    assert graded == 0
+    assert [error['row'] for error in errors] == [1, 2, 3, 4]
+    assert scores(mine, foreign) == [None, None]
+
+
+def test_duplicate_rows_are_rejected(make_user, assignments):
+    submission = submit(assignments[0], make_user())
+
+    graded, errors = apply_bulk_grades(assignments[0], [(submission.id, 60, None), (submission.id, 70, None)], 1)
+
+    assert graded == 0
+    assert [error['row'] for error in errors] == [2]
+    assert scores(submission) == [None]
+
+
+def test_missing_feedback_keeps_existing_comment(make_user, assignments):
+    submission = submit(assignments[0], make_user(), feedback='Oldingi izoh')
+
+    apply_bulk_grades(assignments[0], [(submission.id, 88, None)], 1)
+
+    db.session.expire_all()
+    assert db.session.get(Submission, submission.id).feedback == 'Oldingi izoh'
@@ -0,0 +1,117 @@
+import io
+import os
+import hashlib
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app.utils.chunked_upload import (
+    ChunkedUploadError, create_upload, load_upload, upload_status, write_chunk,
+    complete_upload, cleanup_stale_uploads, _spool_dir
+)
+from app.utils.file_store import file_path
+
+CHUNK = 4
+DATA = b'0123456789'  # 3 ta bo'lak: 4 + 4 + 2
+
+
+def start(owner_id=1):
+    return create_upload(owner_id, 'dars.mp4', 'video', len(DATA), chunk_size=CHUNK)
+
+
+def send(meta, index, data=None, checksum=None):
+    data = DATA[index * CHUNK:(index + 1) * CHUNK] if data is None else data
+    return write_chunk(meta, index, io.BytesIO(data), checksum)
+
+
+def test_upload_resumes_from_received_chunks(app):
+    meta = start()
+    send(meta, 0)
+    send(meta, 2)
+
+    # Uzilishdan keyin: mijoz holatni so'raydi va faqat yetishmayotgan bo'lakni yuboradi
+    meta = load_upload(meta['id'], 1)
+    status = upload_status(meta)
+    assert status['received'] == [0, 2]
+    assert not status['completed']
+
+    send(meta, 1)
+    filename = complete_upload(meta)
+
+    assert filename == f'{hashlib.sha256(DATA).hexdigest()}.mp4'
+    with open(file_path('videos', filename), 'rb') as f:
+        assert f.read() == DATA
+    assert upload_status(load_upload(meta['id'], 1))['completed']
+
+
+def test_chunk_with_wrong_checksum_is_not_kept(app):
+    meta = start()
+    with pytest.raises(ChunkedUploadError) as error:
+        send(meta, 0, checksum=hashlib.sha256(b'boshqa').hexdigest())
+    assert error.value.status == 400
+    assert upload_status(meta)['received'] == []
+
+
+def test_oversized_chunk_is_rejected(app):
+    meta = start()
+    with pytest.raises(ChunkedUploadError):
+        send(meta, 2, data=b'xyz')
+    assert upload_status(meta)['received'] == []
+
+
+def test_complete_requires_every_chunk(app):
+    meta = start()
+    send(meta, 0)
+    with pytest.raises(ChunkedUploadError) as error:
+        complete_upload(meta)
+    assert error.value.status == 409
+
+
+def test_second_complete_conflicts(app):
+    meta = start()
+    for index in range(3):
+        send(meta, index)
+    complete_upload(meta)
+
+    with pytest.raises(ChunkedUploadError) as error:
+        complete_upload(load_upload(meta['id'], 1))
+    assert error.value.status == 409
+    # Yakunlangan yuklashga bo'lak yozib bo'lmaydi
+    with pytest.raises(ChunkedUploadError):
+        send(load_upload(meta['id'], 1), 0)
+
+
+def test_complete_in_progress_conflicts(app):
+    meta = start()
+    for index in range(3):
+        send(meta, index)
+    # Boshqa so'rov yig'ishni boshlagan
+    open(os.path.join(_spool_dir(meta['id']), 'completing'), 'w').close()
+
+    with pytest.raises(ChunkedUploadError) as error:
+        complete_upload(meta)
+    assert error.value.status == 409
+    assert upload_status(meta)['received'] == [0, 1, 2]
+
+
+def test_other_users_cannot_resume(app):
+    meta = start(owner_id=1)
+    with pytest.raises(ChunkedUploadError) as error:
+        load_upload(meta['id'], 2)
+    assert error.value.status == 403
+
+
+def test_unattached_finished_upload_expires(app):
+    meta = start()
+    for index in range(3):
+        send(meta, index)
+    filename = complete_upload(meta)
+    spool = _spool_dir(meta['id'])
+    os.utime(spool, (0, 0))
+
+    cleanup_stale_uploads()
+
+    assert not os.path.exists(spool)
+    # Yakuniy fayl o'chirish navbatiga qo'yilgan (murojaatlar tekshiriladi)
+    released = os.path.join(app.config['UPLOAD_FOLDER'], 'videos', '.released', filename)
+    assert os.path.exists(released)
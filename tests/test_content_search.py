@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import db
+from app.models import Faculty, Group, Subject, TeacherSubject, Lesson, Assignment, Announcement
+from app.utils.announcement_audience import index_announcement
+from app.utils.content_search import build_content_index, search_content
+
+
+@pytest.fixture
+def campus(make_user):
+    """Ikki fakultet: har birida fan, guruh, o'qituvchi, dars, topshiriq va e'lon"""
+    author = make_user('admin')
+    sides = {}
+    for code in ('A', 'B'):
+        faculty = Faculty(name=f'Fakultet {code}', code=code)
+        db.session.add(faculty)
+        db.session.flush()
+        subject = Subject(name=f'Kvant fizikasi {code}', code=f'PHY-{code}', faculty_id=faculty.id)
+        group = Group(name=f'{code}-21', faculty_id=faculty.id, course_year=1)
+        db.session.add_all([subject, group])
+        db.session.flush()
+        lesson = Lesson(title=f'Kvant holatlari {code}', content='', order=1,
+                        lesson_type='maruza', subject_id=subject.id, created_by=author.id)
+        assignment = Assignment(title=f'Kvant masalalari {code}', description='', max_score=100,
+                                subject_id=subject.id, group_id=group.id, created_by=author.id)
+        announcement = Announcement(title=f'Kvant seminari {code}', content='', target_roles='',
+                                    author_id=author.id, faculty_id=faculty.id)
+        teaching = TeacherSubject(teacher_id=make_user('teacher').id, subject_id=subject.id,
+                                  group_id=group.id, lesson_type='maruza',
+                                  academic_year='2025-2026', semester=1)
+        db.session.add_all([lesson, assignment, announcement, teaching])
+        db.session.flush()
+        index_announcement(announcement)
+        sides[code] = {
+            'faculty': faculty, 'subject': subject, 'group': group,
+            'lesson': lesson, 'assignment': assignment, 'announcement': announcement
+        }
+    db.session.commit()
+    return sides
+
+
+@pytest.fixture
+def built(campus):
+    if build_content_index() is None:
+        pytest.skip("SQLite FTS5 mavjud emas")
+    return campus
+
+
+def found(user, query='kvant'):
+    results, _, available = search_content(user, query, per_page=50)
+    assert available
+    return {(item['kind'], item['id']) for item in results}
+
+
+def refs(side, *kinds):
+    return {(kind, side[kind].id) for kind in kinds}
+
+
+def test_search_is_unavailable_until_index_is_built(make_user, campus):
+    results, has_more, available = search_content(make_user('admin'), 'kvant')
+    assert (results, has_more, available) == ([], False, False)
+
+
+def test_admin_sees_everything(make_user, built):
+    kinds = ('subject', 'lesson', 'assignment', 'announcement')
+    assert found(make_user('admin')) == refs(built['A'], *kinds) | refs(built['B'], *kinds)
+
+
+def test_student_sees_own_group_only(make_user, built):
+    student = make_user('student', group_id=built['A']['group'].id)
+    assert found(student) == refs(built['A'], 'subject', 'lesson', 'assignment', 'announcement')
+
+
+def test_teacher_sees_taught_sections(make_user, built):
+    side = built['B']
+    teacher = make_user('teacher')
+    db.session.add(TeacherSubject(
+        teacher_id=teacher.id, subject_id=side['subject'].id, group_id=side['group'].id,
+        lesson_type='maruza', academic_year='2025-2026', semester=1
+    ))
+    db.session.commit()
+
+    assert found(teacher) == refs(side, 'subject', 'lesson', 'assignment', 'announcement')
+
+
+def test_role_targeted_announcement_is_hidden_from_other_roles(make_user, built):
+    side = built['A']
+    author = make_user('admin')
+    announcement = Announcement(title='Kvant kengashi', content='', target_roles='teacher',
+                                author_id=author.id, faculty_id=None)
+    db.session.add(announcement)
+    db.session.flush()
+    index_announcement(announcement)
+    db.session.commit()
+
+    student = make_user('student', group_id=side['group'].id)
+    assert ('announcement', announcement.id) not in found(student)
+    assert ('announcement', announcement.id) in found(make_user('teacher'))
+
+
+def test_new_rows_are_indexed_on_commit(make_user, built):
+    side = built['A']
+    lesson = Lesson(title='Kvant tunnel effekti', content='', order=2, lesson_type='maruza',
+                    subject_id=side['subject'].id, created_by=make_user('admin').id)
+    db.session.add(lesson)
+    db.session.commit()
+
+    assert ('lesson', lesson.id) in found(make_user('admin'), 'tunnel')
+
+    db.session.delete(lesson)
+    db.session.commit()
+
+    assert ('lesson', lesson.id) not in found(make_user('admin'), 'tunnel')
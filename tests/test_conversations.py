@@ -0,0 +1,109 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import db
+from app.models import Message
+from app.utils.conversations import (
+    history_page, mark_conversation_read, record_message, get_summary, unread_total,
+    inbox_query, build_chats
+)
+
+
+def send(sender, receiver, content='salom'):
+    message = Message(sender_id=sender.id, receiver_id=receiver.id, content=content)
+    db.session.add(message)
+    db.session.flush()
+    record_message(message)
+    db.session.commit()
+    return message
+
+
+def test_history_pages_backwards_by_message_id(make_user):
+    a, b = make_user(), make_user()
+    ids = [send(a, b, str(i)).id for i in range(5)]
+
+    page, has_more = history_page(a.id, b.id, limit=2)
+    assert [m.id for m in page] == ids[3:]
+    assert has_more
+
+    page, has_more = history_page(a.id, b.id, before=ids[3], limit=2)
+    assert [m.id for m in page] == ids[1:3]
+    assert has_more
+
+    page, has_more = history_page(a.id, b.id, before=ids[1], limit=2)
+    assert [m.id for m in page] == ids[:1]
+    assert not has_more
+
+
+def test_history_after_returns_only_newer_messages(make_user):
+    a, b = make_user(), make_user()
+    ids = [send(b, a).id for _ in range(4)]
+
+    page, has_more = history_page(a.id, b.id, after=ids[1], limit=1)
+    assert [m.id for m in page] == [ids[2]]
+    assert has_more
+
+
+def test_history_is_limited_to_the_pair(make_user):
+    a, b, c = make_user(), make_user(), make_user()
+    mine = send(a, b).id
+    send(a, c)
+    send(c, b)
+
+    page, _ = history_page(b.id, a.id)
+    assert [m.id for m in page] == [mine]
+
+
+def test_read_marker_stops_at_last_returned_message(make_user):
+    reader, sender = make_user(), make_user()
+    ids = [send(sender, reader).id for _ in range(3)]
+    assert unread_total(reader.id) == 3
+
+    mark_conversation_read(reader.id, sender.id, up_to=ids[1])
+    db.session.commit()
+    db.session.expire_all()
+
+    summary = get_summary(reader.id, sender.id)
+    assert summary.read_id_for(reader.id) == ids[1]
+    assert summary.unread_for(reader.id) == 1
+    assert summary.read_id_for(sender.id) == 0
+
+
+def test_read_marker_never_moves_backwards(make_user):
+    reader, sender = make_user(), make_user()
+    ids = [send(sender, reader).id for _ in range(3)]
+
+    mark_conversation_read(reader.id, sender.id, up_to=ids[2])
+    db.session.commit()
+    assert not mark_conversation_read(reader.id, sender.id, up_to=ids[0])
+    db.session.commit()
+    db.session.expire_all()
+
+    summary = get_summary(reader.id, sender.id)
+    assert summary.read_id_for(reader.id) == ids[2]
+    assert unread_total(reader.id) == 0
+
+
+def test_mark_read_without_bound_clears_unread(make_user):
+    reader, sender = make_user(), make_user()
+    last = [send(sender, reader) for _ in range(2)][-1]
+
+    assert mark_conversation_read(reader.id, sender.id)
+    db.session.commit()
+    db.session.expire_all()
+
+    assert unread_total(reader.id) == 0
+    assert get_summary(reader.id, sender.id).read_id_for(reader.id) == last.id
+    assert not mark_conversation_read(reader.id, sender.id)
+
+
+def test_inbox_lists_latest_conversation_first(make_user):
+    me, old, new = make_user(), make_user(), make_user()
+    send(old, me)
+    latest = send(me, new)
+
+    chats = build_chats(me.id, inbox_query(me.id).all())
+    assert [chat['user'].id for chat in chats] == [new.id, old.id]
+    assert chats[0]['last_message'].id == latest.id
+    assert chats[1]['unread_count'] == 1
@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+from app import db
+from app.models import StudentPayment
+from app.utils.payment_stats import payment_bucket
+
+
+def python_bucket(percentage):
+    """accounting.index'dagi avvalgi Python taqsimoti"""
+    if percentage == 0:
+        return '0%'
+    elif 0 < percentage <= 25:
+        return '0%'
+    elif 25 < percentage <= 50:
+        return '25%'
+    elif 50 < percentage <= 75:
+        return '50%'
+    elif 75 < percentage < 100:
+        return '75%'
+    return '100%'
+
+
+@pytest.mark.parametrize('contract, paid', [
+    (1000, 0),
+    (1000, 250),
+    (1000, 250.04),
+    (1000, 250.1),
+    (1000, 500),
+    (1000, 750.04),
+    (1000, 999.99),
+    (1000, 999.999),
+    (1000, 1000),
+    (1000, 1500),
+    (0, 100),
+    (-1000, 100),
+])
+def test_sql_bucket_matches_model_percentage(make_user, contract, paid):
+    payment = StudentPayment(student_id=make_user().id, contract_amount=contract, paid_amount=paid)
+    db.session.add(payment)
+    db.session.commit()
+
+    bucket = db.session.query(payment_bucket()).filter(StudentPayment.id == payment.id).scalar()
+    assert bucket == python_bucket(payment.get_payment_percentage())
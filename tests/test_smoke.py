@@ -0,0 +1,16 @@
+import importlib
+import pytest
+
+pytest.importorskip('flask_sqlalchemy')
+
+ROUTE_MODULES = ('auth', 'main', 'api', 'courses', 'admin', 'dean', 'accounting')
+
+
+@pytest.mark.parametrize('name', ROUTE_MODULES)
+def test_route_module_imports(name):
+    importlib.import_module(f'app.routes.{name}')
+
+
+def test_app_registers_blueprints(app):
+    for name in ROUTE_MODULES:
+        assert name in app.blueprints